@@ -1,13 +1,17 @@
 """Chat API endpoints"""
 
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+import asyncio
+import orjson
 import time
 import logging
 import uuid
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterable, List
 
-from app.models.api import ChatRequest, ChatResponse
+from app.config import get_settings
+from app.models.api import ChatBatchRequest, ChatBatchResponse, ChatRequest, ChatResponse, Citation
 from app.services.rag_engine import get_rag_engine
 from app.services.llm_service import get_llm_service
 
@@ -15,14 +19,127 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+# Prebuilt serializer and SSE frame fragments for the streaming endpoint
+_citations_adapter = TypeAdapter(List[Citation])
+_CITATIONS_PREFIX = b'data: {"type":"citations","data":'
+_TEXT_PREFIX = b'data: {"type":"text","data":'
+_FRAME_SUFFIX = b'}\n\n'
+_ACK_EVENT = b'data: {"type":"ack"}\n\n'
 
-@router.post("", response_model=ChatResponse)
+
+def _sse_event(payload: dict) -> bytes:
+    """Encode a payload as a single Server-Sent Events frame"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+async def _coalesce_chunks(
+    stream: AsyncIterable[str],
+    max_chunks: int = 16,
+    max_wait: float = 0.02
+) -> AsyncGenerator[str, None]:
+    """
+    Re-chunk a token stream into fewer, larger packets
+    
+    The first chunk is passed through immediately to keep time-to-first-token
+    low; later chunks are buffered until `max_chunks` are collected or
+    `max_wait` seconds have passed since the first buffered one.
+    
+    Args:
+        stream: Async iterable of text chunks from the LLM
+        max_chunks: Flush after this many buffered chunks
+        max_wait: Flush after this many seconds
+    """
+    iterator = stream.__aiter__()
+    
+    try:
+        yield await iterator.__anext__()
+    except StopAsyncIteration:
+        return
+    
+    loop = asyncio.get_running_loop()
+    buffer: List[str] = []
+    deadline = 0.0
+    # The pending read is kept across flushes instead of cancelled on timeout
+    pending = None
+    
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            
+            timeout = max(deadline - loop.time(), 0) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            
+            if done:
+                task, pending = pending, None
+                try:
+                    chunk = task.result()
+                except StopAsyncIteration:
+                    break
+                
+                if not buffer:
+                    deadline = loop.time() + max_wait
+                buffer.append(chunk)
+                
+                if len(buffer) < max_chunks and loop.time() < deadline:
+                    continue
+            
+            yield "".join(buffer)
+            buffer = []
+        
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+@router.post("", response_class=ORJSONResponse, responses={200: {"model": ChatResponse}})
 async def chat(request: ChatRequest):
     """
     Chat endpoint with RAG-powered responses
     
     Returns AI response with citations from knowledge base
     """
+    return ORJSONResponse(await _answer(request))
+
+
+@router.post("/batch", response_class=ORJSONResponse, responses={200: {"model": ChatBatchResponse}})
+async def chat_batch(batch: ChatBatchRequest):
+    """
+    Answer several chat requests in one call
+    
+    The requests run concurrently (their retrievals share the query batcher)
+    and results come back in submission order. A failed request does not
+    fail the batch; its entry carries the error and status code instead.
+    Each response's processing_time_ms is timed on its own.
+    """
+    start_time = time.time()
+    
+    answers = await asyncio.gather(*(_answer(request) for request in batch.requests), return_exceptions=True)
+    
+    results = []
+    for answer in answers:
+        if isinstance(answer, HTTPException):
+            results.append({"success": False, "response": None, "error": answer.detail, "status_code": answer.status_code})
+        elif isinstance(answer, BaseException):
+            results.append({"success": False, "response": None, "error": str(answer), "status_code": 500})
+        else:
+            results.append({"success": True, "response": answer, "error": None, "status_code": 200})
+    
+    return ORJSONResponse({
+        "results": results,
+        "processing_time_ms": (time.time() - start_time) * 1000
+    })
+
+
+async def _answer(request: ChatRequest) -> dict:
+    """
+    Retrieve context, generate a response and build the ChatResponse payload
+    
+    Raises:
+        HTTPException: 503 if no provider is available, 500 on other failures
+    """
     start_time = time.time()
     
     try:
@@ -47,10 +164,10 @@ async def chat(request: ChatRequest):
         else:
             logger.info(f"Using provider: {provider_to_use}")
         
-        # Step 1: Retrieve relevant context
-        context, citations = rag_engine.retrieve_context(
-            query=request.message,
-            category_filter=request.category_filter
+        # Step 1: Retrieve relevant context (batched with concurrent requests;
+        # repeat and paraphrased queries are served from the retrieval caches)
+        context, citations = await rag_engine.retrieve_context_async(
+            request.message, request.category_filter
         )
         
         # Step 2: Construct RAG prompt with retrieved context
@@ -60,32 +177,37 @@ async def chat(request: ChatRequest):
         prompt = rag_engine.construct_prompt(
             query=request.message,
             context=context,
-            conversation_history=None
+            conversation_history=None,
+            include_system=False
         )
         
         # Step 3: Generate response
         response_text = await llm_service.generate(
             prompt=prompt,
             provider=provider_to_use,
-            temperature=0.7,
+            semantic_key=request.message,
+            semantic_context=context,
+            system=rag_engine.SYSTEM_PROMPT,
+            temperature=get_settings().chat_temperature,
             max_tokens=1000
         )
         
         # Step 4: Parse any additional citations from response
-        cited_titles = rag_engine.parse_citations(response_text)
+        cited_titles = rag_engine.parse_citations(response_text, citations)
         
         # Generate conversation ID if not provided
         conversation_id = request.conversation_id or f"conv_{uuid.uuid4().hex[:12]}"
         
         processing_time = (time.time() - start_time) * 1000
         
-        return ChatResponse(
-            message=response_text,
-            conversation_id=conversation_id,
-            citations=citations,
-            model_used=provider_to_use,
-            processing_time_ms=processing_time
-        )
+        # Same shape as ChatResponse, without re-validating the model on the way out
+        return {
+            "message": response_text,
+            "conversation_id": conversation_id,
+            "citations": _citations_adapter.dump_python(citations),
+            "model_used": provider_to_use,
+            "processing_time_ms": processing_time
+        }
     
     except HTTPException:
         raise
@@ -102,8 +224,11 @@ async def chat_stream(request: ChatRequest):
     Returns Server-Sent Events stream of response chunks
     """
     
-    async def generate_response() -> AsyncGenerator[str, None]:
+    async def generate_response() -> AsyncGenerator[bytes, None]:
         """Generate streaming response"""
+        # Acknowledge immediately so the client sees a frame before retrieval
+        yield _ACK_EVENT
+        
         try:
             # Get services
             rag_engine = get_rag_engine()
@@ -116,42 +241,45 @@ async def chat_stream(request: ChatRequest):
             if not llm_service.is_available(provider_to_use):
                 available = llm_service.get_available_providers()
                 if not available:
-                    yield f"data: {{'error': 'No LLM providers available'}}\n\n"
+                    yield _sse_event({'type': 'error', 'data': 'No LLM providers available'})
                     return
                 provider_to_use = available[0]
             
-            # Retrieve context
-            context, citations = rag_engine.retrieve_context(
-                query=request.message,
-                category_filter=request.category_filter
+            # Retrieve context without blocking the event loop: the batcher
+            # embeds and searches in a worker thread, reranking runs in another
+            context, citations = await rag_engine.retrieve_context_async(
+                request.message, request.category_filter
             )
             
             # Send citations first
-            import json
-            citations_data = [c.model_dump() for c in citations]
-            yield f"data: {json.dumps({'type': 'citations', 'data': citations_data})}\n\n"
+            yield _CITATIONS_PREFIX + _citations_adapter.dump_json(citations) + _FRAME_SUFFIX
             
             # Construct prompt
-            prompt = rag_engine.construct_prompt(
+            prompt = await asyncio.to_thread(
+                rag_engine.construct_prompt,
                 query=request.message,
-                context=context
+                context=context,
+                include_system=False
             )
             
-            # Stream response
-            async for chunk in llm_service.generate_stream(
+            # Stream response, coalescing tokens into larger SSE frames
+            async for chunk in _coalesce_chunks(llm_service.generate_stream(
                 prompt=prompt,
                 provider=provider_to_use,
-                temperature=0.7,
+                semantic_key=request.message,
+                semantic_context=context,
+                system=rag_engine.SYSTEM_PROMPT,
+                temperature=get_settings().chat_temperature,
                 max_tokens=1000
-            ):
-                yield f"data: {json.dumps({'type': 'text', 'data': chunk})}\n\n"
+            )):
+                yield _TEXT_PREFIX + orjson.dumps(chunk) + _FRAME_SUFFIX
             
             # Send completion signal
-            yield f"data: {json.dumps({'type': 'done', 'model': provider_to_use})}\n\n"
+            yield _sse_event({'type': 'done', 'model': provider_to_use})
         
         except Exception as e:
             logger.error(f"Streaming error: {e}", exc_info=True)
-            yield f"data: {json.dumps({'type': 'error', 'data': str(e)})}\n\n"
+            yield _sse_event({'type': 'error', 'data': str(e)})
     
     return StreamingResponse(
         generate_response(),
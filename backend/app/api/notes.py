@@ -1,12 +1,16 @@
 """Notes API endpoints"""
 
-from fastapi import APIRouter, HTTPException
-from typing import List
-import json
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from collections import defaultdict
+from typing import Dict, List, Optional
 import logging
-from pathlib import Path
+import orjson
 
 from app.models.api import NoteResponse, CategoriesResponse, CategoryInfo
+from app.utils.metadata import parse_links
+from app.utils.text import count_words
+from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +20,77 @@ router = APIRouter(prefix="/api/notes", tags=["notes"])
 _notes_cache = None
 _title_index: dict = {}
 
+# Lookup indices over _notes_cache, built once by _build_indices()
+_by_id: Dict[str, dict] = {}
+_by_path: Dict[str, dict] = {}
+_by_category: Dict[str, List[dict]] = defaultdict(list)
+_by_book: Dict[str, List[dict]] = defaultdict(list)
+_categories_response: Optional[CategoriesResponse] = None
+
+# Serialized responses for trusted cached data (skip per-request validation)
+_note_payloads: Dict[str, dict] = {}
+_categories_json: bytes = b""
+
+
+def _build_indices(notes: List[dict]):
+    """Index notes by id, path, category and book, and precompute categories"""
+    global _categories_response, _categories_json
+
+    _by_id.clear()
+    _note_payloads.clear()
+    _by_path.clear()
+    _by_category.clear()
+    _by_book.clear()
+
+    for note in notes:
+        _by_id[note['id']] = note
+        if note.get('file_path'):
+            _by_path[note['file_path']] = note
+        _by_category[note.get('category', 'Unknown')].append(note)
+        if note.get('book'):
+            _by_book[note['book']].append(note)
+
+    categories = [
+        CategoryInfo(
+            id=cat_name.lower().replace(' ', '-'),
+            name=cat_name,
+            count=len(cat_notes),
+            description=None
+        )
+        for cat_name, cat_notes in sorted(_by_category.items())
+    ]
+
+    _categories_response = CategoriesResponse(
+        categories=categories,
+        total_notes=len(notes),
+        total_categories=len(categories)
+    )
+    _categories_json = orjson.dumps(_categories_response.model_dump(mode="json"))
+
+
+def _to_note_response(note: dict) -> NoteResponse:
+    """Convert a cached note dict to the API response model"""
+    return NoteResponse(
+        id=note['id'],
+        title=note['title'],
+        content=note['content'],
+        category=note['category'],
+        book=note.get('book'),
+        file_path=note['file_path'],
+        links=parse_links(note.get('links')),
+        word_count=note['word_count'],
+        related_notes=[]  # TODO: Add related notes via embeddings
+    )
+
+
+def _note_payload(note: dict) -> dict:
+    """Validated, JSON-ready NoteResponse dict for a cached note (memoized)"""
+    payload = _note_payloads.get(note['id'])
+    if payload is None:
+        payload = _to_note_response(note).model_dump(mode="json")
+        _note_payloads[note['id']] = payload
+    return payload
+
 
 def load_notes():
     """Load notes from JSON file, or fall back to ChromaDB in Database Mode."""
@@ -24,19 +99,19 @@ def load_notes():
     if _notes_cache is not None:
         return _notes_cache
 
-    notes_file = Path("../data/processed/notes.json")
+    notes_file = get_settings().notes_json
 
     if notes_file.exists():
         try:
-            with open(notes_file, 'r', encoding='utf-8') as f:
-                _notes_cache = json.load(f)
+            _notes_cache = orjson.loads(notes_file.read_bytes())
+            _build_indices(_notes_cache)
             logger.info(f"Loaded {len(_notes_cache)} notes from JSON cache")
             return _notes_cache
         except Exception as e:
             logger.error(f"Error loading notes from JSON: {e}")
 
     # --- Database Mode: load from ChromaDB ---
-    logger.info("notes.json not found — loading note metadata from ChromaDB")
+    logger.info(f"{notes_file} not found — loading note metadata from ChromaDB")
     try:
         from app.services.vector_db import get_vector_db
         vector_db = get_vector_db()
@@ -63,6 +138,7 @@ def load_notes():
                 }
 
         _notes_cache = list(seen.values())
+        _build_indices(_notes_cache)
         logger.info(f"Loaded {len(_notes_cache)} unique notes from ChromaDB metadata")
         return _notes_cache
 
@@ -115,36 +191,27 @@ async def get_notes(
     try:
         notes = load_notes()
         
-        # Apply filters
-        filtered_notes = notes
-        
-        if category:
-            filtered_notes = [n for n in filtered_notes if n.get('category') == category]
-        
-        if book:
-            filtered_notes = [n for n in filtered_notes if n.get('book') == book]
+        # Apply filters using the prebuilt indices
+        if category and book:
+            by_category = _by_category.get(category, [])
+            by_book = _by_book.get(book, [])
+            # Scan the smaller bucket and check the other field
+            if len(by_category) <= len(by_book):
+                filtered_notes = [n for n in by_category if n.get('book') == book]
+            else:
+                filtered_notes = [n for n in by_book if n.get('category') == category]
+        elif category:
+            filtered_notes = _by_category.get(category, [])
+        elif book:
+            filtered_notes = _by_book.get(book, [])
+        else:
+            filtered_notes = notes
         
         # Apply pagination
         paginated_notes = filtered_notes[offset:offset + limit]
         
-        # Convert to response model
-        response_notes = []
-        for note in paginated_notes:
-            response_notes.append(
-                NoteResponse(
-                    id=note['id'],
-                    title=note['title'],
-                    content=note['content'],
-                    category=note['category'],
-                    book=note.get('book'),
-                    file_path=note['file_path'],
-                    links=note.get('links', []),
-                    word_count=note['word_count'],
-                    related_notes=[]  # TODO: Add related notes via embeddings
-                )
-            )
-        
-        return response_notes
+        # Payloads are validated once per note, then serialized directly
+        return ORJSONResponse([_note_payload(note) for note in paginated_notes])
     
     except Exception as e:
         logger.error(f"Error getting notes: {e}", exc_info=True)
@@ -157,29 +224,11 @@ async def get_categories():
     try:
         notes = load_notes()
         
-        # Count notes by category
-        category_counts = {}
-        for note in notes:
-            cat = note.get('category', 'Unknown')
-            category_counts[cat] = category_counts.get(cat, 0) + 1
-        
-        # Create category info list
-        categories = []
-        for cat_name, count in sorted(category_counts.items()):
-            categories.append(
-                CategoryInfo(
-                    id=cat_name.lower().replace(' ', '-'),
-                    name=cat_name,
-                    count=count,
-                    description=None
-                )
-            )
+        # Precomputed and serialized when the notes were indexed
+        if _categories_response is None:
+            _build_indices(notes)
         
-        return CategoriesResponse(
-            categories=categories,
-            total_notes=len(notes),
-            total_categories=len(categories)
-        )
+        return Response(content=_categories_json, media_type="application/json")
     
     except Exception as e:
         logger.error(f"Error getting categories: {e}", exc_info=True)
@@ -189,6 +238,12 @@ async def get_categories():
 @router.get("/{note_id:path}", response_model=NoteResponse)
 async def get_note_by_id(note_id: str):
     try:
+        # --- Fast path: full note already in the in-memory JSON cache ---
+        load_notes()
+        cached_note = _by_id.get(note_id) or _by_path.get(note_id)
+        if cached_note and cached_note.get('content'):
+            return ORJSONResponse(_note_payload(cached_note))
+
         logger.info(f"Fetching full note content from ChromaDB for: {note_id}")
         from app.services.vector_db import get_vector_db
         vector_db = get_vector_db()
@@ -234,13 +289,7 @@ async def get_note_by_id(note_id: str):
 
         all_links = set()
         for metadata in chunks_metadata:
-            links_str = metadata.get('links', '[]')
-            try:
-                links = json.loads(links_str) if isinstance(links_str, str) else links_str
-                if isinstance(links, list):
-                    all_links.update(links)
-            except (json.JSONDecodeError, TypeError):
-                pass
+            all_links.update(parse_links(metadata.get('links')))
 
         return NoteResponse(
             id=first_metadata.get('note_id', note_id),
@@ -250,7 +299,8 @@ async def get_note_by_id(note_id: str):
             book=first_metadata.get('book') or None,
             file_path=first_metadata.get('file_path', note_id),  # return REAL file_path
             links=list(all_links),
-            word_count=len(full_content.split()),
+            # Stored at ingest; older collections lack it, so count without splitting
+            word_count=int(first_metadata.get('word_count') or 0) or count_words(full_content),
             related_notes=[]
         )
 
@@ -1,20 +1,35 @@
 """Search API endpoints"""
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from typing import List
+import hashlib
 import time
 import logging
 
-from app.models.api import SearchRequest, SearchResponse, SearchResult
+from app.utils.cache import LRUCache
+from app.models.api import SearchRequest, SearchResponse
 from app.services.vector_db import get_vector_db
-from app.services.embedding_service import get_embedding_service
+from app.services.query_batcher import get_query_batcher
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/search", tags=["search"])
 
+# Cache of (query_embedding, results) keyed on the full search request
+_query_cache = LRUCache(max_size=2000, ttl_seconds=300)
 
-@router.post("", response_model=SearchResponse)
+
+def _cache_key(request: SearchRequest, write_version: int) -> bytes:
+    """Build a compact cache key; the DB write version invalidates old entries"""
+    raw = (
+        f"{write_version}|{request.query}|{request.n_results}|"
+        f"{request.category_filter}|{request.book_filter}|{request.nprobe}"
+    )
+    return hashlib.blake2b(raw.encode(), digest_size=16).digest()
+
+
+@router.post("", response_class=ORJSONResponse, responses={200: {"model": SearchResponse}})
 async def semantic_search(request: SearchRequest):
     """
     Perform semantic search across all notes
@@ -26,50 +41,67 @@ async def semantic_search(request: SearchRequest):
     try:
         # Get services
         vector_db = get_vector_db()
-        embedding_service = get_embedding_service()
         
-        # Generate query embedding
-        query_embedding = embedding_service.embed_text(request.query)
+        key = _cache_key(request, vector_db.write_version)
+        cached = _query_cache.get(key)
         
-        # Query vector database
-        results = vector_db.query(
-            query_embedding=query_embedding,
-            n_results=request.n_results,
-            category_filter=request.category_filter,
-            book_filter=request.book_filter
-        )
+        if cached is not None:
+            query_embedding, results = cached
+        else:
+            # Embed and query, batched with concurrent requests
+            query_embedding, results = await get_query_batcher().submit(
+                request.query,
+                n_results=request.n_results,
+                category_filter=request.category_filter,
+                book_filter=request.book_filter,
+                nprobe=request.nprobe
+            )
+            _query_cache.set(key, (query_embedding, results))
         
-        # Format results
-        search_results: List[SearchResult] = []
+        # Format results as plain dicts (shape of SearchResult); the data
+        # comes from our own vector DB, so pydantic validation is skipped
+        search_results: List[dict] = []
         
         if results['ids'] and len(results['ids'][0]) > 0:
-            for i in range(len(results['ids'][0])):
-                search_results.append(
-                    SearchResult(
-                        chunk_id=results['ids'][0][i],
-                        title=results['metadatas'][0][i]['title'],
-                        category=results['metadatas'][0][i]['category'],
-                        book=results['metadatas'][0][i].get('book') or None,
-                        file_path=results['metadatas'][0][i]['file_path'],
-                        text=results['documents'][0][i],
-                        relevance_score=1.0 - results['distances'][0][i]  # Convert distance to similarity
-                    )
-                )
+            # Bind the per-query columns once instead of double-indexing per field
+            ids = results['ids'][0]
+            metas = results['metadatas'][0]
+            docs = results['documents'][0]
+            dists = results['distances'][0]
+            
+            search_results = [
+                {
+                    "chunk_id": chunk_id,
+                    "title": meta['title'],
+                    "category": meta['category'],
+                    "book": meta.get('book') or None,
+                    "file_path": meta['file_path'],
+                    "text": doc,
+                    "relevance_score": 1.0 - dist  # Convert distance to similarity
+                }
+                for chunk_id, meta, doc, dist in zip(ids, metas, docs, dists)
+            ]
         
         processing_time = (time.time() - start_time) * 1000
         
-        return SearchResponse(
-            query=request.query,
-            results=search_results,
-            total_results=len(search_results),
-            processing_time_ms=processing_time
-        )
+        return ORJSONResponse({
+            "query": request.query,
+            "results": search_results,
+            "total_results": len(search_results),
+            "processing_time_ms": processing_time
+        })
     
     except Exception as e:
         logger.error(f"Search error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+@router.get("/cache/stats")
+async def get_search_cache_stats():
+    """Get hit/miss statistics for the search query cache"""
+    return _query_cache.stats()
+
+
 @router.get("/categories", response_model=List[str])
 async def get_search_categories():
     """Get available categories for filtering"""
@@ -3,16 +3,19 @@ Tree Navigation API Endpoints
 Provides endpoints for hierarchical note navigation
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from typing import Dict, Any, List, Optional
+import asyncio
 import logging
+import orjson
 from pathlib import Path
 
 import os
-from app.services.tree_parser import TreeParser
+from app.services.tree_parser import TreeParser, TreeNode, tree_from_skeleton, tree_skeleton
 from app.services.obsidian_parser import parse_vault
 from app.models.note import Note
 from app.services.vector_db import get_vector_db
+from app.config import get_settings
 
 router = APIRouter(prefix="/api/tree", tags=["tree"])
 logger = logging.getLogger(__name__)
@@ -22,26 +25,143 @@ _trees_cache: Dict[str, Any] = {}
 _all_notes: List[Note] = []
 _parser: Optional[TreeParser] = None
 
-# Safe path lookup
-VAULT_PATH = os.getenv("VAULT_PATH", "./data/raw")
+# Prebuilt /api/tree/{category}/{book_name} response bodies, keyed like _trees_cache
+_tree_json_cache: Dict[str, bytes] = {}
 
+# Set once initialization has run (even if it found no notes)
+_initialized = False
+_init_lock = asyncio.Lock()
 
-def initialize_trees():
+# Vault location and snapshot of parsed notes + trees (reused while the vault is unchanged)
+VAULT_PATH = get_settings().vault_path
+TREE_SNAPSHOT_PATH = get_settings().tree_snapshot_path
+VAULT_CACHE_PATH = get_settings().vault_cache_path
+
+# Bumped when the snapshot layout changes; older snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+
+def _vault_fingerprint(vault_path: Path) -> List[int]:
+    """
+    Cheap change detector for the vault: (markdown file count, newest mtime)
+    
+    Only stats files, so it is far cheaper than re-parsing the vault.
+    """
+    file_count = 0
+    newest_mtime = 0
+    
+    for root, dirs, files in os.walk(str(vault_path)):
+        newest_mtime = max(newest_mtime, os.stat(root).st_mtime_ns)
+        for file in files:
+            if file.endswith('.md'):
+                file_count += 1
+                newest_mtime = max(newest_mtime, os.stat(os.path.join(root, file)).st_mtime_ns)
+    
+    return [file_count, newest_mtime]
+
+
+def _save_snapshot(fingerprint: List[int]):
+    """Write parsed notes and trees to disk for the next startup"""
+    snapshot_path = Path(TREE_SNAPSHOT_PATH)
+    try:
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        # Trees are stored as flat skeleton rows (see tree_skeleton), so
+        # neither writing nor reading them recurses once per tree level
+        payload = {
+            "version": SNAPSHOT_VERSION,
+            "fingerprint": fingerprint,
+            "notes": [note.model_dump(mode="json") for note in _all_notes],
+            "trees": {key: tree_skeleton(tree) for key, tree in _trees_cache.items()},
+        }
+        tmp_path = snapshot_path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(payload))
+        tmp_path.replace(snapshot_path)
+        logger.info(f"✓ Saved tree snapshot to {snapshot_path}")
+    except Exception as e:
+        logger.warning(f"Failed to save tree snapshot: {e}")
+
+
+def _load_snapshot(fingerprint: List[int]) -> bool:
+    """Restore notes and trees from disk if the vault fingerprint matches"""
+    global _trees_cache, _all_notes
+    
+    snapshot_path = Path(TREE_SNAPSHOT_PATH)
+    if not snapshot_path.exists():
+        return False
+    
+    try:
+        payload = orjson.loads(snapshot_path.read_bytes())
+        if payload.get("version") != SNAPSHOT_VERSION:
+            logger.info("Tree snapshot format changed — rebuilding")
+            return False
+        if payload.get("fingerprint") != fingerprint:
+            logger.info("Vault changed since last tree snapshot — rebuilding")
+            return False
+        
+        notes = [Note(**data) for data in payload["notes"]]
+        notes_by_id = {note.id: note for note in notes}
+        trees = {}
+        for key, rows in payload["trees"].items():
+            trees[key] = tree_from_skeleton(rows, notes_by_id)
+            trees[key].index_subtree()
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable tree snapshot: {e}")
+        return False
+    
+    _all_notes = notes
+    _trees_cache.clear()
+    _tree_json_cache.clear()
+    for key, tree in trees.items():
+        _cache_tree(key, tree)
+    return True
+
+
+def initialize_trees(use_snapshot: bool = True):
     """
     Initialize tree structures on server startup
     Parse all notes and build tree structures.
     If VAULT_PATH is invalid, falls back to using DB metadata.
+    
+    Blocking; call through asyncio.to_thread from async code.
+    
+    Args:
+        use_snapshot: Reuse the on-disk snapshot when the vault is unchanged
     """
+    global _initialized
+    try:
+        _build_trees(use_snapshot)
+    finally:
+        _initialized = True
+
+
+async def _ensure_initialized():
+    """Initialize trees on first use, at most once across concurrent requests"""
+    if _initialized:
+        return
+    async with _init_lock:
+        if not _initialized:
+            await asyncio.to_thread(initialize_trees)
+
+
+def _build_trees(use_snapshot: bool):
+    """Load or build all tree structures into the module caches"""
     global _trees_cache, _all_notes, _parser
     
     logger.info("Initializing tree structures...")
     _parser = TreeParser()
     path = Path(VAULT_PATH)
+    fingerprint = None
     
     if path.exists() and any(path.iterdir()):
+        fingerprint = _vault_fingerprint(path)
+        if use_snapshot and _load_snapshot(fingerprint):
+            logger.info(f"✓ Loaded {len(_trees_cache)} tree structures from snapshot")
+            return
+        
         logger.info(f"Building trees from vault: {VAULT_PATH}")
         try:
-            notes, stats = parse_vault(VAULT_PATH)
+            # Only files changed since the last parse are re-read
+            notes, stats = parse_vault(VAULT_PATH, cache_path=VAULT_CACHE_PATH)
             _all_notes = notes
         except Exception as e:
             logger.error(f"Failed to parse vault at {VAULT_PATH}: {e}")
@@ -74,28 +194,22 @@ def initialize_trees():
         logger.error("No notes available to build trees.")
         return
         
-    # Find all root notes and build trees
-    root_notes = _parser.find_root_notes(_all_notes)
-    logger.info(f"Found {len(root_notes)} root notes")
-    
-    for root_note in root_notes:
-        try:
-            logger.info(f"Building tree for: {root_note.title} ({root_note.category})")
-            tree = _parser.build_tree(root_note, _all_notes)
-            
-            # Cache using category/book as key
-            category = root_note.category
-            # Extract book name from title
-            book_name = root_note.title.replace("Notes - ", "").replace("notes - ", "")
-            
-            cache_key = f"{category}/{book_name}"
-            _trees_cache[cache_key] = tree
-            logger.info(f"  ✓ Cached tree: {cache_key} ({len(tree.children)} chapters)")
+    # Find all root notes and build trees (in a process pool when there are many)
+    for tree in _parser.build_all_trees(_all_notes).values():
+        # Cache using category/book as key
+        root_note = tree.note
+        category = root_note.category
+        # Extract book name from title
+        book_name = root_note.title.replace("Notes - ", "").replace("notes - ", "")
         
-        except Exception as e:
-            logger.error(f"Error building tree for {root_note.title}: {e}")
+        cache_key = f"{category}/{book_name}"
+        _cache_tree(cache_key, tree)
+        logger.info(f"  ✓ Cached tree: {cache_key} ({len(tree.children)} chapters)")
     
     logger.info(f"✓ Initialized {len(_trees_cache)} tree structures")
+    
+    if fingerprint is not None and _trees_cache:
+        _save_snapshot(fingerprint)
 
 
 @router.get("/books")
@@ -106,8 +220,7 @@ async def get_all_books():
     Returns:
         List of books organized by category
     """
-    if not _trees_cache:
-        initialize_trees()
+    await _ensure_initialized()
     
     # Organize by category
     books_by_category: Dict[str, List[Dict]] = {}
@@ -144,29 +257,19 @@ async def get_book_tree(category: str, book_name: str):
     Returns:
         Complete tree structure
     """
-    if not _trees_cache:
-        initialize_trees()
+    await _ensure_initialized()
     
     cache_key = f"{category}/{book_name}"
     
-    if cache_key not in _trees_cache:
+    content = _tree_json_cache.get(cache_key)
+    if content is None:
         raise HTTPException(
             status_code=404,
             detail=f"Tree not found for {category}/{book_name}"
         )
     
-    tree = _trees_cache[cache_key]
-    
-    return {
-        "category": category,
-        "book_name": book_name,
-        "tree": tree.to_dict(),
-        "statistics": {
-            "total_notes": count_all_nodes(tree),
-            "max_depth": get_max_depth(tree),
-            "chapter_count": len(tree.children)
-        }
-    }
+    # Serve the response body prebuilt at tree-build time
+    return Response(content=content, media_type="application/json")
 
 
 @router.get("/navigation/{file_path:path}")
@@ -180,8 +283,7 @@ async def get_navigation_context(file_path: str):
     Returns:
         Navigation context with breadcrumbs, children, siblings, parent
     """
-    if not _trees_cache:
-        initialize_trees()
+    await _ensure_initialized()
     
     if not _parser or not _all_notes:
         raise HTTPException(status_code=500, detail="Tree parser not initialized")
@@ -239,10 +341,12 @@ async def rebuild_trees():
     
     Use this after notes are updated or re-ingested
     """
-    global _trees_cache
-    _trees_cache.clear()
-    
-    initialize_trees()
+    async with _init_lock:
+        _trees_cache.clear()
+        _tree_json_cache.clear()
+        
+        # Always re-parse; the fresh build overwrites the snapshot
+        await asyncio.to_thread(initialize_trees, use_snapshot=False)
     
     return {
         "status": "success",
@@ -252,24 +356,35 @@ async def rebuild_trees():
 
 # Helper functions
 
-def count_all_nodes(tree) -> int:
-    """Count total nodes in tree"""
-    count = 1  # Count this node
-    for child in tree.children:
-        count += count_all_nodes(child)
-    return count
+def _cache_tree(cache_key: str, tree: TreeNode):
+    """Register a built tree and prebuild its /api/tree response body"""
+    category, book_name = cache_key.split("/", 1)
+    
+    _trees_cache[cache_key] = tree
+    
+    # {"category", "book_name", "tree", "statistics"}, with the tree encoded
+    # by TreeNode.to_json so deep trees are not limited by orjson's nesting depth
+    head = orjson.dumps({"category": category, "book_name": book_name})[:-1]
+    statistics = orjson.dumps({
+        "total_notes": count_all_nodes(tree),
+        "max_depth": get_max_depth(tree),
+        "chapter_count": len(tree.children)
+    })
+    _tree_json_cache[cache_key] = b"".join(
+        (head, b',"tree":', tree.to_json(), b',"statistics":', statistics, b"}")
+    )
+
 
+def count_all_nodes(tree: TreeNode) -> int:
+    """Count total nodes in tree (recorded once per tree, see TreeNode.index_subtree)"""
+    return tree.total_nodes
 
-def get_max_depth(tree) -> int:
+
+def get_max_depth(tree: TreeNode) -> int:
     """Get maximum depth of tree"""
-    if not tree.children:
-        return tree.depth
-    return max(get_max_depth(child) for child in tree.children)
+    return tree.max_depth
 
 
-def _find_note_in_tree(tree, note_id: str) -> bool:
+def _find_note_in_tree(tree: TreeNode, note_id: str) -> bool:
     """Check if note exists in tree"""
-    if tree.note.id == note_id:
-        return True
-    return any(_find_note_in_tree(child, note_id) for child in tree.children)
-
+    return tree.find(note_id) is not None
@@ -0,0 +1,101 @@
+"""
+Application Settings
+Filesystem paths and chat generation settings, read once from the environment
+"""
+
+from pathlib import Path
+from typing import Optional
+import logging
+
+from pydantic import AliasChoices, Field
+from pydantic_settings import BaseSettings
+
+logger = logging.getLogger(__name__)
+
+# backend/app/config.py -> project root (independent of the working directory)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+class Settings(BaseSettings):
+    """
+    Paths and chat settings used by the API
+
+    Each one can be overridden through the environment (VAULT_PATH or
+    OBSIDIAN_VAULT_PATH, NOTES_JSON, TREE_SNAPSHOT_PATH, VAULT_CACHE_PATH,
+    CHAT_TEMPERATURE). Relative paths are resolved against the working
+    directory, once, when settings load.
+    """
+
+    vault_path: Path = Field(
+        default=PROJECT_ROOT / "data" / "raw",
+        validation_alias=AliasChoices("VAULT_PATH", "OBSIDIAN_VAULT_PATH")
+    )
+    notes_json: Path = Field(
+        default=PROJECT_ROOT / "data" / "processed" / "notes.json",
+        validation_alias="NOTES_JSON"
+    )
+    tree_snapshot_path: Path = Field(
+        default=PROJECT_ROOT / "data" / "cache" / "trees.json",
+        validation_alias="TREE_SNAPSHOT_PATH"
+    )
+    vault_cache_path: Path = Field(
+        default=PROJECT_ROOT / "data" / "cache" / "vault.json",
+        validation_alias="VAULT_CACHE_PATH"
+    )
+
+    # Sampling temperature for /api/chat, /api/chat/batch and /api/chat/stream.
+    # At CACHE_MAX_TEMPERATURE (0.3) or below, answers are served from the
+    # LLM response cache; at SEMANTIC_MAX_TEMPERATURE (0.2) or below,
+    # paraphrased questions hit too.
+    chat_temperature: float = Field(
+        default=0.7,
+        ge=0.0,
+        le=2.0,
+        validation_alias="CHAT_TEMPERATURE"
+    )
+
+    def model_post_init(self, __context):
+        """Resolve relative paths now, so a later chdir cannot change them"""
+        self.vault_path = self.vault_path.resolve()
+        self.notes_json = self.notes_json.resolve()
+        self.tree_snapshot_path = self.tree_snapshot_path.resolve()
+        self.vault_cache_path = self.vault_cache_path.resolve()
+
+    def validate_paths(self):
+        """
+        Log where data will be loaded from
+
+        A path that was explicitly configured but does not exist is an
+        error; a missing default only means the API runs in Database Mode.
+
+        Raises:
+            FileNotFoundError: If a configured vault or notes file is missing
+        """
+        for field, path in (("vault_path", self.vault_path), ("notes_json", self.notes_json)):
+            if path.exists():
+                size = path.stat().st_size if path.is_file() else None
+                detail = f" ({size / 1024 / 1024:.1f} MB)" if size is not None else ""
+                logger.info(f"✓ {field}: {path}{detail}")
+            elif field in self.model_fields_set:
+                raise FileNotFoundError(f"Configured {field} does not exist: {path}")
+            else:
+                logger.warning(f"⚠  {field} not found at {path} — using ChromaDB metadata instead")
+
+
+# Global settings instance
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    """
+    Get or create the global settings instance
+
+    Returns:
+        Settings instance
+    """
+    global _settings
+
+    if _settings is None:
+        _settings = Settings()
+
+    return _settings
@@ -7,10 +7,12 @@ Retrieves semantically relevant context from 1,649 personal notes
 via OpenAI GPT-4 Turbo or Ollama Llama 3.1 as a local backup.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+import asyncio
 import logging
 import os
 import time
@@ -19,11 +21,13 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+from app.config import get_settings
 from app.api import search, notes, chat, tree
 from app.models.api import HealthResponse, StatsResponse
 from app.services.vector_db import get_vector_db
 from app.services.embedding_service import get_embedding_service
 from app.services.llm_service import get_llm_service
+from app.utils.cache import LRUCache
 
 # Configure logging
 logging.basicConfig(
@@ -35,25 +39,36 @@ logger = logging.getLogger(__name__)
 # Record startup timestamp for uptime tracking
 _startup_time = time.time()
 
+# Short-lived cache for /health and /stats, so frequent probes don't hit ChromaDB
+META_CACHE_SECONDS = 5
+_meta_cache = LRUCache(max_size=16, ttl_seconds=META_CACHE_SECONDS)
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Startup and shutdown lifecycle events"""
-    global _startup_time
-    _startup_time = time.time()
 
-    logger.info("=" * 60)
-    logger.info("Spiritual AI Guide API — starting up")
-    logger.info("=" * 60)
+def _cached(key: tuple, compute):
+    """Return a cached value for key, computing and storing it on a miss or expiry"""
+    value = _meta_cache.get(key)
+    if value is None:
+        value = compute()
+        _meta_cache.set(key, value)
+    return value
+
+
+async def _deferred_init(app: FastAPI):
+    """
+    Load models and data after the server has started accepting connections
 
+    Model weights and the vault parse take seconds; running them here keeps
+    /health/live responsive while they load. Blocking work runs in threads.
+    """
     try:
         # Initialize vector database
-        vector_db = get_vector_db()
+        vector_db = await asyncio.to_thread(get_vector_db)
         chunk_count = vector_db.collection.count()
         logger.info(f"✓ ChromaDB ready: {chunk_count:,} chunks indexed")
+        await asyncio.to_thread(vector_db.warmup)
 
         # Initialize embedding service
-        embedding_service = get_embedding_service()
+        embedding_service = await asyncio.to_thread(get_embedding_service)
         logger.info(
             f"✓ Embedding model: {embedding_service.model_name} "
             f"({embedding_service.embedding_dim}D vectors)"
@@ -61,6 +76,9 @@ async def lifespan(app: FastAPI):
 
         # Initialize LLM service
         llm_service = get_llm_service()
+        await llm_service.refresh_availability()
+        llm_service.start_health_checks()
+        await llm_service.warm_connections()
         available_llms = llm_service.get_available_providers()
         if available_llms:
             logger.info(f"✓ LLM providers available: {', '.join(available_llms)}")
@@ -71,21 +89,57 @@ async def lifespan(app: FastAPI):
         openai_key_present = bool(os.getenv("OPENAI_API_KEY"))
         logger.info(f"✓ OPENAI_API_KEY present: {openai_key_present}")
 
-        # Initialize tree structures
-        tree.initialize_trees()
+        # Initialize tree structures (vault parse runs off the event loop)
+        await asyncio.to_thread(tree.initialize_trees)
         logger.info("✓ Note tree structures initialized")
 
+        # Warm the notes cache so the first /api/notes request doesn't pay for it
+        loaded_notes = await asyncio.to_thread(notes.load_notes)
+        logger.info(f"✓ Notes cache loaded: {len(loaded_notes):,} notes")
+
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
         logger.warning("API starting with limited functionality")
 
-    logger.info("API ready to accept requests")
+    app.state.ready = True
+    logger.info("API ready to serve requests")
     logger.info("=" * 60)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown lifecycle events"""
+    global _startup_time
+    _startup_time = time.time()
+
+    logger.info("=" * 60)
+    logger.info("Spiritual AI Guide API — starting up")
+    logger.info("=" * 60)
+
+    # Fail fast on misconfigured data paths instead of silently falling back
+    get_settings().validate_paths()
+
+    # Bind the port now; heavy initialization continues in the background
+    app.state.ready = False
+    init_task = asyncio.create_task(_deferred_init(app))
+
     yield
 
     # Shutdown
     logger.info("Shutting down Spiritual AI Guide API")
+    if not init_task.done():
+        init_task.cancel()
+    await get_llm_service().aclose()
+
+
+async def require_ready(request: Request):
+    """Router dependency: reject requests with 503 until startup has finished"""
+    if not getattr(request.app.state, "ready", False):
+        raise HTTPException(
+            status_code=503,
+            detail="Service is starting up, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
 
 
 # CORS origins — read from environment for production flexibility
@@ -128,6 +182,7 @@ app = FastAPI(
         "url": "https://opensource.org/licenses/MIT",
     },
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -139,11 +194,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount routers
-app.include_router(chat.router)
-app.include_router(search.router)
-app.include_router(notes.router)
-app.include_router(tree.router)
+# Mount routers (all of them need the services loaded in _deferred_init)
+app.include_router(chat.router, dependencies=[Depends(require_ready)])
+app.include_router(search.router, dependencies=[Depends(require_ready)])
+app.include_router(notes.router, dependencies=[Depends(require_ready)])
+app.include_router(tree.router, dependencies=[Depends(require_ready)])
 
 
 @app.get("/", tags=["meta"], summary="API root")
@@ -155,6 +210,7 @@ async def root():
         "status": "operational",
         "docs": "/docs",
         "health": "/health",
+        "ready": "/health/ready",
         "github": "https://github.com/FrancescoCavina02/Spiritual-chatbot",
     }
 
@@ -169,13 +225,23 @@ async def root():
         "embedding model, and available LLM providers. Suitable for uptime monitors."
     ),
 )
-async def health_check():
+async def health_check(response: Response):
     """
     Comprehensive health check endpoint.
 
     Returns the status of each dependent service and overall uptime.
     Used by Railway health checks and frontend connection validation.
     """
+    response.headers["Cache-Control"] = f"max-age={META_CACHE_SECONDS}"
+
+    if not app.state.ready:
+        return HealthResponse(
+            status="starting",
+            timestamp=datetime.now(timezone.utc),
+            version="1.0.0",
+            services={"api": "operational", "uptime_seconds": int(time.time() - _startup_time)},
+        )
+
     uptime_seconds = int(time.time() - _startup_time)
     services: dict = {
         "api": "operational",
@@ -187,7 +253,7 @@ async def health_check():
     try:
         # ChromaDB status
         vector_db = get_vector_db()
-        chunk_count = vector_db.collection.count()
+        chunk_count = _cached(("count", vector_db.write_version), vector_db.collection.count)
         services["chromadb"] = f"operational ({chunk_count:,} chunks indexed)"
 
         # Embedding service status
@@ -217,9 +283,24 @@ async def health_check():
     )
 
 
+@app.get("/health/live", tags=["meta"], summary="Liveness probe")
+async def health_live():
+    """Liveness probe — the process is up and serving, even while models load."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", tags=["meta"], summary="Readiness probe")
+async def health_ready(request: Request):
+    """Readiness probe — 503 until the embedding model and data are loaded."""
+    if not request.app.state.ready:
+        return ORJSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready"}
+
+
 @app.get(
     "/stats",
-    response_model=StatsResponse,
+    response_class=ORJSONResponse,
+    responses={200: {"model": StatsResponse}},
     tags=["meta"],
     summary="Knowledge base statistics",
     description=(
@@ -228,27 +309,39 @@ async def health_check():
         "and the embedding model in use."
     ),
 )
-async def get_stats():
+async def get_stats(request: Request):
     """
     Knowledge base statistics.
 
     Provides a breakdown of indexed content by category and book,
     useful for understanding the breadth of the knowledge base.
     """
+    await require_ready(request)
+
     try:
         vector_db = get_vector_db()
         embedding_service = get_embedding_service()
 
-        db_stats = vector_db.get_statistics()
-
-        return StatsResponse(
-            total_chunks=db_stats["total_chunks"],
-            total_notes=db_stats.get("notes_sampled", 0),
-            categories=db_stats["categories"],
-            books=db_stats["books"],
-            embedding_model=embedding_service.model_name,
-            vector_db_size=db_stats["total_chunks"],
-        )
+        # Writes bump write_version, so they never serve stale statistics
+        version = vector_db.write_version
+        db_stats = _cached(("stats", version), vector_db.get_statistics)
+
+        headers = {
+            "Cache-Control": f"max-age={META_CACHE_SECONDS}",
+            "ETag": f'"{db_stats["total_chunks"]}-{version}"',
+        }
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+
+        # Same shape as StatsResponse, serialized directly by orjson
+        return ORJSONResponse({
+            "total_chunks": db_stats["total_chunks"],
+            "total_notes": db_stats.get("notes_sampled", 0),
+            "categories": db_stats["categories"],
+            "books": db_stats["books"],
+            "embedding_model": embedding_service.model_name,
+            "vector_db_size": db_stats["total_chunks"],
+        }, headers=headers)
 
     except Exception as e:
         logger.error(f"Stats error: {e}")
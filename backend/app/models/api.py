@@ -66,12 +66,34 @@ class ChatResponse(BaseModel):
         }
 
 
+class ChatBatchRequest(BaseModel):
+    """Request model for the batch chat endpoint"""
+    requests: List[ChatRequest] = Field(..., description="Chat requests, answered concurrently", min_length=1, max_length=32)
+
+
+class ChatBatchResult(BaseModel):
+    """One entry of a batch chat response"""
+    success: bool = Field(..., description="Whether this request was answered")
+    response: Optional[ChatResponse] = Field(None, description="Chat response (when successful)")
+    error: Optional[str] = Field(None, description="Error detail (when unsuccessful)")
+    status_code: int = Field(200, description="HTTP status the single-request endpoint would have returned")
+
+
+class ChatBatchResponse(BaseModel):
+    """Response model for the batch chat endpoint"""
+    results: List[ChatBatchResult] = Field(..., description="One result per request, in submission order")
+    processing_time_ms: float = Field(..., description="Processing time for the whole batch in milliseconds")
+
+
 class SearchRequest(BaseModel):
     """Request model for semantic search"""
     query: str = Field(..., description="Search query", min_length=1, max_length=1000)
     n_results: int = Field(10, description="Number of results", ge=1, le=50)
     category_filter: Optional[str] = Field(None, description="Filter by category")
     book_filter: Optional[str] = Field(None, description="Filter by book")
+    nprobe: Optional[int] = Field(
+        None, description="IVF cells scanned when the FAISS index is enabled (recall vs. latency)", ge=1, le=1024
+    )
 
 
 class SearchResult(BaseModel):
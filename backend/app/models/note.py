@@ -1,7 +1,7 @@
 """Pydantic models for notes and chunks"""
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime
 
 
@@ -46,9 +46,14 @@ class Chunk(BaseModel):
     book: Optional[str] = Field(None, description="Book name")
     file_path: str = Field(..., description="File path")
     links: List[str] = Field(default_factory=list, description="Links from parent note")
+    word_count: int = Field(default=0, description="Word count of parent note")
+    overlap: str = Field(default="", description="Tail of the previous chunk, prepended only when embedding")
     
     # Embedding (populated later)
-    embedding: Optional[List[float]] = Field(None, description="Vector embedding")
+    embedding: Optional[Union[List[int], List[float]]] = Field(
+        None, description="Vector embedding (int8 values when embedding_scale is set)"
+    )
+    embedding_scale: Optional[float] = Field(None, description="Dequantization scale for int8 embeddings")
     
     class Config:
         json_schema_extra = {
@@ -0,0 +1,45 @@
+"""Lightweight chunk representation for the ingest hot path"""
+
+from dataclasses import dataclass, field, fields
+from typing import List, Optional, Union
+
+import numpy as np
+
+from app.models.note import Chunk
+
+
+@dataclass(slots=True)
+class ChunkFast:
+    """
+    Slotted, validation-free twin of the Chunk model
+
+    ChunkingService produces thousands of these per ingest; their fields come
+    from already-validated Note objects, so pydantic validation is skipped.
+    Convert with to_chunk() where a pydantic Chunk is needed.
+    """
+    id: str
+    note_id: str
+    text: str
+    chunk_index: int
+    total_chunks: int
+    title: str
+    category: str
+    book: Optional[str] = None
+    file_path: str = ""
+    links: List[str] = field(default_factory=list)
+    word_count: int = 0
+    overlap: str = ""
+    # Row view into the batch's embedding array when produced by EmbeddingService
+    embedding: Optional[Union[List[int], List[float], np.ndarray]] = None
+    embedding_scale: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        """Shallow field dictionary (same keys as Chunk.model_dump())"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    def to_chunk(self) -> Chunk:
+        """Validate into a pydantic Chunk"""
+        data = self.to_dict()
+        if isinstance(self.embedding, np.ndarray):
+            data["embedding"] = self.embedding.tolist()
+        return Chunk(**data)
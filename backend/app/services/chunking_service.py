@@ -4,10 +4,11 @@ Implements semantic chunking strategy for notes
 """
 
 import re
-from typing import List
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 import logging
 
-from app.models.note import Note, Chunk
+from app.models.note import Note
+from app.models.note_fast import ChunkFast
 
 logger = logging.getLogger(__name__)
 
@@ -15,30 +16,63 @@ logger = logging.getLogger(__name__)
 class ChunkingService:
     """Service for splitting notes into semantic chunks"""
     
+    # Pattern for headers: # Header or ## Subheader
+    HEADER_PATTERN = re.compile(r'^#{1,6}\s+.+$')
+    
+    # Paragraph separator: one or more blank lines
+    PARAGRAPH_PATTERN = re.compile(r'\n\n+')
+    
     def __init__(
         self,
         chunk_size: int = 800,
         chunk_overlap: int = 150,
-        min_chunk_size: int = 100
+        min_chunk_size: int = 100,
+        tokenizer: Optional[Any] = None,
+        max_seq_length: int = 256
     ):
         """
         Initialize chunking service
         
         Args:
-            chunk_size: Target chunk size in tokens (approximate)
+            chunk_size: Target chunk size in tokens
             chunk_overlap: Overlap between chunks in tokens
             min_chunk_size: Minimum chunk size to avoid tiny fragments
+            tokenizer: Embedding model tokenizer (e.g. SentenceTransformer.tokenizer);
+                without one, tokens are estimated as words * 1.3
+            max_seq_length: Model input limit; with a tokenizer, the overlap and the
+                chunk together are kept under it so nothing is truncated
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.min_chunk_size = min_chunk_size
+        self.tokenizer = tokenizer
+        
+        if tokenizer is not None:
+            # Leave room for special tokens; the overlap prefix shares the budget
+            budget = max_seq_length - 16
+            self.overlap_tokens = min(chunk_overlap, budget // 4)
+            self.tokens_per_chunk = min(chunk_size, budget - self.overlap_tokens)
+        else:
+            self.overlap_tokens = chunk_overlap
+            self.tokens_per_chunk = chunk_size
+        self.min_tokens = min_chunk_size
+    
+    def _count_tokens(self, text: str, words: List[str]) -> float:
+        """
+        Token count of a piece of text
         
-        # Approximate tokens as words * 1.3 (rough heuristic)
-        self.words_per_chunk = int(chunk_size / 1.3)
-        self.overlap_words = int(chunk_overlap / 1.3)
-        self.min_words = int(min_chunk_size / 1.3)
+        Args:
+            text: Text to measure
+            words: text.split(), already computed by the caller
+        
+        Returns:
+            Exact count with a tokenizer, otherwise the words * 1.3 estimate
+        """
+        if self.tokenizer is None:
+            return len(words) * 1.3
+        return len(self.tokenizer.encode(text, add_special_tokens=False, verbose=False))
     
-    def chunk_note(self, note: Note) -> List[Chunk]:
+    def chunk_note(self, note: Note) -> List[ChunkFast]:
         """
         Chunk a single note into smaller pieces
         
@@ -46,29 +80,30 @@ class ChunkingService:
             note: Note object to chunk
         
         Returns:
-            List of Chunk objects
+            List of ChunkFast objects
         """
         content = note.content.strip()
         
         # If content is short enough, treat as single chunk
-        word_count = len(content.split())
-        if word_count <= self.words_per_chunk:
+        words = content.split()
+        tokens = self._count_tokens(content, words)
+        if tokens <= self.tokens_per_chunk:
             return [self._create_chunk(note, content, 0, 1)]
         
         # Try semantic chunking
-        chunks_text = self._semantic_chunk(content)
+        chunks_text = self._semantic_chunk(content, words, tokens)
         
-        # Create Chunk objects
+        # Create chunk objects
         chunks = []
         total_chunks = len(chunks_text)
         
-        for i, chunk_text in enumerate(chunks_text):
-            chunk = self._create_chunk(note, chunk_text, i, total_chunks)
+        for i, (chunk_text, overlap) in enumerate(chunks_text):
+            chunk = self._create_chunk(note, chunk_text, i, total_chunks, overlap)
             chunks.append(chunk)
         
         return chunks
     
-    def chunk_notes(self, notes: List[Note]) -> List[Chunk]:
+    def chunk_notes(self, notes: List[Note]) -> List[ChunkFast]:
         """
         Chunk multiple notes
         
@@ -78,67 +113,88 @@ class ChunkingService:
         Returns:
             List of all chunks from all notes
         """
-        all_chunks = []
+        all_chunks = list(self.iter_chunks(notes))
         
+        logger.info(f"Created {len(all_chunks)} chunks from {len(notes)} notes")
+        return all_chunks
+    
+    def iter_chunks(self, notes: Iterable[Note]) -> Iterator[ChunkFast]:
+        """
+        Lazily chunk notes, one note at a time
+        
+        Args:
+            notes: Iterable of Note objects
+        
+        Yields:
+            Chunks from each note, in order
+        """
         for note in notes:
             try:
                 chunks = self.chunk_note(note)
-                all_chunks.extend(chunks)
             except Exception as e:
                 logger.error(f"Error chunking note {note.id}: {e}")
                 continue
-        
-        logger.info(f"Created {len(all_chunks)} chunks from {len(notes)} notes")
-        return all_chunks
+            
+            yield from chunks
     
-    def _semantic_chunk(self, content: str) -> List[str]:
+    def _semantic_chunk(
+        self,
+        content: str,
+        content_words: List[str],
+        content_tokens: float
+    ) -> List[Tuple[str, str]]:
         """
         Perform semantic chunking based on structure
         
         Strategy:
         1. Split by headers (# Header, ## Subheader)
         2. If sections are too large, split by paragraphs
-        3. Add overlap between chunks
+        3. Record the overlap with the previous chunk
+        
+        Each piece of text is split into words and measured once;
+        (text, words, tokens) triples are carried through the pipeline and
+        (text, overlap) pairs are returned.
         
         Args:
             content: Text content to chunk
+            content_words: content.split(), already computed by the caller
+            content_tokens: Token count of content, already computed by the caller
         
         Returns:
-            List of chunk texts
+            List of (chunk text, overlap prefix)
         """
         # Split by headers first
         sections = self._split_by_headers(content)
         
-        chunks = []
+        chunks: List[Tuple[str, List[str], float]] = []
         
         for section in sections:
-            section_words = len(section.split())
+            if section is content:
+                section_words, section_tokens = content_words, content_tokens
+            else:
+                section_words = section.split()
+                section_tokens = self._count_tokens(section, section_words)
             
-            if section_words <= self.words_per_chunk:
+            if section_tokens <= self.tokens_per_chunk:
                 # Section is small enough
-                if section_words >= self.min_words:
-                    chunks.append(section)
+                if section_tokens >= self.min_tokens:
+                    chunks.append((section, section_words, section_tokens))
             else:
                 # Section is too large, split by paragraphs
-                para_chunks = self._split_by_paragraphs(section)
+                para_chunks = self._split_by_paragraphs(section, section_words, section_tokens)
                 chunks.extend(para_chunks)
         
-        # Add overlap
-        chunks = self._add_overlap(chunks)
-        
-        return chunks
+        return self._overlap_prefixes(chunks)
     
     def _split_by_headers(self, content: str) -> List[str]:
         """Split content by markdown headers"""
-        # Pattern for headers: # Header or ## Subheader
-        header_pattern = r'^#{1,6}\s+.+$'
-        
         lines = content.split('\n')
         sections = []
         current_section = []
         
         for line in lines:
-            if re.match(header_pattern, line):
+            # startswith() rejects most lines without entering the regex engine
+            if line.startswith('#') and self.HEADER_PATTERN.match(line):
                 # Start new section
                 if current_section:
                     sections.append('\n'.join(current_section).strip())
@@ -156,105 +212,114 @@ class ChunkingService:
         
         return sections
     
-    def _split_by_paragraphs(self, content: str) -> List[str]:
+    def _split_by_paragraphs(
+        self,
+        content: str,
+        content_words: List[str],
+        content_tokens: float
+    ) -> List[Tuple[str, List[str], float]]:
         """
         Split content by paragraphs when sections are too large
         
         Args:
             content: Text to split
+            content_words: content.split(), already computed by the caller
+            content_tokens: Token count of content, already computed by the caller
         
         Returns:
-            List of chunk texts
+            List of (chunk text, chunk words, chunk tokens)
         """
         # Split by double newlines (paragraphs)
-        paragraphs = re.split(r'\n\n+', content)
+        paragraphs = self.PARAGRAPH_PATTERN.split(content)
         
         chunks = []
         current_chunk = []
-        current_words = 0
+        current_words: List[str] = []
+        current_tokens = 0
         
         for para in paragraphs:
             para = para.strip()
             if not para:
                 continue
             
-            para_words = len(para.split())
+            para_words = para.split()
+            # Paragraphs are joined on whitespace, so token counts add up
+            para_tokens = self._count_tokens(para, para_words)
             
-            if current_words + para_words > self.words_per_chunk:
+            if current_tokens + para_tokens > self.tokens_per_chunk:
                 # Save current chunk
                 if current_chunk:
-                    chunks.append('\n\n'.join(current_chunk))
+                    chunks.append(('\n\n'.join(current_chunk), current_words, current_tokens))
                 current_chunk = [para]
-                current_words = para_words
+                current_words = list(para_words)
+                current_tokens = para_tokens
             else:
                 current_chunk.append(para)
-                current_words += para_words
+                current_words.extend(para_words)
+                current_tokens += para_tokens
         
         # Add remaining chunk
-        if current_chunk:
-            chunk_text = '\n\n'.join(current_chunk)
-            if len(chunk_text.split()) >= self.min_words:
-                chunks.append(chunk_text)
+        if current_chunk and current_tokens >= self.min_tokens:
+            chunks.append(('\n\n'.join(current_chunk), current_words, current_tokens))
         
-        return chunks if chunks else [content]
+        return chunks if chunks else [(content, content_words, content_tokens)]
     
-    def _add_overlap(self, chunks: List[str]) -> List[str]:
+    def _overlap_prefixes(self, chunks: List[Tuple[str, List[str], float]]) -> List[Tuple[str, str]]:
         """
-        Add overlap between consecutive chunks for context continuity
+        Pair each chunk with the tail of its predecessor for context continuity
+        
+        The overlap is kept separate from the chunk text: it is prepended
+        only when embedding, so stored documents (and the LLM context built
+        from them) do not repeat the previous chunk's words.
         
         Args:
-            chunks: List of chunk texts
+            chunks: List of (chunk text, chunk words, chunk tokens)
         
         Returns:
-            List of chunks with overlap
+            List of (chunk text, overlap prefix); the prefix is "" when there is none
         """
-        if len(chunks) <= 1:
-            return chunks
+        result = []
         
-        overlapped_chunks = []
-        
-        for i, chunk in enumerate(chunks):
-            if i == 0:
-                # First chunk - no prefix overlap
-                overlapped_chunks.append(chunk)
-            else:
-                # Add overlap from previous chunk
-                prev_chunk = chunks[i - 1]
-                prev_words = prev_chunk.split()
+        for i, (chunk, _, _) in enumerate(chunks):
+            overlap = ""
+            if i > 0:
+                # Words were split and measured once, upstream
+                _, prev_words, prev_tokens = chunks[i - 1]
                 
-                if len(prev_words) > self.overlap_words:
-                    # Get last N words from previous chunk
-                    overlap = ' '.join(prev_words[-self.overlap_words:])
-                    overlapped_chunk = f"{overlap} ... {chunk}"
-                else:
-                    overlapped_chunk = chunk
-                
-                overlapped_chunks.append(overlapped_chunk)
+                if prev_tokens > self.overlap_tokens:
+                    # Last words of the previous chunk, about overlap_tokens long
+                    n_words = int(len(prev_words) * self.overlap_tokens / prev_tokens)
+                    if n_words:
+                        overlap = ' '.join(prev_words[-n_words:])
+            
+            result.append((chunk, overlap))
         
-        return overlapped_chunks
+        return result
     
     def _create_chunk(
         self,
         note: Note,
         text: str,
         index: int,
-        total: int
-    ) -> Chunk:
+        total: int,
+        overlap: str = ""
+    ) -> ChunkFast:
         """
-        Create a Chunk object from text and note metadata
+        Create a chunk object from text and note metadata
         
         Args:
             note: Parent note
             text: Chunk text
             index: Chunk index
             total: Total chunks for this note
+            overlap: Tail of the previous chunk, used only for embedding
         
         Returns:
-            Chunk object
+            ChunkFast object (no validation; fields come from a validated Note)
         """
         chunk_id = f"{note.id}_chunk_{index}"
         
-        return Chunk(
+        return ChunkFast(
             id=chunk_id,
             note_id=note.id,
             text=text.strip(),
@@ -264,7 +329,9 @@ class ChunkingService:
             category=note.category,
             book=note.book,
             file_path=note.file_path,
-            links=note.links
+            links=note.links,
+            word_count=note.word_count,
+            overlap=overlap
         )
 
 
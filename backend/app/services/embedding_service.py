@@ -4,14 +4,86 @@ Generates vector embeddings for text chunks using sentence-transformers
 """
 
 import numpy as np
-from typing import List, Optional
+import hashlib
+import os
+import queue
+import threading
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import logging
 from sentence_transformers import SentenceTransformer
 
 from app.models.note import Chunk
+from app.models.note_fast import ChunkFast
+from app.utils.cache import LRUCache
+from app.utils.quantization import QUANTIZATION_MODES, quantize
+
+if TYPE_CHECKING:
+    from app.services.vector_db import VectorDBService
 
 logger = logging.getLogger(__name__)
 
+# Inference backends supported by SentenceTransformer(backend=...)
+EMBEDDING_BACKENDS = ("torch", "onnx", "openvino")
+
+# Pre-exported dynamic INT8 ONNX weights (published for all-MiniLM-L6-v2 on the Hub)
+_ONNX_INT8_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+# End-of-stream marker passed between embed_and_index pipeline stages
+_PIPELINE_DONE = object()
+
+# Chunks indexed between embed_and_index progress log lines
+PROGRESS_LOG_INTERVAL = 5000
+
+# Texts longer than this are cached under a digest instead of the text itself
+_CACHE_KEY_MAX_CHARS = 256
+
+
+def _text_cache_key(text: str):
+    """Cache key for a query text: the text itself, or a digest if it is long"""
+    if len(text) <= _CACHE_KEY_MAX_CHARS:
+        return text
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def _select_device(device: Optional[str] = None) -> str:
+    """
+    Pick the torch device for the embedding model
+    
+    An explicit device is used as given; otherwise CUDA, then Apple MPS,
+    then CPU. On CPU, torch is allowed every core and oneDNN is enabled.
+    
+    Args:
+        device: 'cuda', 'mps', 'cpu', or None for auto
+    
+    Returns:
+        Device name to pass to SentenceTransformer
+    """
+    import torch
+    
+    if device is None:
+        if torch.cuda.is_available():
+            device = "cuda"
+        elif torch.backends.mps.is_available():
+            device = "mps"
+        else:
+            device = "cpu"
+    
+    if device == "cpu":
+        # torch defaults to physical cores only; encode() is compute-bound
+        torch.set_num_threads(os.cpu_count() or 1)
+        torch.backends.mkldnn.enabled = True
+    
+    return device
+
+
+def _embedding_input(chunk: Union[Chunk, ChunkFast]) -> str:
+    """Model input for a chunk: its overlap prefix (if any) followed by its text"""
+    if chunk.overlap:
+        return f"{chunk.overlap} ... {chunk.text}"
+    return chunk.text
+
 
 class EmbeddingService:
     """Service for generating text embeddings"""
@@ -20,7 +92,11 @@ class EmbeddingService:
         self,
         model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
         batch_size: int = 32,
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        quantization: str = "fp32",
+        backend: str = "torch",
+        int8_inference: bool = False,
+        tokenize_cache_dir: Optional[Path] = None
     ):
         """
         Initialize embedding service
@@ -28,20 +104,194 @@ class EmbeddingService:
         Args:
             model_name: Sentence transformer model to use
             batch_size: Batch size for encoding
-            device: Device to run model on ('cuda', 'cpu', or None for auto)
+            device: Device to run model on ('cuda', 'mps', 'cpu', or None for auto);
+                with the torch backend, GPU/MPS models run with FP16 weights
+            quantization: Storage precision for chunk embeddings ('fp32', 'fp16' or 'int8')
+            backend: Inference backend ('torch', 'onnx' or 'openvino'); ONNX Runtime
+                and OpenVINO are usually 2-3x faster than PyTorch on CPU
+            int8_inference: With the ONNX backend, run dynamically quantized INT8 weights
+            tokenize_cache_dir: Directory for per-chunk token ids (torch backend only);
+                re-embedding unchanged chunks then skips the tokenizer
         """
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"quantization must be one of {QUANTIZATION_MODES}, got '{quantization}'")
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"backend must be one of {EMBEDDING_BACKENDS}, got '{backend}'")
+        
         self.model_name = model_name
         self.batch_size = batch_size
+        self.quantization = quantization
+        self.backend = backend
+        
+        # LRU cache of normalized query embeddings, stored as immutable tuples
+        self._text_cache = LRUCache(max_size=1024)
+        
+        # On-disk token ids of chunk texts, one .npz per text (separate per model)
+        self._tokenize_cache_dir: Optional[Path] = None
+        if tokenize_cache_dir is not None:
+            if backend == "torch":
+                self._tokenize_cache_dir = Path(tokenize_cache_dir) / model_name.replace("/", "__")
+                self._tokenize_cache_dir.mkdir(parents=True, exist_ok=True)
+            else:
+                logger.warning(f"⚠  Tokenization cache needs the torch backend; ignored for '{backend}'")
         
-        logger.info(f"Loading embedding model: {model_name}")
+        model_kwargs = None
+        if backend == "onnx" and int8_inference:
+            model_kwargs = {"file_name": _ONNX_INT8_FILE}
+        
+        if backend == "torch":
+            device = _select_device(device)
+        
+        logger.info(f"Loading embedding model: {model_name} (backend: {backend}, device: {device})")
         
         try:
-            self.model = SentenceTransformer(model_name, device=device)
+            self.model = SentenceTransformer(
+                model_name,
+                device=device,
+                backend=backend,
+                model_kwargs=model_kwargs
+            )
+            if backend == "torch" and device != "cpu":
+                # Half-precision weights: half the memory traffic, tensor-core GEMMs
+                self.model.half()
             self.embedding_dim = self.model.get_sentence_embedding_dimension()
             logger.info(f"Model loaded successfully. Embedding dimension: {self.embedding_dim}")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
+        
+        self.warmup()
+    
+    def warmup(self):
+        """
+        Run one full-size dummy batch so lazy kernel setup happens now
+        
+        cuDNN autotuning and oneDNN JIT otherwise run on the first real
+        request, making it several times slower than steady state.
+        """
+        self._encode(["warmup"] * self.batch_size)
+        
+        if self.model.device.type == "cuda":
+            import torch
+            torch.cuda.synchronize()
+        
+        logger.info("✓ Embedding model warmed up")
+    
+    def _encode(
+        self,
+        texts: Union[str, List[str]],
+        batch_size: Optional[int] = None,
+        normalize: bool = True,
+        show_progress: bool = False
+    ) -> np.ndarray:
+        """
+        Run the model and return FP32 NumPy embeddings
+        
+        An FP16 model yields float16 arrays; they are cast back to FP32
+        here so quantization and ChromaDB always see the same dtype.
+        """
+        embeddings = self.model.encode(
+            texts,
+            batch_size=batch_size or self.batch_size,
+            show_progress_bar=show_progress,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize
+        )
+        return embeddings.astype(np.float32, copy=False)
+    
+    def _encode_chunk_texts(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        show_progress: bool = False
+    ) -> np.ndarray:
+        """Encode chunk texts, reusing cached token ids when a cache dir is set"""
+        if self._tokenize_cache_dir is None:
+            return self._encode(texts, batch_size=batch_size, show_progress=show_progress)
+        
+        return self._forward_tokenized(self._tokenize_cached(texts), batch_size=batch_size)
+    
+    def _tokenize_cached(self, texts: List[str]) -> List[Dict[str, np.ndarray]]:
+        """
+        Tokenize texts, loading previously saved token ids from disk
+        
+        Args:
+            texts: Chunk texts
+        
+        Returns:
+            Unpadded tokenizer features (input_ids, attention_mask, ...) per text
+        """
+        paths = [
+            self._tokenize_cache_dir / f"{hashlib.blake2b(text.encode(), digest_size=16).hexdigest()}.npz"
+            for text in texts
+        ]
+        features: List[Optional[Dict[str, np.ndarray]]] = [None] * len(texts)
+        misses: List[int] = []
+        
+        for i, path in enumerate(paths):
+            if path.exists():
+                with np.load(path) as data:
+                    features[i] = {key: data[key] for key in data.files}
+            else:
+                misses.append(i)
+        
+        if misses:
+            tokenized = self.model.tokenize([texts[i] for i in misses])
+            lengths = tokenized["attention_mask"].sum(dim=1).tolist()
+            
+            # Strip (right) padding so each text is stored at its own length
+            for row, (i, length) in enumerate(zip(misses, lengths)):
+                features[i] = {key: value[row, :length].numpy() for key, value in tokenized.items()}
+                np.savez(paths[i], **features[i])
+        
+        return features
+    
+    def _forward_tokenized(
+        self,
+        features: List[Dict[str, np.ndarray]],
+        batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Run the model on pre-tokenized texts, bypassing encode()
+        
+        Texts are length-sorted and padded per batch like encode() does;
+        pooled embeddings are L2-normalized and returned as FP32.
+        
+        Args:
+            features: Unpadded tokenizer features per text
+            batch_size: Texts per forward pass (default: self.batch_size)
+        
+        Returns:
+            NumPy array of shape (len(features), embedding_dim), in input order
+        """
+        import torch
+        import torch.nn.functional as F
+        
+        batch_size = batch_size or self.batch_size
+        pad_token_id = self.model.tokenizer.pad_token_id or 0
+        
+        embeddings = np.empty((len(features), self.embedding_dim), dtype=np.float32)
+        order = sorted(range(len(features)), key=lambda i: -len(features[i]["input_ids"]))
+        
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            max_len = len(features[indices[0]]["input_ids"])
+            
+            batch = {}
+            for key in features[indices[0]]:
+                padded = np.full((len(indices), max_len), pad_token_id if key == "input_ids" else 0, dtype=np.int64)
+                for row, i in enumerate(indices):
+                    values = features[i][key]
+                    padded[row, :len(values)] = values
+                batch[key] = torch.from_numpy(padded).to(self.model.device)
+            
+            with torch.inference_mode():
+                pooled = self.model.forward(batch)["sentence_embedding"]
+                pooled = F.normalize(pooled.float(), p=2, dim=1)
+            
+            embeddings[indices] = pooled.cpu().numpy()
+        
+        return embeddings
     
     def embed_text(self, text: str) -> List[float]:
         """
@@ -53,15 +303,72 @@ class EmbeddingService:
         Returns:
             Embedding vector as list of floats
         """
+        key = _text_cache_key(text)
+        cached = self._text_cache.get(key)
+        if cached is not None:
+            return list(cached)
+        
+        embedding = self._embed_text_uncached(text)
+        self._text_cache.set(key, tuple(embedding))
+        return embedding
+    
+    def embed_text_np(self, text: str) -> np.ndarray:
+        """
+        Generate a normalized embedding for a single text as an FP32 array
+        
+        Args:
+            text: Text to embed
+        
+        Returns:
+            NumPy vector of shape (embedding_dim,)
+        """
+        return np.asarray(self.embed_text(text), dtype=np.float32)
+    
+    def rank(
+        self,
+        query: str,
+        matrix: np.ndarray,
+        top_k: int = 10,
+        scale: Optional[Union[float, np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank candidate embeddings against a query with one BLAS matrix-vector product
+        
+        Rows of `matrix` are normalized embeddings, so the dot product is the
+        exact cosine similarity.
+        
+        Args:
+            query: Query text
+            matrix: Candidate embeddings, shape (n, dim), float32 or int8
+            top_k: Number of best candidates to return
+            scale: Dequantization scale for int8 rows (scalar or one per row)
+        
+        Returns:
+            Tuple of (row indices, cosine scores), best first
+        """
+        q = self.embed_text_np(query)
+        
+        if matrix.dtype == np.int8:
+            scores = matrix.astype(np.float32) @ q
+            if scale is not None:
+                scores *= scale
+        else:
+            scores = np.ascontiguousarray(matrix, dtype=np.float32) @ q
+        
+        # O(n) selection, then sort only the top_k survivors
+        if top_k < len(scores):
+            idx = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            idx = np.arange(len(scores))
+        idx = idx[np.argsort(-scores[idx])]
+        
+        return idx, scores[idx]
+    
+    def _embed_text_uncached(self, text: str) -> List[float]:
+        """Run the model on a single text"""
         try:
-            embedding = self.model.encode(
-                text,
-                convert_to_numpy=True,
-                show_progress_bar=False
-            )
-            
-            # Normalize for cosine similarity
-            embedding = embedding / np.linalg.norm(embedding)
+            # Normalized inside encode() for cosine similarity
+            embedding = self._encode(text)
             
             return embedding.tolist()
         
@@ -71,9 +378,9 @@ class EmbeddingService:
     
     def embed_chunks(
         self,
-        chunks: List[Chunk],
+        chunks: List[Union[Chunk, ChunkFast]],
         show_progress: bool = True
-    ) -> List[Chunk]:
+    ) -> List[Union[Chunk, ChunkFast]]:
         """
         Generate embeddings for multiple chunks
         
@@ -90,24 +397,13 @@ class EmbeddingService:
         logger.info(f"Generating embeddings for {len(chunks)} chunks...")
         
         # Extract texts
-        texts = [chunk.text for chunk in chunks]
+        texts = [_embedding_input(chunk) for chunk in chunks]
         
         try:
-            # Generate embeddings in batches
-            embeddings = self.model.encode(
-                texts,
-                batch_size=self.batch_size,
-                show_progress_bar=show_progress,
-                convert_to_numpy=True
-            )
+            # Generate normalized embeddings in batches
+            embeddings = self._encode_chunk_texts(texts, show_progress=show_progress)
             
-            # Normalize embeddings
-            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-            embeddings = embeddings / norms
-            
-            # Add embeddings to chunks
-            for i, chunk in enumerate(chunks):
-                chunk.embedding = embeddings[i].tolist()
+            self._attach_embeddings(chunks, embeddings)
             
             logger.info(f"Successfully generated {len(chunks)} embeddings")
             return chunks
@@ -116,6 +412,139 @@ class EmbeddingService:
             logger.error(f"Error generating embeddings: {e}")
             raise
     
+    def embed_chunk_stream(
+        self,
+        chunks: Iterable[Union[Chunk, ChunkFast]],
+        batch_size: Optional[int] = None
+    ) -> Iterator[Union[Chunk, ChunkFast]]:
+        """
+        Embed chunks from an iterable, one batch at a time
+        
+        Only one batch of chunks and embeddings is resident at once, so
+        a chunk generator can be embedded without materializing it.
+        
+        Args:
+            chunks: Iterable of chunk objects
+            batch_size: Chunks pulled per encode call (default: self.batch_size)
+        
+        Yields:
+            Chunk objects with embeddings populated, in input order
+        """
+        batch_size = batch_size or self.batch_size
+        iterator = iter(chunks)
+        
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            
+            embeddings = self._encode_chunk_texts([_embedding_input(chunk) for chunk in batch], batch_size=batch_size)
+            self._attach_embeddings(batch, embeddings)
+            
+            yield from batch
+    
+    def embed_and_index(
+        self,
+        chunks: Iterable[Union[Chunk, ChunkFast]],
+        vector_db: "VectorDBService",
+        batch_size: int = 1000,
+        queue_size: int = 4
+    ) -> int:
+        """
+        Embed chunks and insert them into ChromaDB in large batches
+        
+        Runs as a three-stage pipeline so the stages overlap: a producer
+        thread pulls batches from the (lazy) chunk iterable, the calling
+        thread encodes them, and an inserter thread writes finished batches
+        to ChromaDB. Bounded queues between stages provide backpressure.
+        Each batch's FP32 array is handed straight to the collection, so
+        no per-chunk embedding list is ever built.
+        
+        Args:
+            chunks: Iterable of chunk objects (e.g. ChunkingService.iter_chunks)
+            vector_db: Vector database to insert into
+            batch_size: Chunks encoded and inserted per batch
+            queue_size: Batches buffered between consecutive stages
+        
+        Returns:
+            Number of chunks indexed
+        """
+        pending: queue.Queue = queue.Queue(maxsize=queue_size)
+        encoded: queue.Queue = queue.Queue(maxsize=queue_size)
+        errors: List[BaseException] = []
+        indexed = 0
+        last_logged = 0
+        
+        def produce():
+            try:
+                iterator = iter(chunks)
+                while batch := list(islice(iterator, batch_size)):
+                    pending.put(batch)
+                    if errors:
+                        break
+            except Exception as e:
+                errors.append(e)
+            finally:
+                pending.put(_PIPELINE_DONE)
+        
+        def insert():
+            nonlocal indexed, last_logged
+            while (item := encoded.get()) is not _PIPELINE_DONE:
+                # After a failure keep draining so upstream stages never block
+                if errors:
+                    continue
+                try:
+                    indexed += vector_db.add_embeddings(*item)
+                    if indexed - last_logged >= PROGRESS_LOG_INTERVAL and logger.isEnabledFor(logging.INFO):
+                        logger.info(f"  Indexed {indexed} chunks")
+                        last_logged = indexed
+                except Exception as e:
+                    errors.append(e)
+        
+        producer = threading.Thread(target=produce, name="ingest-chunker", daemon=True)
+        inserter = threading.Thread(target=insert, name="ingest-inserter", daemon=True)
+        producer.start()
+        inserter.start()
+        
+        try:
+            while (batch := pending.get()) is not _PIPELINE_DONE:
+                if errors:
+                    continue
+                try:
+                    embeddings = self._encode_chunk_texts([_embedding_input(chunk) for chunk in batch])
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                encoded.put((batch, embeddings))
+        finally:
+            encoded.put(_PIPELINE_DONE)
+            inserter.join()
+        
+        if errors:
+            logger.error(f"Embedding pipeline failed: {errors[0]}")
+            raise errors[0]
+        
+        logger.info(f"✓ Embedded and indexed {indexed} chunks")
+        return indexed
+    
+    def _attach_embeddings(self, chunks: list, embeddings: np.ndarray):
+        """
+        Quantize embeddings and store them on their chunks
+        
+        The batch is quantized as one contiguous array and each chunk keeps
+        a row view into it, so no per-chunk Python float list is built;
+        vector_db.add_chunks() stacks the rows back into a single array and
+        save_chunks() serializes them directly with orjson.
+        """
+        # Shrink stored chunk embeddings (query embeddings stay fp32)
+        embeddings, scale = quantize(embeddings, self.quantization)
+        embeddings = np.ascontiguousarray(embeddings)
+        
+        # Add embeddings to chunks
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk.embedding = embedding
+            chunk.embedding_scale = scale
+    
     def embed_batch(
         self,
         texts: List[str],
@@ -131,16 +560,47 @@ class EmbeddingService:
         Returns:
             NumPy array of embeddings
         """
-        embeddings = self.model.encode(
-            texts,
-            batch_size=self.batch_size,
-            show_progress_bar=False,
-            convert_to_numpy=True
-        )
+        return self._encode(texts, normalize=normalize)
+    
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate normalized embeddings for several texts in one forward pass
+        
+        Texts already in the embedding cache are not re-encoded; only the
+        misses go through the model.
+        
+        Args:
+            texts: List of text strings
+        
+        Returns:
+            List of embedding vectors, in input order
+        """
+        if not texts:
+            return []
+        
+        keys = [_text_cache_key(text) for text in texts]
+        embeddings: List[Optional[List[float]]] = []
+        misses: List[int] = []
         
-        if normalize:
-            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-            embeddings = embeddings / norms
+        for i, key in enumerate(keys):
+            cached = self._text_cache.get(key)
+            embeddings.append(list(cached) if cached is not None else None)
+            if cached is None:
+                misses.append(i)
+        
+        if not misses:
+            return embeddings
+        
+        try:
+            encoded = self.embed_batch([texts[i] for i in misses], normalize=True).tolist()
+        
+        except Exception as e:
+            logger.error(f"Error embedding texts: {e}")
+            raise
+        
+        for i, embedding in zip(misses, encoded):
+            embeddings[i] = embedding
+            self._text_cache.set(keys[i], tuple(embedding))
         
         return embeddings
     
@@ -153,9 +613,11 @@ class EmbeddingService:
         """
         return {
             "model_name": self.model_name,
+            "backend": self.backend,
             "embedding_dimension": self.embedding_dim,
             "max_sequence_length": self.model.max_seq_length,
-            "device": str(self.model.device)
+            "device": str(self.model.device),
+            "cache": self._text_cache.stats()
         }
 
 
@@ -178,7 +640,11 @@ def get_embedding_service(
     global _embedding_service
     
     if _embedding_service is None:
-        _embedding_service = EmbeddingService(model_name=model_name)
+        _embedding_service = EmbeddingService(
+            model_name=model_name,
+            backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+            int8_inference=os.getenv("EMBEDDING_INT8", "").lower() in ("1", "true", "yes")
+        )
     
     return _embedding_service
 
@@ -229,12 +695,9 @@ if __name__ == "__main__":
     # Test similarity
     print("\n=== Similarity Test ===")
     query = "What is consciousness?"
-    query_emb = service.embed_text(query)
-    query_emb = np.array(query_emb)
-    
-    similarities = np.dot(embeddings, query_emb)
+    indices, similarities = service.rank(query, embeddings, top_k=len(test_texts))
     
     print(f"Query: {query}")
-    for i, (text, sim) in enumerate(zip(test_texts, similarities)):
-        print(f"{i+1}. [{sim:.3f}] {text}")
+    for rank, (i, sim) in enumerate(zip(indices, similarities)):
+        print(f"{rank+1}. [{sim:.3f}] {test_texts[i]}")
 
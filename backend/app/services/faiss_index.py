@@ -0,0 +1,227 @@
+"""
+FAISS ANN Index
+Optional approximate nearest-neighbour index over the ChromaDB embeddings
+"""
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+import logging
+
+import numpy as np
+import orjson
+
+try:
+    import faiss
+except ImportError:  # Optional dependency (pip install faiss-cpu)
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+# Below this size HNSW (best recall/latency) is preferred over IVF-PQ
+HNSW_MAX_VECTORS = 100_000
+
+# Quantizers (SQ8 ranges, IVF-PQ codebooks) are trained on a sample of at most this many vectors
+TRAIN_SAMPLE_SIZE = 10_000
+
+# Default index types: int8 scalar-quantized HNSW, and product quantization (48 bytes/vector)
+HNSW_INDEX_SPEC = "HNSW32,SQ8"
+PQ_INDEX_SPEC = "IVF256,PQ48"
+
+
+def default_index_spec(n_vectors: int) -> str:
+    """
+    Pick a faiss.index_factory string for a collection size
+
+    Args:
+        n_vectors: Number of vectors to index
+
+    Returns:
+        "HNSW32,SQ8" for small collections, "IVF256,PQ48" (48-byte codes) for large ones.
+        SQ8 stores each dimension as int8 between trained per-dimension
+        min/max bounds, a quarter of the FP32 size; reranking rescores the
+        candidates against the FP32 embeddings kept in ChromaDB.
+    """
+    return HNSW_INDEX_SPEC if n_vectors < HNSW_MAX_VECTORS else PQ_INDEX_SPEC
+
+
+class FaissIndex:
+    """
+    FAISS index persisted next to the ChromaDB data
+
+    Embeddings are L2-normalized, so inner product equals cosine similarity
+    and `1 - score` matches ChromaDB's cosine distance. The index only holds
+    vectors; documents and metadata stay in ChromaDB.
+    """
+
+    def __init__(self, index_dir: Path, index_spec: Optional[str] = None, nprobe: int = 10):
+        """
+        Initialize FAISS index wrapper
+
+        Args:
+            index_dir: Directory where the index and its id map are stored
+            index_spec: faiss.index_factory string (None = chosen from collection size)
+            nprobe: IVF cells (or HNSW efSearch / 4) scanned per query by default
+        """
+        if faiss is None:
+            raise ImportError("faiss is not installed (pip install faiss-cpu)")
+
+        self.index_dir = Path(index_dir)
+        self.index_spec = index_spec
+        self.nprobe = nprobe
+
+        self.index = None
+        self.ids: List[str] = []
+        self._id_set: set = set()
+
+    @property
+    def is_quantized(self) -> bool:
+        """Whether stored vectors are lossy codes (SQ/PQ), so scores are approximate"""
+        return any(part.startswith(("SQ", "PQ")) for part in (self.index_spec or "").split(","))
+
+    @property
+    def index_file(self) -> Path:
+        return self.index_dir / "faiss.index"
+
+    @property
+    def meta_file(self) -> Path:
+        return self.index_dir / "faiss_ids.json"
+
+    def build(self, ids: List[str], embeddings):
+        """
+        Create, train (if needed) and fill the index
+
+        Args:
+            ids: Chunk ids, aligned with embeddings
+            embeddings: Array-like of shape (n, dim)
+        """
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+
+        spec = self.index_spec or default_index_spec(len(ids))
+        index = faiss.index_factory(vectors.shape[1], spec, faiss.METRIC_INNER_PRODUCT)
+
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > TRAIN_SAMPLE_SIZE:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(len(vectors), TRAIN_SAMPLE_SIZE, replace=False)]
+            index.train(sample)
+
+        index.add(vectors)
+
+        self.index = index
+        self.index_spec = spec
+        self.ids = list(ids)
+        self._id_set = set(self.ids)
+
+        logger.info(f"✓ Built FAISS index '{spec}': {len(ids)} vectors")
+
+    def add(self, ids: List[str], embeddings) -> int:
+        """
+        Append vectors to an existing index, skipping ids already present
+
+        Args:
+            ids: Chunk ids, aligned with embeddings
+            embeddings: Array-like of shape (n, dim)
+
+        Returns:
+            Number of vectors added
+        """
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._id_set]
+        if not keep:
+            return 0
+
+        vectors = np.ascontiguousarray(vectors[keep])
+        faiss.normalize_L2(vectors)
+        self.index.add(vectors)
+
+        new_ids = [ids[i] for i in keep]
+        self.ids.extend(new_ids)
+        self._id_set.update(new_ids)
+        return len(new_ids)
+
+    def save(self):
+        """Persist the index and its id map"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        faiss.write_index(self.index, str(self.index_file))
+        self.meta_file.write_bytes(orjson.dumps({"spec": self.index_spec, "ids": self.ids}))
+
+    def load(self, expected_count: int) -> bool:
+        """
+        Load a persisted index if it matches the collection size and spec
+
+        Args:
+            expected_count: Current number of chunks in ChromaDB
+
+        Returns:
+            True if the index was loaded
+        """
+        if not (self.index_file.exists() and self.meta_file.exists()):
+            return False
+
+        try:
+            meta = orjson.loads(self.meta_file.read_bytes())
+            if len(meta["ids"]) != expected_count:
+                logger.info("FAISS index is out of date with the collection; rebuilding")
+                return False
+            expected_spec = self.index_spec or default_index_spec(expected_count)
+            if meta["spec"] != expected_spec:
+                logger.info(f"FAISS index spec changed to '{expected_spec}'; rebuilding")
+                return False
+
+            self.index = faiss.read_index(str(self.index_file))
+            self.index_spec = meta["spec"]
+            self.ids = meta["ids"]
+            self._id_set = set(self.ids)
+            logger.info(f"✓ Loaded FAISS index '{self.index_spec}': {len(self.ids)} vectors")
+            return True
+
+        except Exception as e:
+            logger.warning(f"Could not load FAISS index: {e}")
+            return False
+
+    def _set_search_breadth(self, nprobe: int, k: int):
+        """Apply the recall/latency knob to whichever index type is in use"""
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            ivf.nprobe = nprobe
+            return
+
+        hnsw = getattr(self.index, "hnsw", None)
+        if hnsw is not None:
+            # efSearch must be >= k; scale nprobe into a comparable range
+            hnsw.efSearch = max(k, 16, nprobe * 4)
+
+    def search(
+        self,
+        query_embeddings: List[List[float]],
+        k: int,
+        nprobe: Optional[int] = None
+    ) -> Tuple[List[List[str]], List[List[float]]]:
+        """
+        Find the k nearest chunks for each query
+
+        Args:
+            query_embeddings: Normalized query vectors
+            k: Number of neighbours per query
+            nprobe: Search breadth (higher = better recall, slower)
+
+        Returns:
+            Tuple of (ids per query, cosine distances per query)
+        """
+        self._set_search_breadth(nprobe or self.nprobe, k)
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        scores, positions = self.index.search(queries, k)
+
+        all_ids: List[List[str]] = []
+        all_distances: List[List[float]] = []
+
+        for row_scores, row_positions in zip(scores.tolist(), positions.tolist()):
+            # FAISS pads with -1 when fewer than k candidates were found
+            hits = [(self.ids[p], 1.0 - s) for s, p in zip(row_scores, row_positions) if p >= 0]
+            all_ids.append([chunk_id for chunk_id, _ in hits])
+            all_distances.append([distance for _, distance in hits])
+
+        return all_ids, all_distances
@@ -0,0 +1,139 @@
+"""
+Keyword Index
+Optional sparse bag-of-words matrix over the ChromaDB documents, for reranking
+"""
+
+from pathlib import Path
+from typing import Iterable, List, Optional
+import logging
+
+import numpy as np
+import orjson
+
+try:
+    import scipy.sparse as sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+except ImportError:  # Optional dependency (pip install scikit-learn)
+    sparse = None
+    CountVectorizer = None
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordIndex:
+    """
+    Binary word-presence matrix (chunks x vocabulary) persisted next to the ChromaDB data
+
+    Words are lowercased, whitespace-separated tokens, exactly as the
+    reranker splits queries, so a row slice summed over the query's columns
+    gives the same overlap counts as intersecting per-chunk word sets.
+    """
+
+    def __init__(self, index_dir: Path):
+        """
+        Initialize keyword index wrapper
+
+        Args:
+            index_dir: Directory where the matrix and its id/vocabulary map are stored
+        """
+        if sparse is None:
+            raise ImportError("scikit-learn is not installed (pip install scikit-learn)")
+
+        self.index_dir = Path(index_dir)
+
+        self.matrix = None
+        self.ids: List[str] = []
+        self.vocabulary: dict = {}
+        self._rows: dict = {}
+
+    @property
+    def matrix_file(self) -> Path:
+        return self.index_dir / "keywords.npz"
+
+    @property
+    def meta_file(self) -> Path:
+        return self.index_dir / "keywords_meta.json"
+
+    def build(self, ids: List[str], texts: List[str]):
+        """
+        Fit the vocabulary and fill the matrix
+
+        Args:
+            ids: Chunk ids, aligned with texts
+            texts: Chunk texts
+        """
+        vectorizer = CountVectorizer(
+            lowercase=True,
+            tokenizer=str.split,
+            token_pattern=None,
+            binary=True,
+            dtype=np.float32
+        )
+        matrix = vectorizer.fit_transform(texts)
+
+        self._set(ids, sparse.csr_matrix(matrix), {word: int(col) for word, col in vectorizer.vocabulary_.items()})
+        logger.info(f"✓ Built keyword index: {len(ids)} chunks, {len(self.vocabulary)} words")
+
+    def _set(self, ids: List[str], matrix, vocabulary: dict):
+        """Install a matrix with its row ids and column vocabulary"""
+        self.matrix = matrix
+        self.ids = list(ids)
+        self.vocabulary = vocabulary
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+    def save(self):
+        """Persist the matrix and its id/vocabulary map"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        sparse.save_npz(self.matrix_file, self.matrix)
+        self.meta_file.write_bytes(orjson.dumps({"ids": self.ids, "vocabulary": self.vocabulary}))
+
+    def load(self, expected_count: int) -> bool:
+        """
+        Load a persisted index if it matches the collection size
+
+        Args:
+            expected_count: Current number of chunks in ChromaDB
+
+        Returns:
+            True if the index was loaded
+        """
+        if not (self.matrix_file.exists() and self.meta_file.exists()):
+            return False
+
+        try:
+            meta = orjson.loads(self.meta_file.read_bytes())
+            if len(meta["ids"]) != expected_count:
+                logger.info("Keyword index is out of date with the collection; rebuilding")
+                return False
+
+            self._set(meta["ids"], sparse.load_npz(self.matrix_file).tocsr(), meta["vocabulary"])
+            logger.info(f"✓ Loaded keyword index: {len(self.ids)} chunks, {len(self.vocabulary)} words")
+            return True
+
+        except Exception as e:
+            logger.warning(f"Could not load keyword index: {e}")
+            return False
+
+    def overlap_counts(self, query_words: Iterable[str], ids: List[str]) -> Optional[np.ndarray]:
+        """
+        Count how many of the query words occur in each chunk
+
+        Args:
+            query_words: Distinct lowercased query words
+            ids: Chunk ids to score
+
+        Returns:
+            Array of counts aligned with ids, or None if any id is not indexed
+        """
+        rows = [self._rows.get(chunk_id) for chunk_id in ids]
+        if any(row is None for row in rows):
+            return None
+
+        columns = [self.vocabulary[word] for word in query_words if word in self.vocabulary]
+        if not columns:
+            return np.zeros(len(ids))
+
+        # Rows of the candidates times the query's indicator vector, as one sparse product
+        query_vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        query_vector[columns] = 1.0
+        return np.asarray(self.matrix[rows] @ query_vector, dtype=np.float64)
@@ -3,13 +3,71 @@ LLM Service
 Unified interface for multiple LLM providers (Ollama, OpenAI, Anthropic, Google)
 """
 
-from typing import AsyncGenerator, Optional, Dict, Any
+from typing import AsyncGenerator, Awaitable, Callable, List, Optional, Dict, Any, Tuple
+import asyncio
+import functools
+import importlib
+import importlib.util
+import itertools
 import logging
 import os
+import re
+import time
 from abc import ABC, abstractmethod
 
+from app.services.response_cache import CACHE_MAX_TEMPERATURE, SEMANTIC_MAX_TEMPERATURE, ResponseCache
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx; pip install httpx[http2])
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
 logger = logging.getLogger(__name__)
 
+# Streaming paths yield to the event loop with asyncio.sleep(0) after every
+# chunk so concurrent streams interleave fairly. Never use a non-zero sleep
+# there: a 10 ms throttle more than halves token throughput.
+
+# One pooled HTTP client shared by the hosted-API SDKs (keep-alive, HTTP/2)
+_http_client = None
+
+
+def get_http_client():
+    """
+    Get or create the shared httpx.AsyncClient for provider SDKs
+    
+    Connections are kept alive between calls, so only the first request
+    to each provider pays for the TCP + TLS handshake.
+    
+    Returns:
+        httpx.AsyncClient instance
+    """
+    global _http_client
+    
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+        
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+        transport = httpx.AsyncHTTPTransport(http2=_HTTP2, retries=2, limits=limits)
+        _http_client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+    
+    return _http_client
+
+
+@functools.cache
+def _import_sdk(module: str):
+    """Import a provider SDK once; later calls are a cache lookup"""
+    return importlib.import_module(module)
+
+
+def _sdk_installed(module: str) -> bool:
+    """Check that a provider SDK is importable without importing it"""
+    return importlib.util.find_spec(module) is not None
+
 
 class BaseLLMProvider(ABC):
     """Base class for LLM providers"""
@@ -23,6 +81,29 @@ class BaseLLMProvider(ABC):
     async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
         """Generate a streaming response"""
         pass
+    
+    async def health_check(self) -> bool:
+        """Check whether the provider can currently serve requests"""
+        return True
+    
+    async def warm_up(self):
+        """Open a pooled connection ahead of the first real request"""
+        base_url = getattr(getattr(self, "client", None), "base_url", None)
+        if base_url is not None:
+            # Any response (even 404) leaves a TLS connection in the pool
+            await get_http_client().head(str(base_url))
+
+
+def _chat_messages(prompt: str, system: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Chat messages with the static system prompt first
+    
+    Keeping the unchanging part at the start lets OpenAI's automatic
+    prompt caching (prompts of 1024+ tokens) reuse the shared prefix.
+    """
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": prompt})
+    return messages
 
 
 class OllamaProvider(BaseLLMProvider):
@@ -40,8 +121,8 @@ class OllamaProvider(BaseLLMProvider):
         self.base_url = base_url
         
         try:
-            import ollama
-            self.client = ollama.Client(host=base_url)
+            # Async client: generation no longer blocks the event loop
+            self.client = _import_sdk("ollama").AsyncClient(host=base_url, timeout=60)
             logger.info(f"Ollama provider initialized: {model}")
         except ImportError:
             logger.error("ollama package not installed. Install with: pip install ollama")
@@ -53,9 +134,10 @@ class OllamaProvider(BaseLLMProvider):
     async def generate(self, prompt: str, **kwargs) -> str:
         """Generate complete response"""
         try:
-            response = self.client.generate(
+            response = await self.client.generate(
                 model=self.model,
                 prompt=prompt,
+                system=kwargs.get("system"),
                 options={
                     "temperature": kwargs.get("temperature", 0.7),
                     "top_p": kwargs.get("top_p", 0.9),
@@ -71,9 +153,10 @@ class OllamaProvider(BaseLLMProvider):
     async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
         """Generate streaming response"""
         try:
-            stream = self.client.generate(
+            stream = await self.client.generate(
                 model=self.model,
                 prompt=prompt,
+                system=kwargs.get("system"),
                 stream=True,
                 options={
                     "temperature": kwargs.get("temperature", 0.7),
@@ -82,13 +165,24 @@ class OllamaProvider(BaseLLMProvider):
                 }
             )
             
-            for chunk in stream:
-                if 'response' in chunk:
-                    yield chunk['response']
+            # Chunks arrive already decoded; one lookup each, empty pieces skipped
+            async for chunk in stream:
+                piece = chunk.get('response')
+                if piece:
+                    yield piece
+                    await asyncio.sleep(0)
         
         except Exception as e:
             logger.error(f"Ollama streaming error: {e}")
             raise
+    
+    async def health_check(self) -> bool:
+        """Ping the Ollama server (the client is created even when it is down)"""
+        try:
+            await self.client.list()
+            return True
+        except Exception:
+            return False
 
 
 class OpenAIProvider(BaseLLMProvider):
@@ -109,8 +203,9 @@ class OpenAIProvider(BaseLLMProvider):
             raise ValueError("OpenAI API key not provided")
         
         try:
-            from openai import AsyncOpenAI
-            self.client = AsyncOpenAI(api_key=self.api_key)
+            self.client = _import_sdk("openai").AsyncOpenAI(api_key=self.api_key, http_client=get_http_client())
+            # Bound once instead of walking client.chat.completions on every call
+            self._create = self.client.chat.completions.create
             logger.info(f"OpenAI provider initialized: {model}")
         except ImportError:
             logger.error("openai package not installed")
@@ -119,9 +214,9 @@ class OpenAIProvider(BaseLLMProvider):
     async def generate(self, prompt: str, **kwargs) -> str:
         """Generate complete response"""
         try:
-            response = await self.client.chat.completions.create(
+            response = await self._create(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=_chat_messages(prompt, kwargs.get("system")),
                 temperature=kwargs.get("temperature", 0.7),
                 max_tokens=kwargs.get("max_tokens", 1000)
             )
@@ -134,17 +229,19 @@ class OpenAIProvider(BaseLLMProvider):
     async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
         """Generate streaming response"""
         try:
-            stream = await self.client.chat.completions.create(
+            stream = await self._create(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=_chat_messages(prompt, kwargs.get("system")),
                 temperature=kwargs.get("temperature", 0.7),
                 max_tokens=kwargs.get("max_tokens", 1000),
                 stream=True
             )
             
             async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+                    await asyncio.sleep(0)
         
         except Exception as e:
             logger.error(f"OpenAI streaming error: {e}")
@@ -154,36 +251,68 @@ class OpenAIProvider(BaseLLMProvider):
 class AnthropicProvider(BaseLLMProvider):
     """Anthropic Claude API provider"""
     
-    def __init__(self, model: str = "claude-3-sonnet-20240229", api_key: Optional[str] = None):
+    def __init__(
+        self,
+        model: str = "claude-3-sonnet-20240229",
+        api_key: Optional[str] = None,
+        use_prompt_caching: bool = True
+    ):
         """
         Initialize Anthropic provider
         
         Args:
             model: Model name
             api_key: Anthropic API key (or from environment)
+            use_prompt_caching: Mark the static prompt prefix with an ephemeral
+                cache breakpoint so repeated prefixes are not re-processed
         """
         self.model = model
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        self.use_prompt_caching = use_prompt_caching
         
         if not self.api_key:
             raise ValueError("Anthropic API key not provided")
         
         try:
-            from anthropic import AsyncAnthropic
-            self.client = AsyncAnthropic(api_key=self.api_key)
+            self.client = _import_sdk("anthropic").AsyncAnthropic(api_key=self.api_key, http_client=get_http_client())
             logger.info(f"Anthropic provider initialized: {model}")
         except ImportError:
             logger.error("anthropic package not installed")
             raise
     
+    def _request(self, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build messages.create() arguments with prompt-cache breakpoints
+        
+        The static parts (the `system` kwarg and an optional `cache_prefix`,
+        e.g. a fixed document context) come first and carry
+        cache_control: ephemeral; the per-request prompt follows uncached.
+        """
+        cache = {"cache_control": {"type": "ephemeral"}} if self.use_prompt_caching else {}
+        
+        prefix = kwargs.get("cache_prefix")
+        if prefix:
+            content = [{"type": "text", "text": prefix, **cache}, {"type": "text", "text": prompt}]
+        else:
+            content = prompt
+        
+        request = {
+            "model": self.model,
+            "max_tokens": kwargs.get("max_tokens", 1000),
+            "temperature": kwargs.get("temperature", 0.7),
+            "messages": [{"role": "user", "content": content}]
+        }
+        
+        system = kwargs.get("system")
+        if system:
+            request["system"] = [{"type": "text", "text": system, **cache}]
+        
+        return request
+    
     async def generate(self, prompt: str, **kwargs) -> str:
         """Generate complete response"""
         try:
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=kwargs.get("max_tokens", 1000),
-                messages=[{"role": "user", "content": prompt}]
-            )
+            response = await self.client.messages.create(**self._request(prompt, kwargs))
             return response.content[0].text
         
         except Exception as e:
@@ -193,58 +322,435 @@ class AnthropicProvider(BaseLLMProvider):
     async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
         """Generate streaming response"""
         try:
-            async with self.client.messages.stream(
-                model=self.model,
-                max_tokens=kwargs.get("max_tokens", 1000),
-                messages=[{"role": "user", "content": prompt}]
-            ) as stream:
+            async with self.client.messages.stream(**self._request(prompt, kwargs)) as stream:
                 async for text in stream.text_stream:
                     yield text
+                    await asyncio.sleep(0)
         
         except Exception as e:
             logger.error(f"Anthropic streaming error: {e}")
             raise
 
 
+class RoundRobinProvider(BaseLLMProvider):
+    """
+    Spread requests over several instances of one provider (e.g. one per API key)
+    
+    Each account has its own rate limit, so batch throughput grows with the
+    number of keys. Instances are used in turn, or with balancing="latency"
+    the one with the lowest moving-average latency is picked.
+    """
+    
+    # Weight of the newest sample in the latency moving average
+    EWMA_ALPHA = 0.2
+    
+    def __init__(self, providers: List[BaseLLMProvider], balancing: str = "round_robin"):
+        """
+        Initialize fan-out provider
+        
+        Args:
+            providers: Interchangeable provider instances (same model)
+            balancing: "round_robin" or "latency"
+        """
+        if not providers:
+            raise ValueError("RoundRobinProvider needs at least one provider")
+        if balancing not in ("round_robin", "latency"):
+            raise ValueError(f"balancing must be 'round_robin' or 'latency', got '{balancing}'")
+        
+        self._subs = providers
+        self.balancing = balancing
+        self.model = getattr(providers[0], "model", "")
+        
+        self._cycle = itertools.cycle(range(len(providers)))
+        self._latency = [0.0] * len(providers)
+    
+    def _pick(self) -> int:
+        """Index of the instance that serves the next request"""
+        if self.balancing == "latency":
+            # Unmeasured instances (0.0) are tried first
+            return min(range(len(self._subs)), key=self._latency.__getitem__)
+        return next(self._cycle)
+    
+    def _record(self, idx: int, elapsed: float):
+        """Fold one latency sample into the instance's moving average"""
+        previous = self._latency[idx]
+        self._latency[idx] = elapsed if previous == 0.0 else (
+            self.EWMA_ALPHA * elapsed + (1 - self.EWMA_ALPHA) * previous
+        )
+    
+    async def generate(self, prompt: str, **kwargs) -> str:
+        """Generate complete response on the selected instance"""
+        idx = self._pick()
+        start = time.perf_counter()
+        try:
+            return await self._subs[idx].generate(prompt, **kwargs)
+        finally:
+            self._record(idx, time.perf_counter() - start)
+    
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
+        """Generate streaming response on the selected instance (latency = time to first chunk)"""
+        idx = self._pick()
+        start = time.perf_counter()
+        first = True
+        try:
+            async for chunk in self._subs[idx].generate_stream(prompt, **kwargs):
+                if first:
+                    self._record(idx, time.perf_counter() - start)
+                    first = False
+                yield chunk
+        finally:
+            if first:
+                self._record(idx, time.perf_counter() - start)
+    
+    async def health_check(self) -> bool:
+        """Healthy while any instance is"""
+        results = await asyncio.gather(
+            *(sub.health_check() for sub in self._subs), return_exceptions=True
+        )
+        return any(result is True for result in results)
+    
+    async def warm_up(self):
+        """Warm every instance's connection"""
+        await asyncio.gather(*(sub.warm_up() for sub in self._subs), return_exceptions=True)
+
+
+def _api_keys(name: str) -> List[str]:
+    """API keys for a provider: {NAME}_API_KEYS (comma-separated) plus {NAME}_API_KEY"""
+    keys = [k.strip() for k in os.getenv(f"{name}_API_KEYS", "").split(",")]
+    keys.append(os.getenv(f"{name}_API_KEY", "").strip())
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+class LazyProvider(BaseLLMProvider):
+    """
+    Provider built on first use
+    
+    Importing an SDK and constructing its client costs time and memory, so a
+    configured provider is only materialized when a request first needs it
+    (or, for the preferred provider, at startup). Health checks and warm-up
+    skip providers that are not built yet. A failed build is retried on the
+    next use.
+    """
+    
+    def __init__(self, label: str, factory: Callable[[], BaseLLMProvider]):
+        """
+        Initialize lazy provider
+        
+        Args:
+            label: Display name for logs (e.g. "OpenAI")
+            factory: Zero-argument callable that builds the real provider
+        """
+        self.label = label
+        self._factory = factory
+        self._provider: Optional[BaseLLMProvider] = None
+    
+    @property
+    def built(self) -> bool:
+        """Whether the real provider has been constructed"""
+        return self._provider is not None
+    
+    def get(self) -> BaseLLMProvider:
+        """Build the real provider if needed and return it"""
+        if self._provider is None:
+            self._provider = self._factory()
+            logger.info(f"✓ {self.label} provider ready")
+        return self._provider
+    
+    @property
+    def model(self) -> str:
+        """Model name of the real provider ("" if it cannot be built yet)"""
+        try:
+            return getattr(self.get(), "model", "")
+        except Exception:
+            return ""
+    
+    async def generate(self, prompt: str, **kwargs) -> str:
+        """Generate complete response"""
+        return await self.get().generate(prompt, **kwargs)
+    
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
+        """Generate streaming response"""
+        async for chunk in self.get().generate_stream(prompt, **kwargs):
+            yield chunk
+    
+    async def health_check(self) -> bool:
+        """Unhealthy while the provider cannot be built"""
+        try:
+            provider = self.get()
+        except Exception as e:
+            logger.warning(f"{self.label} not available: {e}")
+            return False
+        return await provider.health_check()
+    
+    async def warm_up(self):
+        """Build the provider and pre-open its connection"""
+        await self.get().warm_up()
+
+
+class _SharedRequest:
+    """
+    One provider call shared by every identical request in flight
+    
+    The call runs in its own task, owned by LLMService rather than by the
+    caller that started it, so any caller can leave without affecting the
+    others; the task is only cancelled once its last waiter has gone.
+    """
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.abandoned = False
+    
+    async def wait(self) -> str:
+        """
+        Wait for the shared result
+        
+        Returns:
+            Generated response
+        
+        Raises:
+            The provider call's error, for every waiter
+        """
+        self.waiters += 1
+        try:
+            return await asyncio.shield(self.task)
+        finally:
+            self.waiters -= 1
+            if self.waiters == 0 and not self.task.done():
+                self.abandoned = True
+                self.task.cancel()
+
+
+class _StreamBroadcast:
+    """
+    Fan-out of one provider stream to every caller that asked for it
+    
+    The provider stream is read by a producer task owned by LLMService, and
+    every caller (the first one included) is a subscriber. Chunks are kept
+    so a subscriber joining mid-stream replays them first; each subscriber
+    then reads live chunks from its own queue. The producer keeps running
+    while any subscriber remains and is cancelled when the last one leaves.
+    """
+    
+    _END = object()
+    
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.producer: Optional[asyncio.Task] = None
+        self.abandoned = False
+        self._queues: List[asyncio.Queue] = []
+        self._closed = False
+        self._error: Optional[BaseException] = None
+    
+    def publish(self, chunk: str):
+        """Record a chunk and hand it to every subscriber"""
+        self.chunks.append(chunk)
+        for queue in self._queues:
+            queue.put_nowait(chunk)
+    
+    def close(self, error: Optional[BaseException] = None):
+        """End the stream for all subscribers, optionally with an error"""
+        if self._closed:
+            return
+        self._closed = True
+        self._error = error
+        for queue in self._queues:
+            queue.put_nowait(self._END)
+    
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        """
+        Follow the stream from its first chunk
+        
+        Yields:
+            Response chunks
+        
+        Raises:
+            The producer's error if the shared stream failed
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in self.chunks:
+            queue.put_nowait(chunk)
+        if self._closed:
+            queue.put_nowait(self._END)
+        self._queues.append(queue)
+        
+        try:
+            while True:
+                item = await queue.get()
+                if item is self._END:
+                    break
+                yield item
+        finally:
+            self._queues.remove(queue)
+            if not self._queues and not self._closed and self.producer is not None:
+                self.abandoned = True
+                self.producer.cancel()
+        
+        if self._error is not None:
+            raise self._error
+
+
 class LLMService:
     """
     Unified LLM service supporting multiple providers
     """
     
+    # Runs of spaces/tabs, and spaces left at line ends once runs are collapsed
+    WHITESPACE_PATTERN = re.compile(r'[ \t]+')
+    LINE_END_PATTERN = re.compile(r' \n')
+    
+    # Per-request values (UUIDs, timestamps) that break prefix caching if sent early
+    DYNAMIC_TOKEN_PATTERN = re.compile(
+        r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b'
+        r'|\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}',
+        re.IGNORECASE
+    )
+    
+    # Roughly the first 1024 tokens, the span provider prefix caches match on
+    PREFIX_CHECK_CHARS = 4096
+    
+    # Fallback order when the requested provider is missing or failing
+    PROVIDER_PRIORITY = ("ollama", "openai", "anthropic")
+    
+    # Circuit breaker: more than BREAKER_MAX_FAILURES errors within
+    # BREAKER_WINDOW_SECONDS takes a provider out for BREAKER_COOLDOWN_SECONDS
+    BREAKER_MAX_FAILURES = 3
+    BREAKER_WINDOW_SECONDS = 30.0
+    BREAKER_COOLDOWN_SECONDS = 60.0
+    
     def __init__(self):
         """Initialize LLM service"""
         self.providers: Dict[str, BaseLLMProvider] = {}
         self.default_provider = "ollama"
         
-        # Try to initialize Ollama by default
-        try:
-            self.providers["ollama"] = OllamaProvider(model="llama3.1")
-            logger.info("✓ Ollama provider ready")
-        except Exception as e:
-            logger.warning(f"Ollama not available: {e}")
+        # Providers are only registered here; SDK imports and clients are
+        # built on first use (see LazyProvider)
+        if _sdk_installed("ollama"):
+            self.providers["ollama"] = LazyProvider("Ollama", functools.partial(OllamaProvider, model="llama3.1"))
+        else:
+            logger.warning("Ollama not available: ollama package not installed. Install with: pip install ollama")
+        
+        # OpenAI / Anthropic are registered when at least one API key is configured
+        for name, provider_class in (("openai", OpenAIProvider), ("anthropic", AnthropicProvider)):
+            keys = _api_keys(name.upper())
+            if not keys:
+                continue
+            label = provider_class.__name__.removesuffix("Provider")
+            if not _sdk_installed(name):
+                logger.warning(f"{label} not available: {name} package not installed")
+                continue
+            self.providers[name] = LazyProvider(label, functools.partial(self._build_keyed, provider_class, keys))
+            logger.info(f"✓ {label} provider configured ({len(keys)} key(s))")
         
-        # Try to initialize OpenAI if API key is present
-        if os.getenv("OPENAI_API_KEY"):
+        if not self.providers:
+            logger.error("No LLM providers available!")
+        
+        # Deterministic fallback order: known providers first, then any others
+        self.priority: List[str] = [
+            *(name for name in self.PROVIDER_PRIORITY if name in self.providers),
+            *(name for name in self.providers if name not in self.PROVIDER_PRIORITY)
+        ]
+        
+        # Per provider: (failures in the current window, window start)
+        self._breaker: Dict[str, Tuple[int, float]] = {}
+        self._open_until: Dict[str, float] = {}
+        
+        # Cached provider health, refreshed by the background health-check loop
+        self._availability: Dict[str, bool] = {name: True for name in self.providers}
+        self._health_task: Optional[asyncio.Task] = None
+        
+        # Exact + semantic cache for low-temperature (reproducible) responses
+        self.response_cache = ResponseCache(
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600")),
+            redis_url=os.getenv("REDIS_URL") or None
+        )
+        
+        # Requests currently being generated, keyed like the response cache,
+        # so identical concurrent prompts cost a single provider call
+        self._inflight: Dict[str, _SharedRequest] = {}
+        self._inflight_streams: Dict[str, _StreamBroadcast] = {}
+    
+    @staticmethod
+    def _build_keyed(provider_class: type, keys: List[str]) -> BaseLLMProvider:
+        """One provider instance per API key, fanned out when there are several"""
+        instances = [provider_class(api_key=key) for key in keys]
+        if len(instances) == 1:
+            return instances[0]
+        return RoundRobinProvider(instances, balancing=os.getenv("LLM_KEY_BALANCING", "round_robin"))
+    
+    def _probed(self) -> Dict[str, BaseLLMProvider]:
+        """
+        Providers that health checks and warm-up should touch
+        
+        Unbuilt lazy providers are left alone (they stay optimistically
+        available until a request builds them), except the first one in
+        priority order, which most requests fall back to.
+        """
+        preferred = self.priority[0] if self.priority else None
+        return {
+            name: provider for name, provider in self.providers.items()
+            if name == preferred or not isinstance(provider, LazyProvider) or provider.built
+        }
+    
+    async def refresh_availability(self):
+        """Re-check every built provider (and the preferred one) and update the availability cache"""
+        for name, provider in self._probed().items():
             try:
-                self.providers["openai"] = OpenAIProvider()
-                logger.info("✓ OpenAI provider ready")
-            except Exception as e:
-                logger.warning(f"OpenAI not available: {e}")
+                healthy = await provider.health_check()
+            except Exception:
+                healthy = False
+            
+            if healthy != self._availability.get(name):
+                logger.info(f"Provider '{name}' is now {'available' if healthy else 'unavailable'}")
+            self._availability[name] = healthy
+    
+    async def _health_loop(self, interval: float):
+        """Refresh provider availability every `interval` seconds"""
+        while True:
+            await self.refresh_availability()
+            await asyncio.sleep(interval)
+    
+    def start_health_checks(self, interval: float = 30):
+        """Start the background availability refresh on the running event loop"""
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(
+                self._health_loop(interval)
+            )
+    
+    async def warm_connections(self, timeout: float = 5.0):
+        """
+        Pre-open connections to every built provider (and the preferred one) concurrently
         
-        # Try to initialize Anthropic if API key is present
-        if os.getenv("ANTHROPIC_API_KEY"):
+        Args:
+            timeout: Seconds to wait before giving up (warm-up is best effort)
+        """
+        async def warm(name: str, provider: BaseLLMProvider):
             try:
-                self.providers["anthropic"] = AnthropicProvider()
-                logger.info("✓ Anthropic provider ready")
+                await asyncio.wait_for(provider.warm_up(), timeout)
             except Exception as e:
-                logger.warning(f"Anthropic not available: {e}")
+                logger.debug(f"Warm-up of '{name}' skipped: {e}")
         
-        if not self.providers:
-            logger.error("No LLM providers available!")
+        await asyncio.gather(*(warm(name, p) for name, p in self._probed().items()))
+    
+    async def aclose(self):
+        """Stop background work and close pooled connections"""
+        await self.stop_health_checks()
+        if _http_client is not None:
+            await _http_client.aclose()
+    
+    async def stop_health_checks(self):
+        """Cancel the background availability refresh"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
     
     def get_provider(self, provider_name: str) -> Optional[BaseLLMProvider]:
         """
-        Get a specific provider
+        Get a specific provider, building it on first use
         
         Args:
             provider_name: Provider name ("ollama", "openai", "anthropic")
@@ -252,72 +758,353 @@ class LLMService:
         Returns:
             Provider instance or None
         """
-        return self.providers.get(provider_name)
+        provider = self.providers.get(provider_name)
+        return provider.get() if isinstance(provider, LazyProvider) else provider
     
     def is_available(self, provider_name: str) -> bool:
-        """Check if a provider is available"""
-        return provider_name in self.providers
+        """Check if a provider is available (cached health, breaker closed; no network call)"""
+        return self._availability.get(provider_name, False) and not self._breaker_open(provider_name)
+    
+    def _breaker_open(self, name: str) -> bool:
+        """True while a provider is cooling down after repeated failures"""
+        open_until = self._open_until.get(name)
+        if open_until is None:
+            return False
+        if time.monotonic() >= open_until:
+            # Cool-down over: let the next request probe the provider again
+            del self._open_until[name]
+            return False
+        return True
+    
+    def _record_failure(self, name: str):
+        """Count a provider error, opening its breaker after too many in the window"""
+        now = time.monotonic()
+        failures, window_start = self._breaker.get(name, (0, now))
+        if now - window_start > self.BREAKER_WINDOW_SECONDS:
+            failures, window_start = 0, now
+        failures += 1
+        
+        if failures > self.BREAKER_MAX_FAILURES:
+            self._open_until[name] = now + self.BREAKER_COOLDOWN_SECONDS
+            self._breaker.pop(name, None)
+            logger.warning(
+                f"⚠  Provider '{name}' failed {failures} times in "
+                f"{self.BREAKER_WINDOW_SECONDS:.0f}s; skipping it for {self.BREAKER_COOLDOWN_SECONDS:.0f}s"
+            )
+        else:
+            self._breaker[name] = (failures, window_start)
+    
+    def _record_success(self, name: str):
+        """Reset a provider's failure count"""
+        self._breaker.pop(name, None)
+    
+    def _pick(self, requested: str) -> str:
+        """
+        Resolve the provider to use for a request
+        
+        Args:
+            requested: Provider name asked for
+        
+        Returns:
+            The requested provider, or the first usable one in priority order
+        
+        Raises:
+            ValueError: If every provider is missing or has an open breaker
+        """
+        for name in (requested, *self.priority):
+            if name in self.providers and not self._breaker_open(name):
+                if name != requested:
+                    logger.warning(f"Provider '{requested}' not usable, using fallback: {name}")
+                return name
+        
+        raise ValueError("No LLM providers available")
+    
+    @classmethod
+    def _normalize_prompt(cls, text: str) -> str:
+        """Collapse spaces/tabs and strip surrounding and line-end whitespace"""
+        return cls.LINE_END_PATTERN.sub('\n', cls.WHITESPACE_PATTERN.sub(' ', text.strip()))
+    
+    def _normalize_request(self, prompt: str, kwargs: Dict[str, Any]) -> str:
+        """
+        Normalize a request so equivalent prompts share cache entries
+        
+        Applied before hashing and before sending, so the response cache and
+        provider-side prefix caches see identical text. Warns when a
+        per-request value appears in the cacheable prefix.
+        
+        Args:
+            prompt: Input prompt
+            kwargs: Generation parameters (system and cache_prefix are normalized in place)
+        
+        Returns:
+            Normalized prompt
+        """
+        for name in ("system", "cache_prefix"):
+            if kwargs.get(name):
+                kwargs[name] = self._normalize_prompt(kwargs[name])
+        prompt = self._normalize_prompt(prompt)
+        
+        prefix = f"{kwargs.get('system') or ''}{kwargs.get('cache_prefix') or ''}{prompt}"
+        match = self.DYNAMIC_TOKEN_PATTERN.search(prefix, 0, self.PREFIX_CHECK_CHARS)
+        if match:
+            logger.warning(
+                f"⚠  Dynamic value '{match.group()}' near the start of the prompt "
+                f"defeats prefix caching; move it to the end"
+            )
+        
+        return prompt
+    
+    @staticmethod
+    def _request_key(
+        provider: str,
+        llm: BaseLLMProvider,
+        prompt: str,
+        kwargs: Dict[str, Any]
+    ) -> Tuple[str, str]:
+        """
+        Identify a generation request for caching and in-flight coalescing
+        
+        Args:
+            provider: Resolved provider name
+            llm: Provider instance
+            prompt: Input prompt
+            kwargs: Generation parameters
+        
+        Returns:
+            Tuple of (scope from ResponseCache.make_scope, exact-match key)
+        """
+        scope = ResponseCache.make_scope(
+            provider,
+            getattr(llm, "model", ""),
+            kwargs.get("temperature", 0.7),
+            kwargs.get("top_p", 0.9),
+            kwargs.get("max_tokens", 1000)
+        )
+        key = ResponseCache.make_key(
+            scope, f"{kwargs.get('system') or ''}|{kwargs.get('cache_prefix') or ''}|{prompt}"
+        )
+        return scope, key
+    
+    async def _cache_lookup(
+        self,
+        scope: str,
+        key: str,
+        semantic_key: Optional[str],
+        semantic_context: Optional[str],
+        kwargs: Dict[str, Any]
+    ) -> Tuple[Optional[str], Optional[Callable[[str], Awaitable[None]]]]:
+        """
+        Check the response cache for a generation request
+        
+        Args:
+            scope: Scope from _request_key()
+            key: Exact-match key from _request_key()
+            semantic_key: User query for similarity matching (optional)
+            semantic_context: Retrieved context the response is grounded in;
+                similar-query hits must share it (optional)
+            kwargs: Generation parameters
+        
+        Returns:
+            Tuple of (cached response or None, coroutine function that stores a
+            fresh response, or None when the request must not be cached)
+        """
+        temperature = kwargs.get("temperature", 0.7)
+        if temperature > CACHE_MAX_TEMPERATURE:
+            return None, None
+        
+        cached = await self.response_cache.get(key)
+        if cached is not None:
+            return cached, None
+        
+        query_vector = None
+        semantic_scope = ResponseCache.make_semantic_scope(scope, semantic_context)
+        if semantic_key and temperature <= SEMANTIC_MAX_TEMPERATURE:
+            from app.services.embedding_service import get_embedding_service
+            query_vector = await asyncio.to_thread(get_embedding_service().embed_text, semantic_key)
+            cached = await self.response_cache.get_similar(semantic_scope, query_vector)
+            if cached is not None:
+                return cached, None
+        
+        async def store(response: str):
+            await self.response_cache.set(key, response)
+            if query_vector is not None:
+                self.response_cache.add_similar(semantic_scope, query_vector, key)
+        
+        return None, store
     
     async def generate(
         self,
         prompt: str,
         provider: str = "ollama",
+        semantic_key: Optional[str] = None,
+        semantic_context: Optional[str] = None,
         **kwargs
     ) -> str:
         """
         Generate response using specified provider
         
+        Responses for temperature <= 0.3 are cached by exact prompt; with a
+        semantic_key and temperature <= 0.2, near-identical queries over the
+        same semantic_context hit too.
+        Identical requests arriving while one is in flight share its result;
+        any of them can be cancelled without affecting the others.
+        
         Args:
             prompt: Input prompt
             provider: Provider name
+            semantic_key: User query used for similarity cache matching (optional)
+            semantic_context: Retrieved context behind the prompt; a similarity
+                hit is only reused for the same context (optional)
             **kwargs: Additional generation parameters
         
         Returns:
             Generated response
         """
-        if provider not in self.providers:
-            # Fallback to first available provider
-            if self.providers:
-                provider = list(self.providers.keys())[0]
-                logger.warning(f"Provider not available, using fallback: {provider}")
-            else:
-                raise ValueError("No LLM providers available")
-        
+        provider = self._pick(provider)
         llm = self.providers[provider]
-        return await llm.generate(prompt, **kwargs)
+        prompt = self._normalize_request(prompt, kwargs)
+        scope, key = self._request_key(provider, llm, prompt, kwargs)
+        
+        shared = self._inflight.get(key)
+        if shared is None or shared.abandoned:
+            shared = _SharedRequest(asyncio.create_task(
+                self._generate_once(provider, llm, prompt, scope, key, semantic_key, semantic_context, kwargs)
+            ))
+            self._inflight[key] = shared
+            shared.task.add_done_callback(lambda _: self._untrack(self._inflight, key, shared))
+        else:
+            logger.info(f"LLM response shared with an in-flight request ({provider})")
+        
+        return await shared.wait()
+    
+    @staticmethod
+    def _untrack(table: Dict[str, Any], key: str, entry: Any):
+        """Drop a finished in-flight entry, unless a newer one took its key"""
+        if table.get(key) is entry:
+            del table[key]
+    
+    async def _generate_once(
+        self,
+        provider: str,
+        llm: BaseLLMProvider,
+        prompt: str,
+        scope: str,
+        key: str,
+        semantic_key: Optional[str],
+        semantic_context: Optional[str],
+        kwargs: Dict[str, Any]
+    ) -> str:
+        """Serve one request from the cache or the provider (the shared task behind generate())"""
+        cached, store = await self._cache_lookup(scope, key, semantic_key, semantic_context, kwargs)
+        if cached is not None:
+            logger.info(f"LLM response served from cache ({provider})")
+            return cached
+        
+        try:
+            response = await llm.generate(prompt, **kwargs)
+        except Exception:
+            self._record_failure(provider)
+            raise
+        self._record_success(provider)
+        
+        if store is not None and response:
+            await store(response)
+        
+        return response
     
     async def generate_stream(
         self,
         prompt: str,
         provider: str = "ollama",
+        semantic_key: Optional[str] = None,
+        semantic_context: Optional[str] = None,
         **kwargs
     ) -> AsyncGenerator[str, None]:
         """
         Generate streaming response using specified provider
         
+        Cached like generate(); a hit is yielded as a single chunk, and a
+        miss is recorded only if the stream runs to completion. Identical
+        requests arriving mid-stream replay the chunks so far, then follow
+        the live stream instead of starting their own.
+        
         Args:
             prompt: Input prompt
             provider: Provider name
+            semantic_key: User query used for similarity cache matching (optional)
+            semantic_context: Retrieved context behind the prompt; a similarity
+                hit is only reused for the same context (optional)
             **kwargs: Additional generation parameters
         
         Yields:
             Response chunks
         """
-        if provider not in self.providers:
-            # Fallback to first available provider
-            if self.providers:
-                provider = list(self.providers.keys())[0]
-                logger.warning(f"Provider not available, using fallback: {provider}")
-            else:
-                raise ValueError("No LLM providers available")
-        
+        provider = self._pick(provider)
         llm = self.providers[provider]
-        async for chunk in llm.generate_stream(prompt, **kwargs):
-            yield chunk
+        prompt = self._normalize_request(prompt, kwargs)
+        scope, key = self._request_key(provider, llm, prompt, kwargs)
+        
+        broadcast = self._inflight_streams.get(key)
+        if broadcast is None or broadcast.abandoned:
+            broadcast = _StreamBroadcast()
+            broadcast.producer = asyncio.create_task(
+                self._produce_stream(broadcast, provider, llm, prompt, scope, key, semantic_key, semantic_context, kwargs)
+            )
+            self._inflight_streams[key] = broadcast
+            broadcast.producer.add_done_callback(lambda _: self._untrack(self._inflight_streams, key, broadcast))
+        else:
+            logger.info(f"LLM stream shared with an in-flight request ({provider})")
+        
+        subscription = broadcast.subscribe()
+        try:
+            async for chunk in subscription:
+                yield chunk
+        finally:
+            await subscription.aclose()
+    
+    async def _produce_stream(
+        self,
+        broadcast: _StreamBroadcast,
+        provider: str,
+        llm: BaseLLMProvider,
+        prompt: str,
+        scope: str,
+        key: str,
+        semantic_key: Optional[str],
+        semantic_context: Optional[str],
+        kwargs: Dict[str, Any]
+    ):
+        """Publish one request's stream from the cache or the provider (the task behind generate_stream())"""
+        try:
+            cached, store = await self._cache_lookup(scope, key, semantic_key, semantic_context, kwargs)
+            if cached is not None:
+                logger.info(f"LLM stream served from cache ({provider})")
+                broadcast.publish(cached)
+                broadcast.close()
+                return
+            
+            try:
+                async for chunk in llm.generate_stream(prompt, **kwargs):
+                    broadcast.publish(chunk)
+            except Exception:
+                self._record_failure(provider)
+                raise
+            self._record_success(provider)
+            broadcast.close()
+            
+            if store is not None and broadcast.chunks:
+                await store("".join(broadcast.chunks))
+        
+        except Exception as e:
+            # Every subscriber sees the provider's error
+            broadcast.close(e)
+        finally:
+            # Cancelled mid-stream: anyone still subscribed gets an error, not a truncated answer
+            broadcast.close(RuntimeError("Shared LLM stream ended early"))
     
     def get_available_providers(self) -> list[str]:
-        """Get list of available providers"""
-        return list(self.providers.keys())
+        """Get list of available providers, in fallback priority order"""
+        return [name for name in self.priority if self.is_available(name)]
 
 
 # Global LLM service instance
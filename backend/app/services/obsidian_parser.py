@@ -5,74 +5,322 @@ Parses markdown files from Obsidian vault and extracts structured data
 
 import re
 import hashlib
+from collections import Counter
+from operator import attrgetter
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import logging
 from datetime import datetime
 
+import orjson
+
 from app.models.note import Note
+from app.utils.text import compile_scan_pattern, count_words
+
+try:
+    import aiofiles
+except ImportError:  # Optional dependency (pip install aiofiles)
+    aiofiles = None
 
 logger = logging.getLogger(__name__)
 
+# Concurrent file reads in parse_all_notes_async (each may be an iCloud download)
+READ_CONCURRENCY = 64
+
+# Below this many files, starting a process pool costs more than it saves
+PARALLEL_MIN_FILES = 200
+
+# Bump when the parse output changes, so old vault caches are ignored
+VAULT_CACHE_VERSION = 1
+
+
+def _walk_markdown(root: str, exclude: Optional[re.Pattern] = None) -> Iterator[str]:
+    """
+    Yield paths of .md files under root, pruning excluded directories
+    
+    Excluded directories are never opened, and each directory's files come
+    before its subdirectories (the same order as os.walk).
+    
+    Args:
+        root: Directory to walk
+        exclude: Pattern matched against directory and file names (optional)
+    
+    Yields:
+        File paths as strings
+    """
+    try:
+        with os.scandir(root) as entries:
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                if exclude is not None and exclude.search(name):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif name.endswith('.md'):
+                    yield entry.path
+    except OSError as e:
+        logger.warning(f"Cannot read directory {root}: {e}")
+        return
+    
+    for subdir in subdirs:
+        yield from _walk_markdown(subdir, exclude)
+
 
 class ObsidianParser:
     """Parse Obsidian vault markdown files"""
     
-    def __init__(self, vault_path: str):
+    # Pattern for [[Link]] or [[Link|Display Text]]
+    LINK_PATTERN = compile_scan_pattern(r'\[\[([^\]|]+)(?:\|[^\]]+)?\]\]')
+    
+    # Slug patterns: characters to drop, and runs of hyphens/whitespace
+    SLUG_STRIP_PATTERN = re.compile(r'[^\w\s-]')
+    SLUG_DASH_PATTERN = re.compile(r'[-\s]+')
+    
+    def __init__(self, vault_path: str, cache_path: Optional[Path] = None):
         """
         Initialize parser with vault path
         
         Args:
             vault_path: Path to Obsidian vault root
+            cache_path: File where parsed notes are kept between runs, keyed by
+                each file's mtime and size (None = always parse everything)
         """
         self.vault_path = Path(vault_path)
+        self.cache_path = Path(cache_path) if cache_path else None
         if not self.vault_path.exists():
             logger.warning(f"Vault path does not exist: {vault_path}. Notes navigation will be unavailable.")
         else:
             logger.info(f"Initialized ObsidianParser for vault: {vault_path}")
     
-    def parse_all_notes(self, exclude_patterns: Optional[List[str]] = None) -> List[Note]:
+    def parse_all_notes(
+        self,
+        exclude_patterns: Optional[List[str]] = None,
+        max_workers: Optional[int] = None
+    ) -> List[Note]:
         """
         Parse all markdown files in the vault
         
+        Large vaults are parsed in a process pool (regex, slug and hashing
+        work is CPU-bound); small ones, or a failed pool, fall back to
+        parsing serially. With a cache_path, only files whose mtime or size
+        changed since the last run are parsed.
+        
         Args:
             exclude_patterns: List of patterns to exclude (e.g., ['.obsidian', 'templates'])
+            max_workers: Number of worker processes (default: CPU count)
         
         Returns:
             List of parsed Note objects
         """
+        markdown_files = self._find_markdown_files(exclude_patterns)
+        
+        if self.cache_path is None:
+            notes = self._parse_files(markdown_files, max_workers)
+        else:
+            notes = self._parse_with_cache(markdown_files, max_workers)
+        
+        logger.info(f"Successfully parsed {len(notes)} notes")
+        return notes
+    
+    def _parse_files(self, markdown_files: List[str], max_workers: Optional[int]) -> List[Note]:
+        """Parse files in a process pool when there are enough of them, else serially"""
+        if len(markdown_files) >= PARALLEL_MIN_FILES and max_workers != 1:
+            try:
+                return self._parse_parallel(markdown_files, max_workers)
+            except Exception as e:
+                logger.warning(f"Parallel parsing failed ({e}); parsing serially")
+        
+        return self._parse_serial(markdown_files)
+    
+    def _parse_with_cache(self, markdown_files: List[str], max_workers: Optional[int]) -> List[Note]:
+        """
+        Reuse cached notes for unchanged files and parse the rest
+        
+        Args:
+            markdown_files: File paths from _find_markdown_files()
+            max_workers: Worker processes for the files that need parsing
+        
+        Returns:
+            Notes in walk order, as parse_all_notes() would return them
+        """
+        root = str(self.vault_path)
+        
+        # Relative path (Note.file_path) -> (mtime_ns, size); a stat is far cheaper than a parse
+        stamps: Dict[str, Tuple[int, int]] = {}
+        for file_path in markdown_files:
+            st = os.stat(file_path)
+            stamps[os.path.relpath(file_path, root)] = (st.st_mtime_ns, st.st_size)
+        
+        cached = self._load_cache()
+        reused: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        for file_path, relative_path in zip(markdown_files, stamps):
+            entry = cached.get(relative_path)
+            if entry is not None and (entry[0], entry[1]) == stamps[relative_path]:
+                reused[relative_path] = entry[2]
+            else:
+                stale.append(file_path)
+        
+        fresh = self._parse_files(stale, max_workers)
+        logger.info(f"✓ Vault cache: {len(reused)} notes reused, {len(stale)} files parsed")
+        
+        by_path = {note.file_path: note for note in fresh}
+        for relative_path, data in reused.items():
+            by_path[relative_path] = Note(**data)
+        notes = [by_path[path] for path in stamps if path in by_path]
+        
+        # Rewrite only when something changed (new, edited or deleted notes);
+        # empty files are never cached, so they alone don't force a rewrite
+        if fresh or len(reused) != len(cached):
+            entries = {path: [*stamps[path], data] for path, data in reused.items()}
+            for note in fresh:
+                entries[note.file_path] = [*stamps[note.file_path], note.model_dump(mode="json")]
+            self._save_cache(entries)
+        
+        return notes
+    
+    def _load_cache(self) -> Dict[str, list]:
+        """Read the vault cache: relative path -> [mtime_ns, size, note data]"""
+        if not self.cache_path.exists():
+            return {}
+        
+        try:
+            payload = orjson.loads(self.cache_path.read_bytes())
+            if payload.get("version") != VAULT_CACHE_VERSION or payload.get("vault") != str(self.vault_path):
+                logger.info("Vault cache is for another vault or format — parsing everything")
+                return {}
+            return payload["files"]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable vault cache: {e}")
+            return {}
+    
+    def _save_cache(self, entries: Dict[str, list]):
+        """Write the vault cache atomically (readers never see a partial file)"""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            payload = {"version": VAULT_CACHE_VERSION, "vault": str(self.vault_path), "files": entries}
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            tmp_path.write_bytes(orjson.dumps(payload))
+            tmp_path.replace(self.cache_path)
+            logger.info(f"✓ Saved vault cache to {self.cache_path}")
+        except Exception as e:
+            logger.warning(f"Failed to save vault cache: {e}")
+    
+    async def parse_all_notes_async(
+        self,
+        exclude_patterns: Optional[List[str]] = None,
+        concurrency: int = READ_CONCURRENCY
+    ) -> List[Note]:
+        """
+        Parse all markdown files in the vault, reading them concurrently
+        
+        Meant for cloud-synced vaults (iCloud Drive), where a read can block
+        on an on-demand download: up to `concurrency` reads are in flight at
+        once. Parsing itself is unchanged and runs in a worker thread.
+        
+        Args:
+            exclude_patterns: List of patterns to exclude (e.g., ['.obsidian', 'templates'])
+            concurrency: Maximum simultaneous file reads
+        
+        Returns:
+            List of parsed Note objects, in the same order as parse_all_notes()
+        """
+        markdown_files = await asyncio.to_thread(self._find_markdown_files, exclude_patterns)
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        contents = await asyncio.gather(
+            *(self._read_bounded(semaphore, file_path) for file_path in markdown_files)
+        )
+        
+        def parse_contents() -> List[Note]:
+            notes = []
+            for file_path, content in zip(markdown_files, contents):
+                if content is not None:
+                    note = self._parse_content(Path(file_path), content)
+                    if note:
+                        notes.append(note)
+            return notes
+        
+        notes = await asyncio.to_thread(parse_contents)
+        
+        logger.info(f"Successfully parsed {len(notes)} notes")
+        return notes
+    
+    async def _read_bounded(self, semaphore: asyncio.Semaphore, file_path: str) -> Optional[str]:
+        """Read one file under the semaphore; None (logged) if it can't be read"""
+        async with semaphore:
+            try:
+                if aiofiles is not None:
+                    async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+                        return await f.read()
+                return await asyncio.to_thread(Path(file_path).read_text, encoding='utf-8')
+            except Exception as e:
+                logger.error(f"Failed to read {file_path}: {e}")
+                return None
+    
+    def _find_markdown_files(self, exclude_patterns: Optional[List[str]] = None) -> List[str]:
+        """
+        List the vault's markdown files
+        
+        Args:
+            exclude_patterns: Patterns to exclude (default: .obsidian, templates, Archive)
+        
+        Returns:
+            File paths as strings
+        """
         if exclude_patterns is None:
             exclude_patterns = ['.obsidian', 'templates', 'Archive']
         
-        notes = []
-        markdown_files = []
+        # One compiled alternation instead of a substring test per pattern per path
+        exclude = re.compile('|'.join(map(re.escape, exclude_patterns))) if exclude_patterns else None
         
-        import os
-        for root, dirs, files in os.walk(str(self.vault_path)):
-            # Modify dirs in-place to skip excluded directories to save I/O
-            dirs[:] = [d for d in dirs if not any(p in d for p in exclude_patterns)]
-            
-            for file in files:
-                if file.endswith('.md'):
-                    file_path = Path(root) / file
-                    if not any(pattern in str(file_path) for pattern in exclude_patterns):
-                        markdown_files.append(file_path)
+        # Plain path strings: cheap to collect and to send to worker processes
+        markdown_files = list(_walk_markdown(str(self.vault_path), exclude))
         
         logger.info(f"Found {len(markdown_files)} markdown files")
+        return markdown_files
+    
+    def _parse_serial(self, markdown_files: List[str]) -> List[Note]:
+        """Parse files one by one in this process"""
+        notes = []
         
         for i, file_path in enumerate(markdown_files):
             if i > 0 and i % 100 == 0:
                 logger.info(f"Parsed {i}/{len(markdown_files)} notes...")
                 
             try:
-                note = self.parse_note(file_path)
+                note = self.parse_note(Path(file_path))
                 if note:
                     notes.append(note)
             except Exception as e:
                 logger.error(f"Error parsing {file_path}: {e}")
                 continue
         
-        logger.info(f"Successfully parsed {len(notes)} notes")
+        return notes
+    
+    def _parse_parallel(self, markdown_files: List[str], max_workers: Optional[int]) -> List[Note]:
+        """Parse files in a process pool, preserving file order"""
+        notes = []
+        
+        # spawn: the server process has live threads (torch, ChromaDB), so fork is unsafe
+        with ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parser_worker,
+            initargs=(str(self.vault_path),)
+        ) as executor:
+            for i, note in enumerate(executor.map(_parse_one, markdown_files, chunksize=32)):
+                if i > 0 and i % 100 == 0:
+                    logger.info(f"Parsed {i}/{len(markdown_files)} notes...")
+                if note:
+                    notes.append(note)
+        
         return notes
     
     def parse_note(self, file_path: Path) -> Optional[Note]:
@@ -88,16 +336,30 @@ class ObsidianParser:
         try:
             # Read file content
             content = file_path.read_text(encoding='utf-8')
-            
+        except Exception as e:
+            logger.error(f"Failed to parse {file_path}: {e}")
+            return None
+        
+        return self._parse_content(file_path, content)
+    
+    def _parse_content(self, file_path: Path, content: str) -> Optional[Note]:
+        """
+        Build a Note from a file's already-read content
+        
+        Args:
+            file_path: Path to markdown file
+            content: File content
+        
+        Returns:
+            Note object or None if the file is empty or parsing fails
+        """
+        try:
             # Skip empty files
             if not content.strip():
                 return None
             
-            # Extract title (use filename without extension)
-            title = file_path.stem
-            # Clean up title (remove "Notes - " prefix if present)
-            if title.startswith("Notes - "):
-                title = title[8:]
+            # Extract title (filename without extension and "Notes - " prefix)
+            title = file_path.stem.removeprefix("Notes - ")
             
             # Extract metadata from file path
             relative_path = file_path.relative_to(self.vault_path)
@@ -107,8 +369,8 @@ class ObsidianParser:
             # Extract Obsidian links
             links = self._extract_links(content)
             
-            # Count words
-            word_count = len(content.split())
+            # Count words (without materializing a list of them)
+            word_count = count_words(content)
             
             # Generate unique ID
             note_id = self._generate_id(category, book, title)
@@ -172,19 +434,8 @@ class ObsidianParser:
         Returns:
             List of link texts
         """
-        # Pattern for [[Link]] or [[Link|Display Text]]
-        pattern = r'\[\[([^\]|]+)(?:\|[^\]]+)?\]\]'
-        matches = re.findall(pattern, content)
-        
         # Remove duplicates while preserving order
-        seen = set()
-        unique_links = []
-        for link in matches:
-            if link not in seen:
-                seen.add(link)
-                unique_links.append(link)
-        
-        return unique_links
+        return list(dict.fromkeys(self.LINK_PATTERN.findall(content)))
     
     def _generate_id(self, category: str, book: Optional[str], title: str) -> str:
         """
@@ -204,20 +455,23 @@ class ObsidianParser:
             self._slugify(book) if book else "",
             self._slugify(title)
         ]
-        slug = "_".join(p for p in parts if p)
+        slug = "_".join(filter(None, parts))
         
         # If slug is too long, hash it
         if len(slug) > 100:
-            hash_suffix = hashlib.md5(slug.encode()).hexdigest()[:8]
+            hash_suffix = hashlib.blake2b(slug.encode(), digest_size=4).hexdigest()
             slug = f"{slug[:80]}_{hash_suffix}"
         
         return slug
     
     @staticmethod
+    @functools.lru_cache(maxsize=4096)
     def _slugify(text: str) -> str:
         """
         Convert text to URL-safe slug
         
+        Memoized: every note in a book repeats the same category and book names.
+        
         Args:
             text: Input text
         
@@ -227,17 +481,11 @@ class ObsidianParser:
         if not text:
             return ""
         
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Replace spaces and special characters with hyphens
-        text = re.sub(r'[^\w\s-]', '', text)
-        text = re.sub(r'[-\s]+', '-', text)
+        # Lowercase, drop special characters, collapse spaces/hyphens into one hyphen
+        text = ObsidianParser.SLUG_STRIP_PATTERN.sub('', text.lower())
         
         # Remove leading/trailing hyphens
-        text = text.strip('-')
-        
-        return text
+        return ObsidianParser.SLUG_DASH_PATTERN.sub('-', text).strip('-')
     
     def get_statistics(self, notes: List[Note]) -> dict:
         """
@@ -257,20 +505,10 @@ class ObsidianParser:
                 "total_words": 0
             }
         
-        categories = {}
-        books = {}
-        total_words = 0
-        
-        for note in notes:
-            # Count by category
-            categories[note.category] = categories.get(note.category, 0) + 1
-            
-            # Count by book
-            if note.book:
-                books[note.book] = books.get(note.book, 0) + 1
-            
-            # Total words
-            total_words += note.word_count
+        # Counting loops run in C
+        categories = Counter(note.category for note in notes)
+        books = Counter(note.book for note in notes if note.book)
+        total_words = sum(map(attrgetter('word_count'), notes))
         
         return {
             "total_notes": len(notes),
@@ -281,10 +519,48 @@ class ObsidianParser:
         }
 
 
-def parse_vault(vault_path: str) -> Tuple[List[Note], dict]:
+# Per-process parser for ObsidianParser._parse_parallel, set by the pool initializer
+_worker_parser: Optional[ObsidianParser] = None
+
+
+def _init_parser_worker(vault_path: str):
+    """Create the worker's parser once per process"""
+    global _worker_parser
+    _worker_parser = ObsidianParser(vault_path)
+
+
+def _parse_one(file_path: str) -> Optional[Note]:
+    """Worker task: parse one file (parse_note logs and swallows its own errors)"""
+    return _worker_parser.parse_note(Path(file_path))
+
+
+def parse_vault(
+    vault_path: str,
+    cache_path: Optional[Path] = None,
+    workers: Optional[int] = None
+) -> Tuple[List[Note], dict]:
     """
     Convenience function to parse entire vault and return notes with stats
     
+    Args:
+        vault_path: Path to Obsidian vault
+        cache_path: Parsed-note cache, so unchanged files are not re-parsed (optional)
+        workers: Parser processes for large vaults (default: CPU count; 1 = serial)
+    
+    Returns:
+        Tuple of (notes list, statistics dict)
+    """
+    parser = ObsidianParser(vault_path, cache_path=cache_path)
+    notes = parser.parse_all_notes(max_workers=workers)
+    stats = parser.get_statistics(notes)
+    
+    return notes, stats
+
+
+async def parse_vault_async(vault_path: str) -> Tuple[List[Note], dict]:
+    """
+    Like parse_vault(), but with concurrent file reads for cloud-synced vaults
+    
     Args:
         vault_path: Path to Obsidian vault
     
@@ -292,7 +568,7 @@ def parse_vault(vault_path: str) -> Tuple[List[Note], dict]:
         Tuple of (notes list, statistics dict)
     """
     parser = ObsidianParser(vault_path)
-    notes = parser.parse_all_notes()
+    notes = await parser.parse_all_notes_async()
     stats = parser.get_statistics(notes)
     
     return notes, stats
@@ -0,0 +1,180 @@
+"""
+Query Micro-Batcher
+Coalesces concurrent embed + vector search requests into batched calls
+"""
+
+import asyncio
+import os
+from typing import List, Optional, Dict, Any, Tuple
+import logging
+
+from app.services.vector_db import get_vector_db, split_results
+from app.services.embedding_service import get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBatcher:
+    """
+    Micro-batching layer in front of the embedding model and ChromaDB
+
+    Requests arriving within a short window are drained from a queue by a
+    single background task, embedded with one forward pass, and searched
+    with one ChromaDB call per distinct (n_results, filters) group. Each
+    caller awaits its own future and receives results in the same shape as
+    VectorDBService.query().
+    """
+
+    def __init__(self, max_batch: int = 32, max_wait_ms: float = 10):
+        """
+        Initialize query batcher
+
+        Args:
+            max_batch: Maximum number of queries coalesced into one batch
+            max_wait_ms: Maximum time to wait for a batch to fill up
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self):
+        """Start the collector task on the running event loop if needed"""
+        loop = asyncio.get_running_loop()
+
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(
+        self,
+        query: str,
+        n_results: int = 10,
+        category_filter: Optional[str] = None,
+        book_filter: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        include_embeddings: bool = False
+    ) -> Tuple[List[float], Dict[str, Any]]:
+        """
+        Embed and search a single query as part of the next batch
+
+        Args:
+            query: Query text
+            n_results: Number of results to return
+            category_filter: Filter by category (optional)
+            book_filter: Filter by book (optional)
+            nprobe: FAISS cells to scan (optional)
+            include_embeddings: Also return the stored embedding of each hit
+
+        Returns:
+            Tuple of (query_embedding, results)
+        """
+        self._ensure_worker()
+
+        future = self._loop.create_future()
+        await self._queue.put((query, n_results, category_filter, book_filter, nprobe, include_embeddings, future))
+
+        return await future
+
+    async def _run(self):
+        """Collector loop: drain up to max_batch requests or until max_wait"""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: list):
+        """Run one batch off the event loop and resolve the callers' futures"""
+        requests = [item[:-1] for item in batch]
+
+        try:
+            outputs = await asyncio.to_thread(self._search_batch, requests)
+        except Exception as e:
+            logger.error(f"Batched query failed: {e}")
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), output in zip(batch, outputs):
+            if not future.done():
+                future.set_result(output)
+
+    def _search_batch(
+        self,
+        requests: List[tuple]
+    ) -> List[Tuple[List[float], Dict[str, Any]]]:
+        """
+        Embed all queries at once, then issue one vector search per filter group
+
+        Args:
+            requests: List of (query, n_results, category_filter, book_filter, nprobe, include_embeddings)
+
+        Returns:
+            List of (query_embedding, results), in request order
+        """
+        embedding_service = get_embedding_service()
+        vector_db = get_vector_db()
+
+        embeddings = embedding_service.embed_texts([r[0] for r in requests])
+
+        # Group request indices by their search parameters
+        groups: Dict[tuple, List[int]] = {}
+        for i, (_, *params) in enumerate(requests):
+            groups.setdefault(tuple(params), []).append(i)
+
+        outputs: List[Optional[tuple]] = [None] * len(requests)
+
+        for (n_results, category_filter, book_filter, nprobe, include_embeddings), indices in groups.items():
+            results = vector_db.query_batch(
+                query_embeddings=[embeddings[i] for i in indices],
+                n_results=n_results,
+                category_filter=category_filter,
+                book_filter=book_filter,
+                nprobe=nprobe,
+                include_embeddings=include_embeddings
+            )
+
+            # Split the batched result back into single-query results
+            for i, single in zip(indices, split_results(results, len(indices))):
+                outputs[i] = (embeddings[i], single)
+
+        if len(requests) > 1:
+            logger.debug(f"Batched {len(requests)} queries into {len(groups)} searches")
+
+        return outputs
+
+
+# Global query batcher instance
+_query_batcher: Optional[QueryBatcher] = None
+
+
+def get_query_batcher() -> QueryBatcher:
+    """
+    Get or create the global query batcher instance
+
+    Returns:
+        QueryBatcher instance
+    """
+    global _query_batcher
+
+    if _query_batcher is None:
+        _query_batcher = QueryBatcher(
+            max_batch=int(os.getenv("QUERY_BATCH_SIZE", "32")),
+            max_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", "10"))
+        )
+
+    return _query_batcher
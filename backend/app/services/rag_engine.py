@@ -4,42 +4,120 @@ Orchestrates the complete RAG pipeline: query → retrieval → generation
 """
 
 from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
 import logging
+import os
 import re
-import ast
+import time
 
-from app.services.vector_db import get_vector_db
+import numpy as np
+
+from app.services.vector_db import get_vector_db, split_results
 from app.services.embedding_service import get_embedding_service
+from app.services.query_batcher import get_query_batcher
 from app.models.api import Citation
+from app.utils.cache import LRUCache
+from app.utils.metadata import parse_links
+from app.utils.text import count_tokens
 
 logger = logging.getLogger(__name__)
 
+# Assembled (context, citations) per query are reused for this long
+CONTEXT_CACHE_TTL_SECONDS = 600
+
+# Paraphrased queries this similar (cosine) reuse an earlier retrieval
+SEMANTIC_CONTEXT_THRESHOLD = 0.97
+SEMANTIC_CONTEXT_SIZE = 256
+
+# Reranking: full composite score, similarity + link bonus only, or plain ANN order
+RERANK_MODES = ("full", "fast", "off")
+
 
 class RAGEngine:
     """
     RAG Engine for context retrieval and response generation
     """
     
+    # Pattern for [n] citations, numbered like the context chunks and returned citations
+    CITATION_PATTERN = re.compile(r'\[(\d+)\]')
+    
+    # Static system prompt; sent separately where providers can cache it
+    SYSTEM_PROMPT = """You are a compassionate spiritual guide and mentor. You help people navigate difficult times with wisdom drawn from spiritual teachings, psychology, and philosophy.
+
+Your knowledge comes from a curated collection of books and notes on:
+- Spiritual wisdom (Eckhart Tolle, Tao Te Ching, Buddhism, Christianity)
+- Psychology and neuroscience (Huberman Lab, cognitive science)
+- Self-help and personal development (Atomic Habits, Mastery)
+- Philosophy and existentialism
+
+Guidelines:
+1. Be warm, empathetic, and non-judgmental
+2. Cite sources by the number of their knowledge passage, e.g. [1] or [2][3]
+3. Provide practical guidance alongside wisdom
+4. Acknowledge when topics are outside your knowledge base
+5. Encourage self-reflection and personal growth
+6. Respect all spiritual and philosophical traditions
+7. Keep responses focused and concise (2-3 paragraphs)
+
+Remember: You're a guide, not a therapist. For serious mental health concerns, suggest professional help."""
+    
+    # Fixed prompt sections, assembled once instead of on every request
+    KNOWLEDGE_HEADER = "=== RELEVANT KNOWLEDGE ===\n"
+    SYSTEM_HEADER = f"=== SYSTEM ===\n{SYSTEM_PROMPT}\n\n{KNOWLEDGE_HEADER}"
+    QUESTION_INSTRUCTIONS = (
+        "Please provide a thoughtful, well-cited response that draws on the relevant knowledge above. "
+        "Cite the sources by their numbers, e.g. [1]."
+    )
+    
     def __init__(
         self,
         top_k: int = 10,
-        context_limit: int = 2000  # tokens
+        context_limit: int = 2000,  # tokens
+        rerank_k: int = 50,
+        rerank: str = "full"
     ):
         """
         Initialize RAG engine
         
         Args:
-            top_k: Number of chunks to retrieve
+            top_k: Number of chunks kept after re-ranking
             context_limit: Maximum context size in tokens
+            rerank_k: Candidates fetched from the ANN search and rescored
+                exactly before the top_k are selected
+            rerank: "full" (similarity + keyword overlap + links), "fast"
+                (similarity + precomputed link bonus, no text tokenization)
+                or "off" (ANN order)
         """
+        if rerank not in RERANK_MODES:
+            raise ValueError(f"Unknown rerank mode '{rerank}' (expected one of {', '.join(RERANK_MODES)})")
+        
         self.top_k = top_k
         self.context_limit = context_limit
+        self.rerank = rerank
+        # Without reranking only the top_k in ANN order are ever used
+        self.rerank_k = max(rerank_k, top_k) if rerank != "off" else top_k
         
         # Get services
         self.vector_db = get_vector_db()
         self.embedding_service = get_embedding_service()
         
-        logger.info(f"RAG Engine initialized (top_k={top_k}, context_limit={context_limit})")
+        # End-to-end retrieval cache; query embeddings are cached by the embedding service
+        self._context_cache = LRUCache(max_size=1000, ttl_seconds=CONTEXT_CACHE_TTL_SECONDS)
+        
+        # Ring buffer of recent query embeddings (FP16) and their (scope, context, citations, expiry)
+        self._semantic_vectors: Optional[np.ndarray] = None
+        self._semantic_entries: List[Optional[tuple]] = [None] * SEMANTIC_CONTEXT_SIZE
+        self._semantic_next = 0
+        self.semantic_hits = 0
+        
+        # Lowercased word set per chunk, so reranking splits each chunk's text once
+        self._word_sets = LRUCache(max_size=20000)
+        
+        logger.info(
+            f"RAG Engine initialized (top_k={top_k}, rerank={rerank}, rerank_k={self.rerank_k}, "
+            f"context_limit={context_limit})"
+        )
     
     def retrieve_context(
         self,
@@ -60,21 +138,274 @@ class RAGEngine:
         """
         logger.info(f"Retrieving context for query: {query[:50]}...")
         
-        # Step 1: Embed the query
+        cached = self.get_cached_context(query, category_filter, book_filter)
+        if cached is not None:
+            return cached
+        
+        # Step 1: Embed the query (repeat queries hit the embedding cache)
         query_embedding = self.embedding_service.embed_text(query)
         
-        # Step 2: Query vector database
+        # A paraphrase of a recent query reuses its retrieval without a search
+        similar = self.get_similar_context(query_embedding, category_filter, book_filter)
+        if similar is not None:
+            return similar
+        
+        # Step 2: Query vector database for the wider candidate set
         results = self.vector_db.query(
             query_embedding=query_embedding,
-            n_results=self.top_k,
+            n_results=self.rerank_k,
             category_filter=category_filter,
-            book_filter=book_filter
+            book_filter=book_filter,
+            include_embeddings=True
+        )
+        
+        # Steps 3-4: Re-rank and assemble context
+        context, citations = self.build_context(query, results, query_embedding)
+        self.cache_context(query, context, citations, category_filter, book_filter, query_embedding)
+        return context, citations
+    
+    async def retrieve_context_async(
+        self,
+        query: str,
+        category_filter: Optional[str] = None,
+        book_filter: Optional[str] = None
+    ) -> tuple[str, List[Citation]]:
+        """
+        Retrieve relevant context for a query without blocking the event loop
+        
+        Embedding and search go through the query batcher, which coalesces
+        concurrent requests and runs them in a worker thread; reranking and
+        assembly run in another thread.
+        
+        Args:
+            query: User query
+            category_filter: Optional category filter
+            book_filter: Optional book filter
+        
+        Returns:
+            Tuple of (formatted_context, citations)
+        """
+        cached = self.get_cached_context(query, category_filter, book_filter)
+        if cached is not None:
+            return cached
+        
+        query_embedding, results = await get_query_batcher().submit(
+            query,
+            n_results=self.rerank_k,
+            category_filter=category_filter,
+            book_filter=book_filter,
+            include_embeddings=True
+        )
+        
+        # A paraphrase of a recent query reuses its reranked context
+        similar = self.get_similar_context(query_embedding, category_filter, book_filter)
+        if similar is not None:
+            self.cache_context(query, *similar, category_filter, book_filter)
+            return similar
+        
+        context, citations = await asyncio.to_thread(self.build_context, query, results, query_embedding)
+        self.cache_context(query, context, citations, category_filter, book_filter, query_embedding)
+        return context, citations
+    
+    def retrieve_context_batch(
+        self,
+        queries: List[str],
+        category_filter: Optional[str] = None,
+        book_filter: Optional[str] = None
+    ) -> List[tuple[str, List[Citation]]]:
+        """
+        Retrieve context for several queries with one embedding pass and one search
+        
+        Args:
+            queries: User queries
+            category_filter: Optional category filter (applied to every query)
+            book_filter: Optional book filter (applied to every query)
+        
+        Returns:
+            List of (formatted_context, citations), in query order
+        """
+        outputs: List[Optional[tuple[str, List[Citation]]]] = [
+            self.get_cached_context(query, category_filter, book_filter) for query in queries
+        ]
+        misses = [i for i, output in enumerate(outputs) if output is None]
+        if not misses:
+            return outputs
+        
+        logger.info(f"Retrieving context for {len(misses)} queries in one batch")
+        
+        # One forward pass for all uncached queries; paraphrases of recent
+        # queries are answered from the semantic cache, the rest share one search
+        embeddings = self.embedding_service.embed_texts([queries[i] for i in misses])
+        to_search = []
+        for i, embedding in zip(misses, embeddings):
+            outputs[i] = self.get_similar_context(embedding, category_filter, book_filter)
+            if outputs[i] is None:
+                to_search.append((i, embedding))
+        if not to_search:
+            return outputs
+        
+        results = self.vector_db.query_batch(
+            query_embeddings=[embedding for _, embedding in to_search],
+            n_results=self.rerank_k,
+            category_filter=category_filter,
+            book_filter=book_filter,
+            include_embeddings=True
+        )
+        
+        for (i, embedding), single in zip(to_search, split_results(results, len(to_search))):
+            context, citations = self.build_context(queries[i], single, embedding)
+            self.cache_context(queries[i], context, citations, category_filter, book_filter, embedding)
+            outputs[i] = (context, citations)
+        
+        return outputs
+    
+    def _context_scope(self, category_filter: Optional[str], book_filter: Optional[str]) -> str:
+        """Everything besides the query that a reused retrieval must match"""
+        return f"{self.vector_db.write_version}|{self.top_k}|{self.rerank_k}|{self.rerank}|{category_filter}|{book_filter}"
+    
+    def _context_key(
+        self,
+        query: str,
+        category_filter: Optional[str],
+        book_filter: Optional[str]
+    ) -> bytes:
+        """Cache key for a retrieval; the DB write version invalidates old entries"""
+        raw = f"{self._context_scope(category_filter, book_filter)}|{query}"
+        return hashlib.blake2b(raw.encode(), digest_size=16).digest()
+    
+    def get_cached_context(
+        self,
+        query: str,
+        category_filter: Optional[str] = None,
+        book_filter: Optional[str] = None
+    ) -> Optional[tuple[str, List[Citation]]]:
+        """
+        Look up an earlier retrieval for the same query and filters
+        
+        Args:
+            query: User query
+            category_filter: Optional category filter
+            book_filter: Optional book filter
+        
+        Returns:
+            Tuple of (formatted_context, citations), or None on miss
+        """
+        return self._context_cache.get(self._context_key(query, category_filter, book_filter))
+    
+    def get_similar_context(
+        self,
+        query_embedding: List[float],
+        category_filter: Optional[str] = None,
+        book_filter: Optional[str] = None
+    ) -> Optional[tuple[str, List[Citation]]]:
+        """
+        Look up a recent retrieval for a near-identical query and the same filters
+        
+        Embeddings are normalized, so one matrix-vector product over the ring
+        buffer gives the cosine similarity to every indexed query.
+        
+        Args:
+            query_embedding: Normalized embedding of the user query
+            category_filter: Optional category filter
+            book_filter: Optional book filter
+        
+        Returns:
+            Tuple of (formatted_context, citations), or None on miss
+        """
+        if self._semantic_vectors is None:
+            return None
+        
+        scores = self._semantic_vectors.astype(np.float32) @ np.asarray(query_embedding, dtype=np.float32)
+        
+        # Entries from another scope (filters, top_k, or an older DB version) or expired never match
+        scope = self._context_scope(category_filter, book_filter)
+        now = time.monotonic()
+        for slot, entry in enumerate(self._semantic_entries):
+            if entry is None or entry[0] != scope or entry[3] < now:
+                scores[slot] = -1.0
+        
+        best = int(np.argmax(scores))
+        if scores[best] < SEMANTIC_CONTEXT_THRESHOLD:
+            return None
+        
+        self.semantic_hits += 1
+        _, context, citations, _ = self._semantic_entries[best]
+        return context, citations
+    
+    def cache_context(
+        self,
+        query: str,
+        context: str,
+        citations: List[Citation],
+        category_filter: Optional[str] = None,
+        book_filter: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
+    ):
+        """
+        Store a retrieval result for get_cached_context()
+        
+        Args:
+            query: User query
+            context: Formatted context from build_context()
+            citations: Citations from build_context()
+            category_filter: Optional category filter
+            book_filter: Optional book filter
+            query_embedding: Normalized query embedding; also indexes the
+                result for get_similar_context()
+        """
+        self._context_cache.set(self._context_key(query, category_filter, book_filter), (context, citations))
+        
+        if query_embedding is None:
+            return
+        
+        vector = np.asarray(query_embedding, dtype=np.float16)
+        if self._semantic_vectors is None:
+            self._semantic_vectors = np.zeros((SEMANTIC_CONTEXT_SIZE, len(vector)), dtype=np.float16)
+        
+        slot = self._semantic_next
+        self._semantic_vectors[slot] = vector
+        self._semantic_entries[slot] = (
+            self._context_scope(category_filter, book_filter),
+            context,
+            citations,
+            time.monotonic() + CONTEXT_CACHE_TTL_SECONDS,
         )
+        self._semantic_next = (slot + 1) % SEMANTIC_CONTEXT_SIZE
+    
+    def cache_stats(self) -> dict:
+        """
+        Get retrieval cache statistics
         
-        # Step 3: Re-rank and select best chunks
-        ranked_chunks = self._rerank_results(query, results)
+        Returns:
+            Hit/miss/eviction counters for the context and query-embedding caches
+        """
+        return {
+            "context": {**self._context_cache.stats(), "semantic_hits": self.semantic_hits},
+            "query_embeddings": self.embedding_service.get_model_info()["cache"],
+        }
+    
+    def build_context(
+        self,
+        query: str,
+        results: Dict[str, Any],
+        query_embedding: Optional[List[float]] = None
+    ) -> tuple[str, List[Citation]]:
+        """
+        Re-rank vector search results and assemble them into prompt context
         
-        # Step 4: Assemble context
+        Args:
+            query: User query
+            results: Results from vector database for this query (ideally
+                rerank_k candidates, with embeddings)
+            query_embedding: Normalized query embedding, for exact rescoring
+        
+        Returns:
+            Tuple of (formatted_context, citations)
+        """
+        # Re-rank and select best chunks
+        ranked_chunks = self._rerank_results(query, results, query_embedding)
+        
+        # Assemble context
         context, citations = self._assemble_context(ranked_chunks)
         
         logger.info(f"Retrieved {len(citations)} relevant sources")
@@ -84,14 +415,20 @@ class RAGEngine:
     def _rerank_results(
         self,
         query: str,
-        results: Dict[str, Any]
+        results: Dict[str, Any],
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Re-rank results based on multiple factors
+        Re-rank results based on multiple factors and keep the best top_k
+        
+        When the results carry the stored FP32 embeddings, similarity is the
+        exact cosine to the query rather than the ANN distance, which may be
+        approximate (e.g. FAISS IVF-PQ codes).
         
         Args:
             query: Original query
             results: Results from vector database
+            query_embedding: Normalized query embedding (optional)
         
         Returns:
             List of ranked chunks with scores
@@ -99,45 +436,106 @@ class RAGEngine:
         if not results['ids'] or len(results['ids'][0]) == 0:
             return []
         
-        ranked = []
-        query_lower = query.lower()
+        ids = results['ids'][0]
+        texts = results['documents'][0]
+        metadatas = results['metadatas'][0]
+        distances = np.asarray(results['distances'][0], dtype=np.float64)
+        
+        embeddings = results.get('embeddings')
+        if query_embedding is not None and embeddings is not None and embeddings[0] is not None:
+            # Stored embeddings are normalized, so the dot product is the cosine
+            candidates = np.asarray(embeddings[0], dtype=np.float32)
+            similarities = (candidates @ np.asarray(query_embedding, dtype=np.float32)).astype(np.float64)
+            distances = 1.0 - similarities
+        else:
+            similarities = 1.0 - distances
+        
+        if self.rerank == "off":
+            # ANN order as-is; the score is the similarity alone
+            order = np.arange(min(len(ids), self.top_k))
+            return self._ranked_chunks(ids, texts, metadatas, distances, similarities, similarities, order)
+        
+        # Keyword match: fraction of query words present in the chunk; one sparse
+        # product over the keyword index when enabled, else per-chunk word sets
+        # (skipped by the fast path, which needs no text tokenization)
+        query_words = frozenset(query.lower().split()) if self.rerank == "full" else frozenset()
+        if query_words:
+            index = self.vector_db.get_keyword_index()
+            counts = index.overlap_counts(query_words, ids) if index is not None else None
+            if counts is None:
+                counts = np.fromiter(
+                    (len(query_words & self._chunk_words(chunk_id, text)) for chunk_id, text in zip(ids, texts)),
+                    dtype=np.float64, count=len(texts)
+                )
+            overlap = counts / len(query_words)
+        else:
+            overlap = np.zeros(len(texts))
+        
+        # Link density - more connected notes are more important
+        # (link_count is precomputed at ingest; older collections parse links)
+        link_counts = np.fromiter(
+            (
+                metadata['link_count'] if metadata.get('link_count') is not None
+                else len(parse_links(metadata.get('links')))
+                for metadata in metadatas
+            ),
+            dtype=np.float64, count=len(metadatas)
+        )
         
-        for i in range(len(results['ids'][0])):
-            chunk = {
-                'id': results['ids'][0][i],
-                'text': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'distance': results['distances'][0][i],
-                'similarity': 1.0 - results['distances'][0][i]
-            }
-            
-            # Calculate composite score
-            score = chunk['similarity'] * 0.7  # Base semantic similarity (70%)
-            
-            # Keyword match bonus (20%)
-            text_lower = chunk['text'].lower()
-            query_words = set(query_lower.split())
-            text_words = set(text_lower.split())
-            keyword_overlap = len(query_words & text_words) / len(query_words) if query_words else 0
-            score += keyword_overlap * 0.2
-            
-            # Link density bonus (10%) - more connected notes are more important
-            links_str = chunk['metadata'].get('links', '[]')
-            try:
-                links = ast.literal_eval(links_str) if isinstance(links_str, str) else links_str
-                link_count = len(links) if isinstance(links, list) else 0
-                score += min(link_count * 0.01, 0.1)
-            except (ValueError, SyntaxError):
-                pass
-            
-            chunk['final_score'] = score
-            ranked.append(chunk)
+        # Composite score: similarity (70%) + keyword overlap (20%) + links (up to 10%)
+        scores = 0.7 * similarities + 0.2 * overlap + np.minimum(link_counts * 0.01, 0.1)
         
-        # Sort by final score
-        ranked.sort(key=lambda x: x['final_score'], reverse=True)
+        # Highest score first; stable, so ties keep the vector search order
+        order = np.argsort(-scores, kind="stable")[:self.top_k]
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            # Score spread and how far reranking moved the picks from ANN order, for comparing modes
+            moved = int(np.count_nonzero(order != np.arange(len(order))))
+            logger.debug(
+                f"Rerank ({self.rerank}): {len(ids)} candidates, scores {scores.min():.3f}-{scores.max():.3f}, "
+                f"{moved}/{len(order)} picks differ from ANN order"
+            )
+        
+        return self._ranked_chunks(ids, texts, metadatas, distances, similarities, scores, order)
+    
+    @staticmethod
+    def _ranked_chunks(
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        distances: np.ndarray,
+        similarities: np.ndarray,
+        scores: np.ndarray,
+        order: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """Chunk dicts for the selected positions, in ranked order"""
+        distance_list = distances.tolist()
+        similarity_list = similarities.tolist()
+        score_list = scores.tolist()
+        
+        ranked = [
+            {
+                'id': ids[i],
+                'text': texts[i],
+                'metadata': metadatas[i],
+                'distance': distance_list[i],
+                'similarity': similarity_list[i],
+                'final_score': score_list[i]
+            }
+            for i in order.tolist()
+        ]
         
         return ranked
     
+    def _chunk_words(self, chunk_id: str, text: str) -> frozenset:
+        """Lowercased word set of a chunk, computed once per chunk and DB version"""
+        key = (self.vector_db.write_version, chunk_id)
+        words = self._word_sets.get(key)
+        if words is None:
+            words = frozenset(text.lower().split())
+            self._word_sets.set(key, words)
+        return words
+    
     def _assemble_context(
         self,
         chunks: List[Dict[str, Any]]
@@ -153,26 +551,26 @@ class RAGEngine:
         """
         context_parts = []
         citations = []
-        total_words = 0
-        max_words = int(self.context_limit * 0.75)  # Rough token-to-word conversion
+        total_tokens = 0
         
         for i, chunk in enumerate(chunks):
-            chunk_words = len(chunk['text'].split())
+            # Token counts are stored at ingest; older collections count here
+            metadata = chunk['metadata']
+            chunk_tokens = metadata.get('token_count')
+            if chunk_tokens is None:
+                chunk_tokens = count_tokens(chunk['text'])
             
             # Stop if we exceed context limit
-            if total_words + chunk_words > max_words:
+            if total_tokens + chunk_tokens > self.context_limit:
                 break
             
-            # Format context with source attribution
-            metadata = chunk['metadata']
             source_title = metadata.get('title', 'Unknown')
             source_category = metadata.get('category', 'General')
             source_book = metadata.get('book', '')
             
-            # Add to context
-            source_label = f"{source_book} - {source_title}" if source_book else source_title
-            context_part = f"[Source: {source_label}]\n{chunk['text']}"
-            context_parts.append(context_part)
+            # Add to context under a short numeric tag; the number is the
+            # citation's position in the returned list, which carries the title
+            context_parts.append(f"[{len(citations) + 1}]\n{chunk['text']}")
             
             # Add citation
             citations.append(
@@ -186,12 +584,12 @@ class RAGEngine:
                 )
             )
             
-            total_words += chunk_words
+            total_tokens += chunk_tokens
         
         # Join context parts
         formatted_context = "\n\n---\n\n".join(context_parts)
         
-        logger.info(f"Assembled context: {total_words} words, {len(citations)} citations")
+        logger.info(f"Assembled context: {total_tokens} tokens, {len(citations)} citations")
         
         return formatted_context, citations
     
@@ -199,7 +597,8 @@ class RAGEngine:
         self,
         query: str,
         context: str,
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        include_system: bool = True
     ) -> str:
         """
         Construct the full prompt for LLM
@@ -208,85 +607,47 @@ class RAGEngine:
             query: User query
             context: Retrieved context
             conversation_history: Previous conversation turns
+            include_system: Inline SYSTEM_PROMPT; pass False when it is sent
+                as a separate system message instead
         
         Returns:
             Complete prompt string
         """
-        # System prompt
-        system_prompt = """You are a compassionate spiritual guide and mentor. You help people navigate difficult times with wisdom drawn from spiritual teachings, psychology, and philosophy.
-
-Your knowledge comes from a curated collection of books and notes on:
-- Spiritual wisdom (Eckhart Tolle, Tao Te Ching, Buddhism, Christianity)
-- Psychology and neuroscience (Huberman Lab, cognitive science)
-- Self-help and personal development (Atomic Habits, Mastery)
-- Philosophy and existentialism
-
-Guidelines:
-1. Be warm, empathetic, and non-judgmental
-2. Reference specific sources using the format [Source: Book/Note Title]
-3. Provide practical guidance alongside wisdom
-4. Acknowledge when topics are outside your knowledge base
-5. Encourage self-reflection and personal growth
-6. Respect all spiritual and philosophical traditions
-7. Keep responses focused and concise (2-3 paragraphs)
-
-Remember: You're a guide, not a therapist. For serious mental health concerns, suggest professional help."""
-
-        # Build the full prompt
-        prompt_parts = [
-            "=== SYSTEM ===",
-            system_prompt,
-            "",
-            "=== RELEVANT KNOWLEDGE ===",
-            context,
-            ""
-        ]
+        header = self.SYSTEM_HEADER if include_system else self.KNOWLEDGE_HEADER
+        
+        # Add conversation history if present (only the last 3 turns, 6 messages)
+        history_block = ""
+        if conversation_history:
+            turns = "".join(
+                f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}\n"
+                for msg in conversation_history[-6:]
+            )
+            history_block = f"=== CONVERSATION HISTORY ===\n{turns}\n"
         
-        # Add conversation history if present
-        if conversation_history and len(conversation_history) > 0:
-            prompt_parts.append("=== CONVERSATION HISTORY ===")
-            # Only include last 3 turns (6 messages)
-            recent_history = conversation_history[-6:]
-            for msg in recent_history:
-                role = "User" if msg['role'] == 'user' else "Assistant"
-                prompt_parts.append(f"{role}: {msg['content']}")
-            prompt_parts.append("")
-        
-        # Add current query
-        prompt_parts.extend([
-            "=== CURRENT QUESTION ===",
-            f"User: {query}",
-            "",
-            "Please provide a thoughtful, well-cited response that draws on the relevant knowledge above. Use [Source: Title] format when referencing the sources.",
-            "",
-            "Assistant:"
-        ])
-        
-        return "\n".join(prompt_parts)
-    
-    def parse_citations(self, response: str) -> List[str]:
+        return (
+            f"{header}{context}\n\n{history_block}"
+            f"=== CURRENT QUESTION ===\nUser: {query}\n\n"
+            f"{self.QUESTION_INSTRUCTIONS}\n\nAssistant:"
+        )
+    
+    def parse_citations(self, response: str, citations: List[Citation]) -> List[str]:
         """
         Parse citation references from LLM response
         
         Args:
             response: LLM generated response
+            citations: Citations returned with the context, numbered from 1
         
         Returns:
             List of cited source titles
         """
-        # Pattern for [Source: Title] citations
-        pattern = r'\[Source:\s*([^\]]+)\]'
-        citations = re.findall(pattern, response)
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_citations = []
-        for citation in citations:
-            if citation not in seen:
-                seen.add(citation)
-                unique_citations.append(citation)
-        
-        return unique_citations
+        # Cheap substring pre-check: responses without citations skip the regex
+        if "[" not in response:
+            return []
+        
+        # Remove duplicates while preserving order; numbers outside the list are ignored
+        numbers = dict.fromkeys(int(n) for n in self.CITATION_PATTERN.findall(response))
+        return [citations[n - 1].title for n in numbers if 1 <= n <= len(citations)]
 
 
 # Global RAG engine instance
@@ -303,7 +664,7 @@ def get_rag_engine() -> RAGEngine:
     global _rag_engine
     
     if _rag_engine is None:
-        _rag_engine = RAGEngine()
+        _rag_engine = RAGEngine(rerank=os.getenv("RAG_RERANK", "full").lower())
     
     return _rag_engine
 
@@ -0,0 +1,201 @@
+"""
+LLM Response Cache
+Exact and semantic caching of generated responses for deterministic prompts
+"""
+
+from typing import List, Optional
+import hashlib
+import logging
+
+import numpy as np
+
+from app.utils.cache import LRUCache
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency (pip install redis)
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Responses sampled above this temperature are not reproducible; never cache them
+CACHE_MAX_TEMPERATURE = 0.3
+
+# Similar-query lookups are only trusted for near-greedy sampling
+SEMANTIC_MAX_TEMPERATURE = 0.2
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM responses
+
+    Tier 1 is an exact match on a SHA-256 key over the provider, model,
+    sampling parameters and the full prompt. It lives in an in-process LRU,
+    optionally backed by Redis, so workers and restarts share hits.
+
+    Tier 2 is a semantic match: the user's query embedding is compared with
+    the queries of earlier cached responses for the same provider, model,
+    parameters and retrieved context (so a different filter, a re-ingest or
+    a different citation order never reuses an answer). A cosine similarity
+    above the threshold reuses the response
+    (GPTCache-style). Embeddings are normalized, so a matrix-vector product
+    over a fixed-size ring buffer gives exact cosine scores.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl_seconds: Optional[float] = 3600,
+        semantic_threshold: float = 0.95,
+        redis_url: Optional[str] = None
+    ):
+        """
+        Initialize response cache
+
+        Args:
+            max_size: Maximum responses kept in memory (and query vectors indexed)
+            ttl_seconds: Seconds before a cached response expires (None = never)
+            semantic_threshold: Minimum cosine similarity for a semantic hit
+            redis_url: Optional Redis URL for the shared second-level store
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+
+        self._entries = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+        self._redis = None
+        if redis_url:
+            if aioredis is None:
+                logger.warning("⚠  REDIS_URL is set but redis is not installed (pip install redis)")
+            else:
+                self._redis = aioredis.from_url(redis_url)
+
+        # Ring buffer of (scope, query vector, response key) for semantic lookups
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes: List[Optional[str]] = [None] * max_size
+        self._keys: List[Optional[str]] = [None] * max_size
+        self._next_slot = 0
+        self.semantic_hits = 0
+
+    @staticmethod
+    def make_scope(provider: str, model: str, temperature: float, top_p: float, max_tokens: int) -> str:
+        """Everything that must match, besides the prompt, for a response to be reused"""
+        return f"{provider}|{model}|{temperature}|{top_p}|{max_tokens}"
+
+    @staticmethod
+    def make_key(scope: str, prompt: str) -> str:
+        """Exact-match key for a prompt within a scope"""
+        return hashlib.sha256(f"{scope}|{prompt}".encode()).hexdigest()
+
+    @staticmethod
+    def make_semantic_scope(scope: str, context: Optional[str]) -> str:
+        """Scope for similar-query matching: the response must also be grounded in the same context"""
+        if context is None:
+            return scope
+        return f"{scope}|{hashlib.blake2b(context.encode(), digest_size=16).hexdigest()}"
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response by exact key
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Cached response text, or None
+        """
+        value = self._entries.get(key)
+        if value is not None or self._redis is None:
+            return value
+
+        try:
+            stored = await self._redis.get(f"llm:{key}")
+        except Exception as e:
+            logger.warning(f"Redis lookup failed: {e}")
+            return None
+
+        if stored is None:
+            return None
+
+        value = stored.decode()
+        self._entries.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str):
+        """
+        Store a response under an exact key
+
+        Args:
+            key: Key from make_key()
+            value: Response text
+        """
+        self._entries.set(key, value)
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(
+                    f"llm:{key}", value,
+                    ex=int(self.ttl_seconds) if self.ttl_seconds else None
+                )
+            except Exception as e:
+                logger.warning(f"Redis store failed: {e}")
+
+    async def get_similar(self, scope: str, query_vector: List[float]) -> Optional[str]:
+        """
+        Find a response cached for a near-identical query in the same scope
+
+        Args:
+            scope: Scope from make_semantic_scope()
+            query_vector: Normalized embedding of the user query
+
+        Returns:
+            Cached response text, or None
+        """
+        if self._vectors is None:
+            return None
+
+        scores = self._vectors @ np.asarray(query_vector, dtype=np.float32)
+        in_scope = np.fromiter((s == scope for s in self._scopes), dtype=bool, count=self.max_size)
+        scores[~in_scope] = -1.0
+
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+
+        value = await self.get(self._keys[best])
+        if value is not None:
+            self.semantic_hits += 1
+        return value
+
+    def add_similar(self, scope: str, query_vector: List[float], key: str):
+        """
+        Index a cached response by its query embedding
+
+        Args:
+            scope: Scope from make_semantic_scope()
+            query_vector: Normalized embedding of the user query
+            key: Exact key the response was stored under
+        """
+        vector = np.asarray(query_vector, dtype=np.float32)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_size, len(vector)), dtype=np.float32)
+
+        slot = self._next_slot
+        self._vectors[slot] = vector
+        self._scopes[slot] = scope
+        self._keys[slot] = key
+        self._next_slot = (slot + 1) % self.max_size
+
+    def stats(self) -> dict:
+        """
+        Get cache statistics
+
+        Returns:
+            Exact-match LRU statistics plus semantic hit count
+        """
+        return {
+            **self._entries.stats(),
+            "semantic_hits": self.semantic_hits,
+            "redis": self._redis is not None,
+        }
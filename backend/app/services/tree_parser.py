@@ -3,15 +3,22 @@ Tree Structure Parser for Obsidian Notes
 Parses [[wiki links]] and builds hierarchical tree structures for books/videos
 """
 
-import re
-from typing import List, Dict, Optional, Set
-from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Dict, Optional, Set, Tuple, Union
 import logging
+import multiprocessing
+import os
+
+import orjson
 
 from app.models.note import Note
+from app.utils.text import compile_scan_pattern
 
 logger = logging.getLogger(__name__)
 
+# Below this many root notes, process-pool startup costs more than it saves
+PARALLEL_MIN_ROOTS = 8
+
 
 class TreeNode:
     """Represents a node in the note tree structure"""
@@ -30,6 +37,11 @@ class TreeNode:
         self.children: List[TreeNode] = []
         self.parent: Optional[TreeNode] = None
         self.wiki_links: List[str] = []
+        
+        # Whole-tree lookups and statistics (roots only), see index_subtree
+        self._node_index: Optional[Dict[str, 'TreeNode']] = None
+        self._total_nodes: Optional[int] = None
+        self._max_depth: Optional[int] = None
     
     def add_child(self, child: 'TreeNode'):
         """Add a child node"""
@@ -37,8 +49,57 @@ class TreeNode:
         child.parent = self
         child.depth = self.depth + 1
     
-    def to_dict(self) -> Dict:
-        """Convert to dictionary for API response"""
+    def index_subtree(self) -> Dict[str, 'TreeNode']:
+        """
+        Index this node's subtree by note ID and record its node count and
+        maximum depth on the node
+        
+        Used for trees assembled without build_tree (snapshots, worker
+        skeletons); build_tree records the same while it adds nodes.
+        
+        Returns:
+            Dictionary mapping note IDs to nodes
+        """
+        index: Dict[str, TreeNode] = {}
+        total_nodes = 0
+        max_depth = self.depth
+        
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            # setdefault: keep the first (pre-order) match
+            index.setdefault(node.note.id, node)
+            total_nodes += 1
+            max_depth = max(max_depth, node.depth)
+            stack.extend(reversed(node.children))
+        
+        self._node_index = index
+        self._total_nodes = total_nodes
+        self._max_depth = max_depth
+        return index
+    
+    def ensure_indexed(self) -> 'TreeNode':
+        """Index the subtree unless build_tree or index_subtree already did; returns self"""
+        if self._node_index is None or self._total_nodes is None:
+            self.index_subtree()
+        return self
+    
+    @property
+    def total_nodes(self) -> int:
+        """Number of nodes in this subtree"""
+        return self.ensure_indexed()._total_nodes
+    
+    @property
+    def max_depth(self) -> int:
+        """Depth of the deepest node in this subtree"""
+        return self.ensure_indexed()._max_depth
+    
+    def find(self, note_id: str) -> Optional['TreeNode']:
+        """Node for a note ID in this subtree, or None"""
+        return self.ensure_indexed()._node_index.get(note_id)
+    
+    def _fields(self) -> Dict:
+        """This node's own fields for the API response (everything but its children)"""
         return {
             "id": self.note.id,
             "title": self.note.title,
@@ -48,21 +109,80 @@ class TreeNode:
             "depth": self.depth,
             "children_count": len(self.children),
             "wiki_links": self.wiki_links,
-            "children": [child.to_dict() for child in self.children]
         }
+    
+    def to_dict(self) -> Dict:
+        """
+        Convert to dictionary for API response
+        
+        Built with an explicit stack, like build_tree, so deep link chains
+        cannot hit the interpreter's recursion limit.
+        """
+        root = self._fields()
+        root["children"] = []
+        
+        stack = [(self, root)]
+        while stack:
+            node, data = stack.pop()
+            for child in node.children:
+                child_data = child._fields()
+                child_data["children"] = []
+                data["children"].append(child_data)
+                stack.append((child, child_data))
+        
+        return root
+    
+    def to_json(self) -> bytes:
+        """
+        Encode to_dict() as JSON bytes, at any depth
+        
+        orjson refuses nesting beyond 255 levels (about 127 tree levels), so
+        each node's own fields are encoded separately and the children
+        arrays are spliced in from an explicit stack.
+        """
+        parts: List[bytes] = []
+        stack: List[Union['TreeNode', bytes]] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, bytes):
+                parts.append(item)
+                continue
+            
+            # '{...fields' + ',"children":[' ... ']}'
+            parts.append(orjson.dumps(item._fields())[:-1] + b',"children":[')
+            stack.append(b']}')
+            for i, child in enumerate(reversed(item.children)):
+                if i:
+                    stack.append(b',')
+                stack.append(child)
+        
+        return b''.join(parts)
 
 
 class TreeParser:
     """Service for parsing note tree structures"""
     
     # Pattern to match [[wiki links]]
-    WIKI_LINK_PATTERN = re.compile(r'\[\[([^\]]+)\]\]')
+    WIKI_LINK_PATTERN = compile_scan_pattern(r'\[\[([^\]]+)\]\]')
+    
+    # Lowercased filename prefixes that mark a root note, and chapter subfolders
+    ROOT_PREFIXES = ("notes ", "notes-", "a ")
+    CHAPTER_DIRS = frozenset({"files", "zfiles", "file"})
     
     def __init__(self):
         """Initialize tree parser"""
         self.notes_by_id: Dict[str, Note] = {}
         self.notes_by_title: Dict[str, Note] = {}
         self.notes_by_filepath: Dict[str, Note] = {}
+        
+        # Per-category lookups for find_note_by_link_text, built by _index_notes
+        self._title_idx: Dict[str, Dict[str, Note]] = {}
+        self._titles_by_category: Dict[str, List[Tuple[str, Note]]] = {}
+        self._stem_idx: Dict[str, Dict[str, Note]] = {}
+        self._link_cache: Dict[Tuple[str, str], Optional[Note]] = {}
+        self._links_cache: Dict[str, List[str]] = {}
+        self._indexed_notes: Optional[List[Note]] = None
+        self._indexed_count = 0
     
     def extract_wiki_links(self, content: str) -> List[str]:
         """
@@ -77,6 +197,25 @@ class TreeParser:
         matches = self.WIKI_LINK_PATTERN.findall(content)
         return [match.strip() for match in matches]
     
+    def note_links(self, note: Note) -> List[str]:
+        """
+        Wiki links of a note, extracted once per note
+        
+        Root detection and every tree that reaches the note share the result
+        for the lifetime of this parser (a vault rebuild creates a new one).
+        
+        Args:
+            note: Note object
+        
+        Returns:
+            List of link texts (shared; do not modify)
+        """
+        links = self._links_cache.get(note.id)
+        if links is None:
+            links = self.extract_wiki_links(note.content)
+            self._links_cache[note.id] = links
+        return links
+    
     def is_root_note(self, note: Note) -> bool:
         """
         Check if a note is a root note
@@ -99,8 +238,10 @@ class TreeParser:
         Returns:
             True if note is a root node
         """
-        filename = Path(note.file_path).name.lower()
-        parent_dir = Path(note.file_path).parent.name.lower()
+        # os.path string ops: no Path objects built per note
+        parent_path, filename = os.path.split(note.file_path)
+        filename = filename.lower()
+        parent_dir = os.path.basename(parent_path).lower()
         
         # Must contain "notes" in filename
         if "notes" not in filename:
@@ -108,23 +249,18 @@ class TreeParser:
         
         # Should NOT be in a subfolder like "files" or "zfiles"
         # (those typically contain chapter/section notes)
-        if parent_dir in ["files", "zfiles", "file"]:
+        if parent_dir in self.CHAPTER_DIRS:
             return False
         
-        # Additional heuristic: root notes are typically shorter and mostly [[links]]
-        # Count [[links]] vs total content length
-        wiki_links = self.extract_wiki_links(note.content)
+        # Filename starts with a "notes" or "a notes" pattern: one prefix test,
+        # done before the content heuristic since it needs no link scan
+        if filename.startswith(self.ROOT_PREFIXES):
+            return True
         
+        # Additional heuristic: root notes are typically shorter and mostly [[links]]
         # If the note has many [[links]] and short content, likely a root (TOC)
         # Root notes are typically < 1000 chars and have at least 2 [[links]]
-        if len(wiki_links) >= 2 and len(note.content) < 1000:
-            return True
-        
-        # Fallback: if filename starts with "notes" or "a notes" pattern
-        if filename.startswith("notes ") or filename.startswith("notes-") or filename.startswith("a "):
-            return True
-        
-        return False
+        return len(note.content) < 1000 and len(self.note_links(note)) >= 2
     
     def find_note_by_link_text(self, link_text: str, base_category: str) -> Optional[Note]:
         """
@@ -145,33 +281,67 @@ class TreeParser:
         """
         # Clean up the link text
         link_text_clean = link_text.strip()
-        link_text_lower = link_text_clean.lower()
         
         # Strategy 1: Exact title match
         if link_text_clean in self.notes_by_title:
             return self.notes_by_title[link_text_clean]
         
-        # Strategy 2: Case-insensitive search in same category
-        for note in self.notes_by_id.values():
-            if note.category == base_category:
-                if note.title.lower() == link_text_lower:
-                    return note
+        # Books link to the same notes repeatedly; resolve each text once
+        cache_key = (base_category, link_text_clean)
+        if cache_key in self._link_cache:
+            return self._link_cache[cache_key]
+        
+        note = self._match_in_category(link_text_clean.lower(), base_category)
+        if note is None:
+            logger.warning(f"Could not find note for link: '{link_text}' in category '{base_category}'")
         
-        # Strategy 3: Partial match (link text contained in title)
+        self._link_cache[cache_key] = note
+        return note
+    
+    def _match_in_category(self, link_text_lower: str, category: str) -> Optional[Note]:
+        """Strategies 2-4 of find_note_by_link_text, over the per-category indexes"""
+        # Strategy 2: Case-insensitive title match in same category
+        note = self._title_idx.get(category, {}).get(link_text_lower)
+        if note is not None:
+            return note
+        
+        # Strategy 3: Partial match (link text contained in title), this category only
+        for title_lower, note in self._titles_by_category.get(category, ()):
+            if link_text_lower in title_lower:
+                return note
+        
+        # Strategy 4: Filename match in same category
+        return self._stem_idx.get(category, {}).get(link_text_lower)
+    
+    def _index_notes(self, all_notes: List[Note]):
+        """
+        Build the lookup indexes for a note list (skipped if already built for it)
+        
+        Per-category indexes keep the first note in vault order for each key,
+        so lookups return the same note the old linear scans found first.
+        """
+        if all_notes is self._indexed_notes and len(all_notes) == self._indexed_count:
+            return
+        
+        self.notes_by_id = {note.id: note for note in all_notes}
+        self.notes_by_title = {note.title: note for note in all_notes}
+        self.notes_by_filepath = {note.file_path: note for note in all_notes}
+        
+        self._title_idx = {}
+        self._titles_by_category = {}
         for note in self.notes_by_id.values():
-            if note.category == base_category:
-                if link_text_lower in note.title.lower():
-                    return note
+            title_lower = note.title.lower()
+            self._title_idx.setdefault(note.category, {}).setdefault(title_lower, note)
+            self._titles_by_category.setdefault(note.category, []).append((title_lower, note))
         
-        # Strategy 4: Check if it's a filename
+        self._stem_idx = {}
         for file_path, note in self.notes_by_filepath.items():
-            filename = Path(file_path).stem  # Get filename without extension
-            if filename.lower() == link_text_lower:
-                if note.category == base_category:
-                    return note
+            stem = os.path.splitext(os.path.basename(file_path))[0].lower()
+            self._stem_idx.setdefault(note.category, {}).setdefault(stem, note)
         
-        logger.warning(f"Could not find note for link: '{link_text}' in category '{base_category}'")
-        return None
+        self._link_cache = {}
+        self._indexed_notes = all_notes
+        self._indexed_count = len(all_notes)
     
     def build_tree(self, root_note: Note, all_notes: List[Note]) -> TreeNode:
         """
@@ -184,73 +354,96 @@ class TreeParser:
         Returns:
             TreeNode representing the complete tree
         """
-        # Index notes for fast lookup
-        self.notes_by_id = {note.id: note for note in all_notes}
-        self.notes_by_title = {note.title: note for note in all_notes}
-        self.notes_by_filepath = {note.file_path: note for note in all_notes}
+        # Index notes for fast lookup (once per note list, shared by all its trees)
+        self._index_notes(all_notes)
         
-        # Create root node
+        # Create root node; the tree's note_id -> node index lives on it
         root = TreeNode(note=root_note, is_root=True, depth=0)
+        root._node_index = {root_note.id: root}
         
         # Track visited notes to avoid cycles
         visited: Set[str] = {root_note.id}
         
-        # Recursively build tree
-        self._build_tree_recursive(root, root_note.category, visited)
+        # Build the tree by following links depth-first
+        self._build_tree_iterative(root, root_note.category, visited)
         
         return root
     
-    def _build_tree_recursive(
+    def _expand_node(self, node: TreeNode) -> Optional[Iterator[str]]:
+        """Record a node's wiki links; returns an iterator over them, or None for a leaf"""
+        wiki_links = self.note_links(node.note)
+        node.wiki_links = wiki_links
+        
+        # If no links, this is a leaf
+        if not wiki_links:
+            node.is_leaf = True
+            return None
+        return iter(wiki_links)
+    
+    def _build_tree_iterative(
         self,
-        parent_node: TreeNode,
+        root_node: TreeNode,
         category: str,
         visited: Set[str]
     ):
         """
-        Recursively build tree by following [[wiki links]]
+        Build tree by following [[wiki links]] depth-first
+        
+        An explicit stack of (node, pending links) replaces recursion, so deep
+        link chains cannot hit the interpreter's recursion limit. Each new
+        child is descended into before its parent's next link, exactly as a
+        recursive walk would, so the same note wins when several link to it.
         
         Args:
-            parent_node: Current parent node
+            root_node: Node to build the tree under (its index and statistics cover every new node)
             category: Category to search within
             visited: Set of visited note IDs (to avoid cycles)
         """
-        # Extract wiki links from parent note
-        wiki_links = self.extract_wiki_links(parent_node.note.content)
-        parent_node.wiki_links = wiki_links
+        node_index = root_node._node_index
+        max_depth = root_node.depth
+        links = self._expand_node(root_node)
+        stack: List[Tuple[TreeNode, Iterator[str]]] = [(root_node, links)] if links else []
         
-        # If no links, this is a leaf
-        if not wiki_links:
-            parent_node.is_leaf = True
-            return
-        
-        # Process each link
-        for link_text in wiki_links:
-            # Find the note for this link
-            child_note = self.find_note_by_link_text(link_text, category)
+        while stack:
+            parent_node, pending = stack[-1]
             
-            if child_note is None:
-                logger.debug(f"Skipping unresolved link: {link_text}")
-                continue
-            
-            # Avoid cycles
-            if child_note.id in visited:
-                logger.debug(f"Skipping already visited note: {child_note.title}")
-                continue
-            
-            visited.add(child_note.id)
-            
-            # Create child node
-            child_node = TreeNode(
-                note=child_note,
-                is_root=False,
-                depth=parent_node.depth + 1
-            )
-            
-            # Add to tree
-            parent_node.add_child(child_node)
-            
-            # Recursively process children
-            self._build_tree_recursive(child_node, category, visited)
+            for link_text in pending:
+                # Find the note for this link
+                child_note = self.find_note_by_link_text(link_text, category)
+                
+                if child_note is None:
+                    logger.debug(f"Skipping unresolved link: {link_text}")
+                    continue
+                
+                # Avoid cycles
+                if child_note.id in visited:
+                    logger.debug(f"Skipping already visited note: {child_note.title}")
+                    continue
+                
+                visited.add(child_note.id)
+                
+                # Create child node and add to tree
+                child_node = TreeNode(
+                    note=child_note,
+                    is_root=False,
+                    depth=parent_node.depth + 1
+                )
+                parent_node.add_child(child_node)
+                node_index[child_note.id] = child_node
+                max_depth = max(max_depth, child_node.depth)
+                
+                # Descend into the child before the parent's remaining links
+                child_links = self._expand_node(child_node)
+                if child_links is not None:
+                    stack.append((child_node, child_links))
+                break
+            else:
+                # All of this node's links are processed
+                stack.pop()
+        
+        # visited keeps note IDs unique, so the index holds every node once
+        root_node._total_nodes = len(node_index)
+        root_node._max_depth = max_depth
     
     def find_root_notes(self, notes: List[Note]) -> List[Note]:
         """
@@ -264,22 +457,47 @@ class TreeParser:
         """
         return [note for note in notes if self.is_root_note(note)]
     
-    def build_all_trees(self, notes: List[Note]) -> Dict[str, TreeNode]:
+    def build_all_trees(self, notes: List[Note], max_workers: Optional[int] = None) -> Dict[str, TreeNode]:
         """
         Build trees for all root notes
         
+        Trees are independent, so with PARALLEL_MIN_ROOTS or more roots they
+        are built in a process pool (see build_trees_parallel); fewer
+        roots, or a failed pool, are built serially with shared indexes.
+        A root whose tree fails to build is logged and left out.
+        
         Args:
             notes: All notes from vault
+            max_workers: Number of worker processes (default: CPU count)
         
         Returns:
             Dictionary mapping root note ID to TreeNode
         """
         root_notes = self.find_root_notes(notes)
-        trees = {}
+        logger.info(f"Found {len(root_notes)} root notes")
+        
+        built = None
+        if len(root_notes) >= PARALLEL_MIN_ROOTS:
+            try:
+                built = build_trees_parallel(root_notes, notes, max_workers)
+            except Exception as e:
+                logger.warning(f"Parallel tree build failed, building serially: {e}")
+        
+        if built is None:
+            # Indexes are built on the first call and reused for every root
+            built = []
+            for root_note in root_notes:
+                try:
+                    logger.info(f"Building tree for: {root_note.title} ({root_note.category})")
+                    built.append((self.build_tree(root_note, notes), None))
+                except Exception as e:
+                    built.append((None, str(e)))
         
-        for root_note in root_notes:
-            logger.info(f"Building tree for: {root_note.title}")
-            tree = self.build_tree(root_note, notes)
+        trees = {}
+        for root_note, (tree, error) in zip(root_notes, built):
+            if tree is None:
+                logger.error(f"Error building tree for {root_note.title}: {error}")
+                continue
             trees[root_note.id] = tree
         
         return trees
@@ -356,6 +574,9 @@ class TreeParser:
         """
         Find a node in the tree by note ID
         
+        A dict access into the index kept on the root; a tree assembled
+        without one is indexed on its first lookup.
+        
         Args:
             tree: Tree to search
             note_id: Note ID to find
@@ -363,15 +584,119 @@ class TreeParser:
         Returns:
             TreeNode or None
         """
-        if tree.note.id == note_id:
-            return tree
-        
-        for child in tree.children:
-            result = self._find_node_in_tree(child, note_id)
-            if result:
-                return result
-        
-        return None
+        return tree.find(note_id)
+
+
+# Per-process state for build_trees_parallel, set once per worker by its initializer
+_worker_parser: Optional[TreeParser] = None
+_worker_notes: List[Note] = []
+_worker_notes_by_id: Dict[str, Note] = {}
+
+
+def _init_tree_worker(notes: List[Note]):
+    """Receive the note list once per worker process"""
+    global _worker_parser, _worker_notes, _worker_notes_by_id
+    _worker_parser = TreeParser()
+    _worker_notes = notes
+    _worker_notes_by_id = {note.id: note for note in notes}
+
+
+def tree_skeleton(tree: TreeNode) -> List[Tuple[str, bool, List[str], int]]:
+    """
+    Compact, note-free form of a tree: its nodes in pre-order as
+    (note_id, is_leaf, wiki_links, child count) rows
+    
+    The rows are flat, so neither this walk nor pickling them recurses once
+    per tree level. Worker processes return trees in this form, and the
+    API's on-disk tree snapshot stores it.
+    """
+    rows = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        rows.append((node.note.id, node.is_leaf, node.wiki_links, len(node.children)))
+        stack.extend(reversed(node.children))
+    return rows
+
+
+def tree_from_skeleton(rows: List[tuple], notes_by_id: Dict[str, Note]) -> TreeNode:
+    """Rebuild a tree from its skeleton rows using the caller's Note objects"""
+    root = None
+    # [node, children still to attach] for every node whose children are pending
+    open_nodes: List[list] = []
+    
+    for note_id, is_leaf, wiki_links, child_count in rows:
+        node = TreeNode(note=notes_by_id[note_id], is_root=root is None, is_leaf=is_leaf)
+        node.wiki_links = wiki_links
+        
+        if root is None:
+            root = node
+        else:
+            parent = open_nodes[-1]
+            parent[0].add_child(node)
+            parent[1] -= 1
+            if parent[1] == 0:
+                open_nodes.pop()
+        
+        if child_count:
+            open_nodes.append([node, child_count])
+    
+    return root
+
+
+def _build_tree_skeleton(root_id: str) -> Tuple[Optional[list], Optional[str]]:
+    """Worker task: build one tree and return (skeleton, error)"""
+    try:
+        tree = _worker_parser.build_tree(_worker_notes_by_id[root_id], _worker_notes)
+        return tree_skeleton(tree), None
+    except Exception as e:
+        return None, str(e)
+
+
+def build_trees_parallel(
+    root_notes: List[Note],
+    all_notes: List[Note],
+    max_workers: Optional[int] = None
+) -> List[Tuple[Optional[TreeNode], Optional[str]]]:
+    """
+    Build the trees for several root notes in a process pool
+    
+    Each build is independent, pure-Python and GIL-bound, so they run in
+    separate processes. Workers receive the notes once via the pool
+    initializer and send back only a skeleton of note IDs, which is
+    reattached to the caller's Note objects.
+    
+    Args:
+        root_notes: Root notes to build trees for
+        all_notes: All notes in the vault
+        max_workers: Number of worker processes (default: CPU count)
+    
+    Returns:
+        List of (tree, error) in the same order as root_notes
+    """
+    notes_by_id = {note.id: note for note in all_notes}
+    
+    # spawn: the server process has live threads (torch, ChromaDB), so fork is unsafe
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_tree_worker,
+        initargs=(all_notes,)
+    ) as executor:
+        outputs = list(executor.map(
+            _build_tree_skeleton,
+            [note.id for note in root_notes],
+            chunksize=4
+        ))
+    
+    results: List[Tuple[Optional[TreeNode], Optional[str]]] = []
+    for skeleton, error in outputs:
+        tree = None
+        if skeleton is not None:
+            tree = tree_from_skeleton(skeleton, notes_by_id)
+            tree.index_subtree()
+        results.append((tree, error))
+    return results
 
 
 if __name__ == "__main__":
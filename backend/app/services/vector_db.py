@@ -5,26 +5,97 @@ Handles storage and retrieval of note chunks with embeddings
 
 import chromadb
 from chromadb.config import Settings
-from typing import List, Optional, Dict, Any
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Dict, Any, Union
+import json
 import logging
 import os
+import threading
 from pathlib import Path
 
+import numpy as np
+import orjson
+
+try:
+    # Internal, but stable since 0.4: lets statistics be aggregated in SQL
+    from chromadb.db.impl.sqlite import SqliteDB
+except ImportError:
+    SqliteDB = None
+
 from app.models.note import Chunk
+from app.models.note_fast import ChunkFast
+from app.services import faiss_index, keyword_index
+from app.utils.quantization import dequantize
+from app.utils.text import count_tokens
 
 logger = logging.getLogger(__name__)
 
+# Chunks per add() call: ChromaDB flushes its embeddings queue into HNSW every 1000 records
+ADD_BATCH_SIZE = 1000
+
+# HNSW graph parameters for new collections, tuned for 384-dim MiniLM embeddings
+# (ChromaDB defaults: M=16, construction_ef=100, search_ef=10)
+HNSW_M = 24
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Concurrent add() calls: SQLite serializes the commits, HNSW inserts run alongside
+ADD_WORKERS = 4
+
+# Compact JSON for metadata links; one reusable encoder instead of json.dumps per chunk
+_encode_links = json.JSONEncoder(separators=(",", ":")).encode
+
+# Chunks inserted between progress log lines during bulk adds
+PROGRESS_LOG_INTERVAL = 5000
+
+# Candidates drawn from a quantized (SQ/PQ) FAISS index before exact FP32 rescoring
+FAISS_RESCORE_K = 200
+
+# Metadata rows fetched per page when statistics are rebuilt from the collection
+STATS_PAGE_SIZE = 5000
+
+# Keys of a ChromaDB query result that hold one entry per query embedding
+_RESULT_KEYS = ("ids", "documents", "metadatas", "distances", "embeddings")
+
+
+def split_results(results: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
+    """
+    Split a multi-query result into single-query results
+    
+    Args:
+        results: Result of query_batch() for `count` query embeddings
+        count: Number of query embeddings in the batch
+    
+    Returns:
+        One result per query, each shaped like query()'s
+    """
+    return [
+        {key: [results[key][j]] if results.get(key) is not None else None for key in _RESULT_KEYS}
+        for j in range(count)
+    ]
+
 
 class VectorDBService:
     """Service for managing ChromaDB vector database"""
     
-    def __init__(self, persist_directory: Optional[str] = None, collection_name: str = "spiritual_notes"):
+    def __init__(
+        self,
+        persist_directory: Optional[str] = None,
+        collection_name: str = "spiritual_notes",
+        hnsw_m: int = HNSW_M,
+        hnsw_ef_construction: int = HNSW_EF_CONSTRUCTION,
+        hnsw_ef_search: int = HNSW_EF_SEARCH
+    ):
         """
         Initialize the vector database service
         
         Args:
             persist_directory: Optional custom directory. If None, uses env var or default.
             collection_name: Name of the collection to use
+            hnsw_m: HNSW links per node (fixed when a collection is created)
+            hnsw_ef_construction: HNSW candidate list size while building the graph
+            hnsw_ef_search: HNSW candidate list size per query (higher = better recall)
         """
         # Priority: constructor arg -> env var -> safe local default
         if persist_directory is None:
@@ -35,6 +106,24 @@ class VectorDBService:
         self.persist_directory.mkdir(parents=True, exist_ok=True)
         
         self.collection_name = collection_name
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        
+        # Bumped on every write so query caches can detect stale results
+        self.write_version = 0
+        
+        # Optional FAISS ANN index (USE_FAISS=1); used only while in sync with the write version
+        self.faiss_index: Optional[faiss_index.FaissIndex] = None
+        self._faiss_version = -1
+        self.faiss_rescore_k = FAISS_RESCORE_K
+        
+        # Optional sparse keyword matrix for reranking (USE_KEYWORD_INDEX=1); same sync rule
+        self.keyword_index: Optional[keyword_index.KeywordIndex] = None
+        self._keyword_version = -1
+        
+        # Category/book/note counters for get_statistics, kept up to date by writes
+        self._stats: Optional[Dict[str, Any]] = None
         
         logger.info(f"Initializing ChromaDB at {self.persist_directory}")
         
@@ -80,23 +169,143 @@ class VectorDBService:
                     logger.info(f"Creating new collection: {self.collection_name}")
                     self.collection = self.client.create_collection(
                         name=self.collection_name,
-                        metadata={"hnsw:space": "cosine"}
+                        metadata=self._collection_metadata()
                     )
             
+            self._apply_search_ef()
+            
             logger.info(f"ChromaDB initialized. Collection: {self.collection_name}")
             logger.info(f"Current collection size: {self.collection.count()} chunks")
             
         except Exception as e:
             logger.error(f"Failed to initialize ChromaDB: {e}")
             raise
+        
+        if os.getenv("USE_FAISS", "").lower() in ("1", "true", "yes"):
+            try:
+                self.enable_faiss()
+            except Exception as e:
+                logger.warning(f"FAISS index unavailable, using ChromaDB search: {e}")
+        
+        if os.getenv("USE_KEYWORD_INDEX", "").lower() in ("1", "true", "yes"):
+            try:
+                self.enable_keyword_index()
+            except Exception as e:
+                logger.warning(f"Keyword index unavailable, reranking with word sets: {e}")
+    
+    def _collection_metadata(self) -> Dict[str, Any]:
+        """Metadata for a new collection: cosine space, HNSW graph and write-batching parameters"""
+        return {
+            "hnsw:space": "cosine",
+            "hnsw:M": self.hnsw_m,
+            "hnsw:construction_ef": self.hnsw_ef_construction,
+            "hnsw:search_ef": self.hnsw_ef_search,
+            # Flush queued writes into the graph in add_chunks-sized batches
+            "hnsw:batch_size": ADD_BATCH_SIZE,
+            "hnsw:sync_threshold": ADD_BATCH_SIZE,
+        }
+    
+    def _apply_search_ef(self):
+        """Raise search_ef on a collection created with a lower one (only it can change later)"""
+        metadata = self.collection.metadata or {}
+        if metadata.get("hnsw:search_ef", 10) >= self.hnsw_ef_search:
+            return
+        
+        try:
+            self.collection.modify(metadata={**metadata, "hnsw:search_ef": self.hnsw_ef_search})
+            logger.info(f"✓ Set hnsw:search_ef={self.hnsw_ef_search} on '{self.collection_name}'")
+        except Exception as e:
+            logger.warning(f"Could not update hnsw:search_ef (recreate the collection to apply it): {e}")
     
-    def add_chunks(self, chunks: List[Chunk], batch_size: int = 100) -> int:
+    def enable_faiss(
+        self,
+        index_spec: Optional[str] = None,
+        nprobe: int = 10,
+        product_quantization: Optional[bool] = None,
+        rescore_k: Optional[int] = None
+    ):
+        """
+        Load or build the FAISS index used for unfiltered queries
+        
+        Args:
+            index_spec: faiss.index_factory string; defaults to FAISS_INDEX_SPEC, else
+                        HNSW32,SQ8 below 100k vectors and IVF256,PQ48 above
+            nprobe: Default search breadth per query
+            product_quantization: Use IVF256,PQ48 (48-byte codes) at any collection size
+                                  when no spec is given (default: FAISS_PQ env var)
+            rescore_k: Candidates re-ranked by exact cosine over the stored FP32
+                       embeddings when the index is quantized (default: FAISS_RESCORE_K)
+        """
+        if product_quantization is None:
+            product_quantization = os.getenv("FAISS_PQ", "").lower() in ("1", "true", "yes")
+        index_spec = index_spec or os.getenv("FAISS_INDEX_SPEC") or None
+        if index_spec is None and product_quantization:
+            index_spec = faiss_index.PQ_INDEX_SPEC
+        self.faiss_rescore_k = rescore_k or int(os.getenv("FAISS_RESCORE_K", str(FAISS_RESCORE_K)))
+        
+        index = faiss_index.FaissIndex(self.persist_directory / "faiss", index_spec=index_spec, nprobe=nprobe)
+        count = self.collection.count()
+        
+        if count == 0:
+            logger.warning("Collection is empty; not building a FAISS index")
+            return
+        
+        if not index.load(count):
+            logger.info("Exporting embeddings from ChromaDB to train FAISS index...")
+            exported = self.collection.get(include=["embeddings"])
+            index.build(exported['ids'], exported['embeddings'])
+            index.save()
+        
+        self.faiss_index = index
+        self._faiss_version = self.write_version
+    
+    def enable_keyword_index(self):
+        """Load or build the sparse keyword matrix used by reranking"""
+        index = keyword_index.KeywordIndex(self.persist_directory / "keywords")
+        count = self.collection.count()
+        
+        if count == 0:
+            logger.warning("Collection is empty; not building a keyword index")
+            return
+        
+        if not index.load(count):
+            logger.info("Exporting documents from ChromaDB to build the keyword index...")
+            exported = self.collection.get(include=["documents"])
+            index.build(exported['ids'], exported['documents'])
+            index.save()
+        
+        self.keyword_index = index
+        self._keyword_version = self.write_version
+    
+    def get_keyword_index(self) -> Optional[keyword_index.KeywordIndex]:
+        """
+        Get the keyword index if it still matches the collection
+        
+        Returns:
+            KeywordIndex, or None if disabled or stale since a write
+        """
+        if self.keyword_index is None or self._keyword_version != self.write_version:
+            return None
+        return self.keyword_index
+    
+    def add_chunks(
+        self,
+        chunks: List[Union[Chunk, ChunkFast]],
+        batch_size: int = ADD_BATCH_SIZE,
+        max_workers: int = ADD_WORKERS
+    ) -> int:
         """
         Add chunks to the vector database
         
+        Ids, embeddings, documents and metadata are built once for all chunks
+        and sliced per batch; embeddings go to ChromaDB as one float32 array.
+        Batches are added from a small thread pool, so one batch's SQLite
+        commit overlaps the next one's HNSW insert.
+        
         Args:
             chunks: List of Chunk objects with embeddings
-            batch_size: Number of chunks to add per batch
+            batch_size: Number of chunks to add per batch (default: ChromaDB's HNSW sync threshold)
+            max_workers: Batches added concurrently (capped low to limit SQLite lock contention)
         
         Returns:
             Number of chunks added
@@ -112,81 +321,220 @@ class VectorDBService:
                 f"{len(chunks) - len(chunks_with_embeddings)} chunks missing embeddings"
             )
         
-        logger.info(f"Adding {len(chunks_with_embeddings)} chunks to ChromaDB...")
+        total = len(chunks_with_embeddings)
+        logger.info(f"Adding {total} chunks to ChromaDB...")
+        if not total:
+            return 0
+        
+        # Materialize every column once (dequantized embeddings also feed FAISS)
+        ids = [chunk.id for chunk in chunks_with_embeddings]
+        embeddings = np.asarray(
+            [dequantize(chunk.embedding, chunk.embedding_scale) for chunk in chunks_with_embeddings],
+            dtype=np.float32
+        )
+        documents = [chunk.text for chunk in chunks_with_embeddings]
+        metadatas = [self._chunk_metadata(chunk) for chunk in chunks_with_embeddings]
         
         # Add in batches
+        added = np.zeros(total, dtype=bool)
         added_count = 0
+        last_logged = 0
+        
+        def add_batch(i: int, end: int):
+            self.collection.add(
+                ids=ids[i:end],
+                embeddings=embeddings[i:end],
+                documents=documents[i:end],
+                metadatas=metadatas[i:end]
+            )
         
-        for i in range(0, len(chunks_with_embeddings), batch_size):
-            batch = chunks_with_embeddings[i:i + batch_size]
+        bounds = [(i, min(i + batch_size, total)) for i in range(0, total, batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(bounds)))) as executor:
+            futures = {executor.submit(add_batch, i, end): (i, end) for i, end in bounds}
             
-            try:
-                self.collection.add(
-                    ids=[chunk.id for chunk in batch],
-                    embeddings=[chunk.embedding for chunk in batch],
-                    documents=[chunk.text for chunk in batch],
-                    metadatas=[
-                        {
-                            "note_id": chunk.note_id,
-                            "title": chunk.title,
-                            "category": chunk.category,
-                            "book": chunk.book if chunk.book else "",
-                            "file_path": chunk.file_path,
-                            "chunk_index": chunk.chunk_index,
-                            "total_chunks": chunk.total_chunks,
-                            "links": str(chunk.links)  # Convert list to string
-                        }
-                        for chunk in batch
-                    ]
-                )
+            for future in as_completed(futures):
+                i, end = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Error adding batch {i//batch_size}: {e}")
+                    continue
                 
-                added_count += len(batch)
+                added[i:end] = True
+                added_count += end - i
                 
-                if (i + batch_size) % 500 == 0:
-                    logger.info(f"  Progress: {added_count}/{len(chunks_with_embeddings)}")
-            
-            except Exception as e:
-                logger.error(f"Error adding batch {i//batch_size}: {e}")
-                continue
+                # Log by chunks added since the last line, whatever the batch size
+                if added_count - last_logged >= PROGRESS_LOG_INTERVAL and logger.isEnabledFor(logging.INFO):
+                    logger.info(f"  Progress: {added_count}/{total}")
+                    last_logged = added_count
+        
+        if added_count:
+            # Only the batches ChromaDB accepted
+            accepted = np.flatnonzero(added).tolist()
+            self._sync_faiss([ids[j] for j in accepted], embeddings[added])
+            self._update_stats([metadatas[j] for j in accepted])
+            self.write_version += 1
         
         logger.info(f"✓ Successfully added {added_count} chunks")
         return added_count
     
+    def add_embeddings(self, chunks: List[Union[Chunk, ChunkFast]], embeddings) -> int:
+        """
+        Insert one batch of chunks with externally computed embeddings
+        
+        The embedding array goes straight to ChromaDB, bypassing the
+        per-chunk `embedding` lists used by add_chunks().
+        
+        Args:
+            chunks: Chunk objects (their `embedding` field is ignored)
+            embeddings: Float array of shape (len(chunks), dim)
+        
+        Returns:
+            Number of chunks added
+        """
+        if not chunks:
+            return 0
+        
+        metadatas = [self._chunk_metadata(chunk) for chunk in chunks]
+        self.collection.add(
+            ids=[chunk.id for chunk in chunks],
+            embeddings=embeddings,
+            documents=[chunk.text for chunk in chunks],
+            metadatas=metadatas
+        )
+        self._sync_faiss([chunk.id for chunk in chunks], embeddings)
+        self._update_stats(metadatas)
+        self.write_version += 1
+        
+        return len(chunks)
+    
+    def _sync_faiss(self, ids: List[str], embeddings):
+        """Append newly written vectors to the FAISS index so it stays usable"""
+        if self.faiss_index is None or self._faiss_version != self.write_version:
+            return
+        
+        try:
+            self.faiss_index.add(ids, embeddings)
+            self.faiss_index.save()
+            # Still in sync after this write (the caller bumps write_version next)
+            self._faiss_version = self.write_version + 1
+        except Exception as e:
+            logger.warning(f"FAISS index out of sync, falling back to ChromaDB search: {e}")
+    
+    @staticmethod
+    def _chunk_metadata(chunk: Union[Chunk, ChunkFast]) -> Dict[str, Any]:
+        """Build the ChromaDB metadata record for a chunk"""
+        links = chunk.links
+        return {
+            "note_id": chunk.note_id,
+            "title": chunk.title,
+            "category": chunk.category,
+            "book": chunk.book or "",
+            "file_path": chunk.file_path,
+            "chunk_index": chunk.chunk_index,
+            "total_chunks": chunk.total_chunks,
+            "word_count": chunk.word_count,
+            "links": _encode_links(links),  # Metadata values must be scalars
+            "link_count": len(links),  # Read by reranking without parsing links
+            "has_links": bool(links),  # Scalar for where-filtering on linked chunks
+            "token_count": count_tokens(chunk.text)  # Context budgeting without re-tokenizing
+        }
+    
     def query(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[List[float], List[List[float]]],
         n_results: int = 10,
         category_filter: Optional[str] = None,
-        book_filter: Optional[str] = None
+        book_filter: Optional[str] = None,
+        include_embeddings: bool = False,
+        links_filter: bool = False
     ) -> Dict[str, Any]:
         """
         Query the vector database
         
         Args:
-            query_embedding: Query vector embedding
+            query_embedding: Query vector embedding, or a (B, dim) batch of them
+                (sent to ChromaDB as one batched query, as in query_batch())
             n_results: Number of results to return
             category_filter: Filter by category (optional)
             book_filter: Filter by book (optional)
+            include_embeddings: Also return the stored FP32 embedding of each hit
+            links_filter: Only return chunks that contain [[wiki links]]
         
         Returns:
-            Dictionary with query results
+            Dictionary with query results (one entry per query embedding)
+        """
+        # A single vector is wrapped into a batch of one
+        batch = query_embedding if np.ndim(query_embedding) == 2 else [query_embedding]
+        
+        return self.query_batch(
+            query_embeddings=batch,
+            n_results=n_results,
+            category_filter=category_filter,
+            book_filter=book_filter,
+            include_embeddings=include_embeddings,
+            links_filter=links_filter
+        )
+    
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        category_filter: Optional[str] = None,
+        book_filter: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        include_embeddings: bool = False,
+        links_filter: bool = False
+    ) -> Dict[str, Any]:
         """
+        Query the vector database with several embeddings in one call
+        
+        Args:
+            query_embeddings: Query vector embeddings
+            n_results: Number of results to return per query
+            category_filter: Filter by category (optional)
+            book_filter: Filter by book (optional)
+            nprobe: FAISS cells to scan, if the FAISS index is enabled (optional)
+            include_embeddings: Also return the stored FP32 embedding of each hit,
+                for exact rescoring of approximate (e.g. IVF-PQ) candidates
+            links_filter: Only return chunks that contain [[wiki links]]
+                (chunks ingested before has_links existed never match)
+        
+        Returns:
+            Dictionary with query results, one entry per query embedding
+        """
+        # Unfiltered queries go to the FAISS index while it matches the collection
+        if (
+            self.faiss_index is not None
+            and self._faiss_version == self.write_version
+            and not (category_filter or book_filter or links_filter)
+        ):
+            return self._query_faiss(query_embeddings, n_results, nprobe, include_embeddings)
+        
         try:
-            # Build where clause for filtering
+            # Build where clause for filtering (several conditions must be combined with $and)
+            conditions = []
+            if category_filter:
+                conditions.append({"category": category_filter})
+            if book_filter:
+                conditions.append({"book": book_filter})
+            if links_filter:
+                conditions.append({"has_links": True})
             where = None
-            if category_filter or book_filter:
-                where = {}
-                if category_filter:
-                    where["category"] = category_filter
-                if book_filter:
-                    where["book"] = book_filter
+            if len(conditions) == 1:
+                where = conditions[0]
+            elif conditions:
+                where = {"$and": conditions}
             
             # Query ChromaDB
+            include = ["documents", "metadatas", "distances"]
+            if include_embeddings:
+                include.append("embeddings")
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=query_embeddings,
                 n_results=n_results,
                 where=where,
-                include=["documents", "metadatas", "distances"]
+                include=include
             )
             
             return results
@@ -195,6 +543,64 @@ class VectorDBService:
             logger.error(f"Error querying ChromaDB: {e}")
             raise
     
+    def _query_faiss(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        nprobe: Optional[int],
+        include_embeddings: bool = False
+    ) -> Dict[str, Any]:
+        """
+        ANN search in FAISS, then fetch documents/metadata (and embeddings) from ChromaDB by id
+        
+        A quantized index only generates candidates: `faiss_rescore_k` of them
+        are fetched with their FP32 embeddings and re-ranked by exact cosine
+        distance before the top n_results are kept.
+        """
+        rescore = self.faiss_index.is_quantized and self.faiss_rescore_k > n_results
+        ids, distances = self.faiss_index.search(
+            query_embeddings, self.faiss_rescore_k if rescore else n_results, nprobe
+        )
+        
+        unique_ids = list(dict.fromkeys(chunk_id for row in ids for chunk_id in row))
+        need_embeddings = include_embeddings or rescore
+        include = ["documents", "metadatas"] + (["embeddings"] if need_embeddings else [])
+        fetched = self.collection.get(ids=unique_ids, include=include)
+        embeddings = fetched['embeddings'] if need_embeddings else [None] * len(fetched['ids'])
+        records = {
+            chunk_id: (document, metadata, embedding)
+            for chunk_id, document, metadata, embedding in zip(
+                fetched['ids'], fetched['documents'], fetched['metadatas'], embeddings
+            )
+        }
+        
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include_embeddings:
+            results["embeddings"] = []
+        for query_embedding, row_ids, row_distances in zip(query_embeddings, ids, distances):
+            # Skip ids that were deleted from ChromaDB after the index was built
+            hits = [(i, d) for i, d in zip(row_ids, row_distances) if i in records]
+            if rescore and hits:
+                hits = self._rescore_hits(query_embedding, hits, records, n_results)
+            results["ids"].append([i for i, _ in hits])
+            results["documents"].append([records[i][0] for i, _ in hits])
+            results["metadatas"].append([records[i][1] for i, _ in hits])
+            results["distances"].append([d for _, d in hits])
+            if include_embeddings:
+                results["embeddings"].append([records[i][2] for i, _ in hits])
+        
+        return results
+    
+    @staticmethod
+    def _rescore_hits(query_embedding, hits: list, records: dict, n_results: int) -> list:
+        """Replace approximate FAISS distances with exact cosine distances and keep the best n_results"""
+        matrix = np.asarray([records[i][2] for i, _ in hits], dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        # Stored and query embeddings are L2-normalized, so 1 - dot is the cosine distance
+        exact = 1.0 - matrix @ query
+        order = np.argsort(exact, kind="stable")[:n_results]
+        return [(hits[j][0], float(exact[j])) for j in order]
+    
     def query_with_text(
         self,
         query_text: str,
@@ -202,7 +608,11 @@ class VectorDBService:
         category_filter: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Query using raw text (ChromaDB will embed it)
+        Query using raw text
+        
+        The text is embedded by the shared EmbeddingService (whose LRU text
+        cache makes repeated queries free) rather than by ChromaDB's default
+        embedding function, which would load a second copy of the model.
         
         Args:
             query_text: Query text
@@ -212,44 +622,57 @@ class VectorDBService:
         Returns:
             Dictionary with query results
         """
-        try:
-            where = {"category": category_filter} if category_filter else None
-            
-            results = self.collection.query(
-                query_texts=[query_text],
-                n_results=n_results,
-                where=where,
-                include=["documents", "metadatas", "distances"]
-            )
-            
-            return results
+        # Imported here so loading the vector DB alone does not pull in the model stack
+        from app.services.embedding_service import get_embedding_service
         
+        try:
+            query_embedding = get_embedding_service().embed_text(query_text)
         except Exception as e:
-            logger.error(f"Error querying ChromaDB with text: {e}")
+            logger.error(f"Error embedding query text: {e}")
             raise
+        
+        return self.query(query_embedding, n_results=n_results, category_filter=category_filter)
     
-    def get_by_id(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+    def warmup(self):
+        """
+        Run one tiny query so the index pages are faulted in before real traffic
+        
+        ChromaDB loads and memory-maps the HNSW segment lazily, which
+        otherwise makes the first user query much slower than steady state.
+        A stored vector is used as the probe, so no dimension is assumed.
+        """
+        try:
+            sample = self.collection.get(limit=1, include=["embeddings"])
+            if not sample['ids']:
+                return
+            
+            self.query(sample['embeddings'][0], n_results=1)
+            logger.info("✓ Vector index warmed up")
+        except Exception as e:
+            logger.warning(f"Vector index warmup failed: {e}")
+    
+    def get_by_id(self, chunk_id: str, include_embedding: bool = False) -> Optional[Dict[str, Any]]:
         """
         Get a specific chunk by ID
         
         Args:
             chunk_id: Chunk identifier
+            include_embedding: Also fetch the stored vector (skipped by default;
+                decoding it dominates the cost of the lookup)
         
         Returns:
-            Chunk data or None if not found
+            Chunk data or None if not found ("embedding" is None unless requested)
         """
         try:
-            result = self.collection.get(
-                ids=[chunk_id],
-                include=["documents", "metadatas", "embeddings"]
-            )
+            include = ["documents", "metadatas"] + (["embeddings"] if include_embedding else [])
+            result = self.collection.get(ids=[chunk_id], include=include)
             
             if result['ids']:
                 return {
                     "id": result['ids'][0],
                     "document": result['documents'][0],
                     "metadata": result['metadatas'][0],
-                    "embedding": result['embeddings'][0] if 'embeddings' in result else None
+                    "embedding": result['embeddings'][0] if include_embedding else None
                 }
             return None
         
@@ -261,12 +684,15 @@ class VectorDBService:
         """
         Get database statistics
         
+        Counters are kept in memory and in stats.json next to the collection,
+        and updated by every write; the full metadata scan only runs when
+        neither matches the collection size.
+        
         Returns:
             Dictionary with statistics
         """
         total_chunks = self.collection.count()
         
-        # Get all metadata to compute stats
         if total_chunks == 0:
             return {
                 "total_chunks": 0,
@@ -275,37 +701,142 @@ class VectorDBService:
                 "notes": 0
             }
         
-        # Get ALL metadata (not just a sample) to ensure accurate stats
-        sample = self.collection.get(
-            limit=total_chunks,  # Get ALL chunks, not just 1000
-            include=["metadatas"]
-        )
+        if self._stats is None or self._stats["total"] != total_chunks:
+            self._stats = self._load_stats(total_chunks) or self._rebuild_stats(total_chunks)
         
-        categories = {}
-        books = {}
-        note_ids = set()
-        
-        for metadata in sample['metadatas']:
-            # Count categories
-            cat = metadata.get('category', 'Unknown')
-            categories[cat] = categories.get(cat, 0) + 1
+        return {
+            "total_chunks": total_chunks,
+            "categories": dict(sorted(self._stats["categories"].items())),
+            "books": dict(sorted(self._stats["books"].items())),
+            "notes_sampled": len(self._stats["note_ids"])
+        }
+    
+    @property
+    def _stats_file(self) -> Path:
+        return self.persist_directory / "stats.json"
+    
+    @staticmethod
+    def _count_metadata(stats: Dict[str, Any], metadatas: List[Dict[str, Any]]):
+        """Add chunk metadata records to a set of counters"""
+        for metadata in metadatas:
+            stats["categories"][metadata.get('category', 'Unknown')] += 1
             
-            # Count books
             book = metadata.get('book', '')
             if book:
-                books[book] = books.get(book, 0) + 1
+                stats["books"][book] += 1
             
-            # Count unique notes
             note_id = metadata.get('note_id', '')
             if note_id:
-                note_ids.add(note_id)
+                stats["note_ids"].add(note_id)
         
-        return {
-            "total_chunks": total_chunks,
-            "categories": dict(sorted(categories.items())),
-            "books": dict(sorted(books.items())),
-            "notes_sampled": len(note_ids)
-        }
+        stats["total"] += len(metadatas)
+    
+    def _rebuild_stats(self, total_chunks: int) -> Dict[str, Any]:
+        """Count every metadata record, in SQL if possible, then persist the counters"""
+        logger.info(f"Rebuilding collection statistics from {total_chunks} chunks...")
+        
+        stats = self._aggregate_stats_sql(total_chunks)
+        if stats is None:
+            # Portable fallback: fetch metadata one page at a time and count in Python
+            stats = {"total": 0, "categories": Counter(), "books": Counter(), "note_ids": set()}
+            for offset in range(0, total_chunks, STATS_PAGE_SIZE):
+                page = self.collection.get(limit=STATS_PAGE_SIZE, offset=offset, include=["metadatas"])
+                self._count_metadata(stats, page['metadatas'])
+        
+        self._save_stats(stats)
+        return stats
+    
+    def _aggregate_stats_sql(self, total_chunks: int) -> Optional[Dict[str, Any]]:
+        """
+        Group metadata in ChromaDB's SQLite store instead of materializing every record
+        
+        Args:
+            total_chunks: Current collection size (chunks without a category count as 'Unknown')
+        
+        Returns:
+            Counters as built by _count_metadata(), or None if the SQLite
+            schema is not reachable (e.g. a client/server deployment)
+        """
+        if SqliteDB is None:
+            return None
+        
+        try:
+            db = self.client._system.instance(SqliteDB)
+            with db.tx() as cur:
+                scope = """
+                    FROM embedding_metadata m
+                    JOIN embeddings e ON e.id = m.id
+                    JOIN segments s ON s.id = e.segment_id
+                    WHERE s.collection = ? AND m.key = ?
+                """
+                collection_id = str(self.collection.id)
+                
+                categories = Counter(dict(cur.execute(
+                    f"SELECT m.string_value, COUNT(*) {scope} GROUP BY m.string_value",
+                    (collection_id, "category")
+                ).fetchall()))
+                books = Counter(dict(cur.execute(
+                    f"SELECT m.string_value, COUNT(*) {scope} AND m.string_value != '' GROUP BY m.string_value",
+                    (collection_id, "book")
+                ).fetchall()))
+                note_ids = {row[0] for row in cur.execute(
+                    f"SELECT DISTINCT m.string_value {scope} AND m.string_value != ''",
+                    (collection_id, "note_id")
+                ).fetchall()}
+        except Exception as e:
+            logger.warning(f"SQL statistics unavailable, counting metadata in Python: {e}")
+            return None
+        
+        missing = total_chunks - sum(categories.values())
+        if missing > 0:
+            categories["Unknown"] += missing
+        
+        return {"total": total_chunks, "categories": categories, "books": books, "note_ids": note_ids}
+    
+    def _load_stats(self, total_chunks: int) -> Optional[Dict[str, Any]]:
+        """Read persisted counters if they match the collection size"""
+        try:
+            data = orjson.loads(self._stats_file.read_bytes())
+            if data["total"] != total_chunks:
+                return None
+            return {
+                "total": data["total"],
+                "categories": Counter(data["categories"]),
+                "books": Counter(data["books"]),
+                "note_ids": set(data["note_ids"]),
+            }
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable statistics file: {e}")
+            return None
+    
+    def _save_stats(self, stats: Dict[str, Any]):
+        """Persist counters atomically next to the collection"""
+        try:
+            tmp_path = self._stats_file.with_suffix(".tmp")
+            tmp_path.write_bytes(orjson.dumps({
+                "total": stats["total"],
+                "categories": stats["categories"],
+                "books": stats["books"],
+                "note_ids": sorted(stats["note_ids"]),
+            }))
+            tmp_path.replace(self._stats_file)
+        except Exception as e:
+            logger.warning(f"Failed to save collection statistics: {e}")
+    
+    def _update_stats(self, metadatas: List[Dict[str, Any]]):
+        """Fold newly written chunks into the counters, if they are loaded"""
+        if self._stats is None:
+            return
+        
+        self._count_metadata(self._stats, metadatas)
+        
+        # ChromaDB skips ids that already exist; recount from scratch on the next call if so
+        if self._stats["total"] != self.collection.count():
+            self._stats = None
+            return
+        self._save_stats(self._stats)
     
     def get_all_notes_metadata(self) -> List[Dict[str, Any]]:
         """
@@ -340,22 +871,39 @@ class VectorDBService:
                 
         return unique_notes
     
-    def reset_collection(self):
-        """Reset (delete) the collection"""
+    def reset_collection(self, hard: bool = False):
+        """
+        Remove every chunk from the collection
+        
+        Args:
+            hard: Drop and recreate the collection (rebuilding its HNSW files and
+                applying the current HNSW parameters) instead of deleting its rows
+        """
         logger.warning(f"Resetting collection: {self.collection_name}")
-        self.client.delete_collection(name=self.collection_name)
         
-        # Recreate collection
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
+        if hard:
+            self.client.delete_collection(name=self.collection_name)
+            
+            # Recreate collection
+            self.collection = self.client.get_or_create_collection(
+                name=self.collection_name,
+                metadata=self._collection_metadata()
+            )
+        else:
+            # Delete rows by id, keeping the collection, its handle and index files
+            ids = self.collection.get(include=[])['ids']
+            for i in range(0, len(ids), ADD_BATCH_SIZE):
+                self.collection.delete(ids=ids[i:i + ADD_BATCH_SIZE])
+        self.write_version += 1
+        self._stats = {"total": 0, "categories": Counter(), "books": Counter(), "note_ids": set()}
+        self._save_stats(self._stats)
         
         logger.info("Collection reset complete")
 
 
 # Global vector DB instance
 _vector_db: Optional[VectorDBService] = None
+_vector_db_lock = threading.Lock()
 
 
 def get_vector_db(
@@ -373,8 +921,11 @@ def get_vector_db(
     """
     global _vector_db
     
+    # Double-checked: concurrent first calls (threadpool endpoints) must not open two clients
     if _vector_db is None:
-        _vector_db = VectorDBService(persist_directory=persist_directory)
+        with _vector_db_lock:
+            if _vector_db is None:
+                _vector_db = VectorDBService(persist_directory=persist_directory)
     
     return _vector_db
 
@@ -0,0 +1,126 @@
+"""Parquet storage for chunks with embeddings (ingest_notes.py -> load_chromadb.py)"""
+
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from app.models.note_fast import ChunkFast
+from app.utils.quantization import dequantize
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency (pip install pyarrow)
+    pa = None
+    pq = None
+
+# Rows per Parquet row group, matching ChromaDB's add() batch size
+ROW_GROUP_SIZE = 1000
+
+# Scalar ChunkFast fields stored as plain columns (embedding is written separately)
+_COLUMNS = (
+    "id", "note_id", "text", "chunk_index", "total_chunks", "title",
+    "category", "book", "file_path", "links", "word_count", "overlap",
+)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is not installed (pip install pyarrow)")
+
+
+def _schema(dim: int) -> "pa.Schema":
+    """Explicit schema, so row groups agree even when a batch has no books or links"""
+    return pa.schema([
+        ("id", pa.string()),
+        ("note_id", pa.string()),
+        ("text", pa.string()),
+        ("chunk_index", pa.int32()),
+        ("total_chunks", pa.int32()),
+        ("title", pa.string()),
+        ("category", pa.string()),
+        ("book", pa.string()),
+        ("file_path", pa.string()),
+        ("links", pa.list_(pa.string())),
+        ("word_count", pa.int32()),
+        ("overlap", pa.string()),
+        ("embedding", pa.list_(pa.float16(), dim)),
+    ])
+
+
+def _record_batch(chunks: List[ChunkFast], schema: Optional["pa.Schema"] = None) -> "pa.RecordBatch":
+    """Column-wise batch with embeddings as a FixedSizeList<float16, dim> column"""
+    # One (n, dim) FP16 array; int8 embeddings are dequantized first
+    matrix = np.ascontiguousarray(
+        [dequantize(chunk.embedding, chunk.embedding_scale) for chunk in chunks],
+        dtype=np.float16
+    )
+    schema = schema or _schema(matrix.shape[1])
+
+    arrays = [pa.array([getattr(chunk, name) for chunk in chunks], type=schema.field(name).type) for name in _COLUMNS]
+    arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1)), matrix.shape[1]))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_chunks(chunks: Iterable[ChunkFast], output_file: Path) -> int:
+    """
+    Stream embedded chunks into a zstd-compressed Parquet file
+
+    Args:
+        chunks: Chunks with embeddings populated (e.g. embed_chunk_stream())
+        output_file: Destination .parquet path
+
+    Returns:
+        Number of chunks written
+    """
+    _require_pyarrow()
+
+    iterator = iter(chunks)
+    writer = None
+    count = 0
+
+    try:
+        while batch := list(islice(iterator, ROW_GROUP_SIZE)):
+            record_batch = _record_batch(batch, writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    str(output_file), record_batch.schema, compression="zstd", compression_level=3
+                )
+            writer.write_batch(record_batch)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return count
+
+
+def iter_parquet_batches(file_path: Path, batch_size: int = ROW_GROUP_SIZE) -> Iterator[List[ChunkFast]]:
+    """
+    Yield chunks from a Parquet file in batches
+
+    Each batch's embeddings are one FP16 (n, dim) array viewed straight out
+    of the Arrow buffer; chunks hold its rows, which add_chunks() stacks into
+    the float32 array ChromaDB receives.
+
+    Args:
+        file_path: Parquet file written by write_chunks()
+        batch_size: Chunks per yielded batch
+
+    Yields:
+        Lists of ChunkFast objects with embeddings populated
+    """
+    _require_pyarrow()
+
+    parquet_file = pq.ParquetFile(str(file_path))
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+        embedding_column = record_batch.column("embedding")
+        matrix = embedding_column.flatten().to_numpy().reshape(len(record_batch), embedding_column.type.list_size)
+
+        columns = {name: record_batch.column(name).to_pylist() for name in _COLUMNS}
+        yield [
+            ChunkFast(**{name: columns[name][i] for name in _COLUMNS}, embedding=matrix[i])
+            for i in range(len(record_batch))
+        ]
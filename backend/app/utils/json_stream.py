@@ -0,0 +1,65 @@
+"""Streaming JSON array writer for large ingest outputs"""
+
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List
+
+import orjson
+from pydantic import BaseModel, TypeAdapter
+
+# Formatting shared by the processed/*.json files (2-space indent, NumPy arrays as lists)
+JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+
+# Models serialized per TypeAdapter call: amortizes dispatch, bounds memory to one batch
+DUMP_BATCH_SIZE = 1000
+
+
+def iter_dumped(models: Iterable[BaseModel], model_type: type, batch_size: int = DUMP_BATCH_SIZE) -> Iterator[dict]:
+    """
+    Yield model_dump()-equivalent dicts, dumping a batch of models per call
+
+    One TypeAdapter(List[model_type]).dump_python() call per batch replaces
+    a model_dump() method dispatch per instance.
+
+    Args:
+        models: Pydantic model instances, all of model_type
+        model_type: Their class (e.g. Note)
+        batch_size: Models dumped per call
+
+    Yields:
+        One dict per model, in input order
+    """
+    adapter = TypeAdapter(List[model_type])
+    iterator = iter(models)
+
+    while batch := list(islice(iterator, batch_size)):
+        yield from adapter.dump_python(batch)
+
+
+def write_json_array(records: Iterable[Any], output_file: Path, option: int = JSON_OPTIONS) -> int:
+    """
+    Write records as a JSON array, serializing one record at a time
+
+    Only the record being encoded is held in memory, so a generator of
+    model_dump() dicts never has to be collected into a list first.
+
+    Args:
+        records: JSON-serializable objects (non-native values fall back to str())
+        output_file: Destination .json path
+        option: orjson option flags
+
+    Returns:
+        Number of records written
+    """
+    count = 0
+
+    with open(output_file, 'wb') as f:
+        f.write(b"[\n")
+        for record in records:
+            if count:
+                f.write(b",\n")
+            f.write(orjson.dumps(record, option=option, default=str))
+            count += 1
+        f.write(b"\n]\n")
+
+    return count
@@ -0,0 +1,36 @@
+"""Helpers for reading chunk metadata stored in ChromaDB"""
+
+from typing import Any, List
+import ast
+
+import orjson
+
+
+def parse_links(links: Any) -> List[str]:
+    """
+    Parse a links field from chunk or note metadata
+
+    New ingests store links as a JSON array string. Older collections
+    stored ``str(list)`` (a Python repr), which is parsed with
+    ``ast.literal_eval`` as a fallback. Never uses ``eval``.
+
+    Args:
+        links: JSON string, Python-repr string, list, or None
+
+    Returns:
+        List of link texts (empty if the value cannot be parsed)
+    """
+    if isinstance(links, list):
+        return links
+    if not links or not isinstance(links, str):
+        return []
+
+    try:
+        parsed = orjson.loads(links)
+    except orjson.JSONDecodeError:
+        try:
+            parsed = ast.literal_eval(links)
+        except (ValueError, SyntaxError):
+            return []
+
+    return parsed if isinstance(parsed, list) else []
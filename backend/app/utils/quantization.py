@@ -0,0 +1,48 @@
+"""Scalar quantization helpers for L2-normalized embeddings"""
+
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+QUANTIZATION_MODES = ("fp32", "fp16", "int8")
+
+# Components of a unit vector lie in [-1, 1], so a fixed symmetric scale suffices
+INT8_SCALE = 1 / 127
+
+
+def quantize(embeddings: np.ndarray, mode: str) -> Tuple[np.ndarray, Optional[float]]:
+    """
+    Quantize a batch of normalized embeddings
+
+    Args:
+        embeddings: Array of shape (n, dim), rows L2-normalized
+        mode: "fp32" (unchanged), "fp16" or "int8"
+
+    Returns:
+        Tuple of (quantized array, dequantization scale or None)
+    """
+    if mode == "fp16":
+        return embeddings.astype(np.float16), None
+    if mode == "int8":
+        quantized = np.clip(np.round(embeddings / INT8_SCALE), -127, 127).astype(np.int8)
+        return quantized, INT8_SCALE
+    return embeddings, None
+
+
+def dequantize(
+    vector: Sequence[Union[int, float]],
+    scale: Optional[float]
+) -> Union[List[float], np.ndarray]:
+    """
+    Restore a float vector from a stored (possibly int8) embedding
+
+    Args:
+        vector: Stored embedding values
+        scale: Scale returned by quantize(), or None for float embeddings
+
+    Returns:
+        Float vector (the input itself when no scale is set)
+    """
+    if scale is None:
+        return vector
+    return np.asarray(vector, dtype=np.float32) * scale
@@ -0,0 +1,69 @@
+"""Text helpers shared by the parser and API"""
+
+import re
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency (pip install tiktoken)
+    tiktoken = None
+
+try:
+    import re2
+except ImportError:  # Optional dependency (pip install google-re2)
+    re2 = None
+
+_WORD_RE = re.compile(r"\S+")
+
+# Tokens per word for English prose, used when tiktoken is not installed
+TOKENS_PER_WORD = 1.3
+
+# Loaded once; cl100k_base is the GPT-4 family encoding
+_ENCODING = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+
+
+def count_words(text: str) -> int:
+    """
+    Count whitespace-separated words without building a list of them
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Number of words (same result as ``len(text.split())``)
+    """
+    return sum(1 for _ in _WORD_RE.finditer(text))
+
+
+def compile_scan_pattern(pattern: str):
+    """
+    Compile a pattern that is run over whole note bodies
+
+    Uses RE2 (linear-time automaton, no backtracking) when installed and
+    falls back to ``re``. Only use it for patterns both engines support;
+    findall/finditer/search behave the same.
+
+    Args:
+        pattern: Regular expression
+
+    Returns:
+        Compiled pattern object
+    """
+    return re2.compile(pattern) if re2 is not None else re.compile(pattern)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count LLM tokens in a text
+
+    Exact for the cl100k_base encoding when tiktoken is installed,
+    otherwise estimated from the word count.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Number of tokens
+    """
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return round(count_words(text) * TOKENS_PER_WORD)
@@ -0,0 +1,62 @@
+"""Shared fixtures: a stand-in embedding model and isolated retrieval services"""
+
+import hashlib
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+import pytest
+
+FAKE_DIM = 8
+
+
+class FakeSentenceTransformer:
+    """Stand-in model: deterministic unit vectors derived from each text"""
+
+    def __init__(self, model_name: str, device: str = None, backend: str = "torch", model_kwargs=None):
+        self.device = SimpleNamespace(type=device or "cpu")
+        self.halved = False
+        self.encoded: List[str] = []
+
+    def half(self):
+        self.halved = True
+        return self
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return FAKE_DIM
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        self.encoded.extend(texts)
+
+        rows = np.array([
+            np.frombuffer(hashlib.blake2b(text.encode(), digest_size=FAKE_DIM).digest(), dtype=np.uint8)
+            for text in texts
+        ], dtype=np.float32).reshape(len(texts), FAKE_DIM) + 1.0
+        rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+        return rows[0] if single else rows
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Make EmbeddingService load FakeSentenceTransformer instead of a real model"""
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("torch")
+    from app.services import embedding_service
+
+    monkeypatch.setattr(embedding_service, "SentenceTransformer", FakeSentenceTransformer)
+
+
+@pytest.fixture
+def services(fake_model, tmp_path, monkeypatch):
+    """Fresh global embedding service, vector DB (in tmp_path) and query batcher"""
+    from app.services import embedding_service, query_batcher, vector_db
+
+    embedder = embedding_service.EmbeddingService(device="cpu", batch_size=4)
+    db = vector_db.VectorDBService(persist_directory=str(tmp_path / "chroma"))
+    monkeypatch.setattr(embedding_service, "_embedding_service", embedder)
+    monkeypatch.setattr(vector_db, "_vector_db", db)
+    monkeypatch.setattr(query_batcher, "_query_batcher", None)
+
+    return SimpleNamespace(embedding=embedder, vector_db=db)
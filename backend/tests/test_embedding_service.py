@@ -0,0 +1,60 @@
+"""Tests for EmbeddingService device selection and chunk embedding"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from app.models.note_fast import ChunkFast
+from app.services.embedding_service import EmbeddingService
+
+
+def make_chunk(i: int, text: str, overlap: str = "") -> ChunkFast:
+    return ChunkFast(
+        id=f"note-0_chunk_{i}",
+        note_id="note-0",
+        text=text,
+        chunk_index=i,
+        total_chunks=2,
+        title="Note 0",
+        category="Test",
+        book="Book",
+        file_path="Test/Book/files/Note 0.md",
+        overlap=overlap
+    )
+
+
+def test_device_is_auto_selected(fake_model):
+    import torch
+
+    service = EmbeddingService(device=None, batch_size=4)
+
+    device = service.model.device.type
+    assert device in ("cuda", "mps", "cpu")
+    assert service.model.halved == (device != "cpu")
+    if device == "cpu":
+        assert torch.get_num_threads() == (os.cpu_count() or 1)
+
+
+def test_explicit_device_is_used_as_given(fake_model):
+    service = EmbeddingService(device="cpu", batch_size=4)
+
+    assert service.model.device.type == "cpu"
+    assert not service.model.halved
+    assert service.embedding_dim == service.model.get_sentence_embedding_dimension()
+
+
+def test_overlap_is_embedded_but_not_stored(services):
+    service = services.embedding
+    plain = make_chunk(0, "The present moment is all we have.")
+    overlapped = make_chunk(1, "Stillness is found there.", overlap="all we have.")
+
+    service.embed_chunks([plain, overlapped], show_progress=False)
+    np.testing.assert_allclose(overlapped.embedding, service.model.encode("all we have. ... Stillness is found there."))
+    np.testing.assert_allclose(plain.embedding, service.model.encode("The present moment is all we have."))
+
+    assert service.embed_and_index([plain, overlapped], services.vector_db) == 2
+    assert services.vector_db.get_by_id(plain.id)["document"] == plain.text
+    assert services.vector_db.get_by_id(overlapped.id)["document"] == "Stillness is found there."
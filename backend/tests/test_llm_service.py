@@ -0,0 +1,280 @@
+"""Tests for in-flight request coalescing and response caching in LLMService"""
+
+import asyncio
+import sys
+from types import SimpleNamespace
+from typing import AsyncGenerator, List
+
+import pytest
+
+from app.config import Settings
+from app.services.llm_service import BaseLLMProvider, LazyProvider, LLMService
+from app.services.response_cache import CACHE_MAX_TEMPERATURE, SEMANTIC_MAX_TEMPERATURE
+
+
+class GatedProvider(BaseLLMProvider):
+    """Provider whose calls block until `release` is set"""
+
+    model = "gated"
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"answer to {prompt}"
+
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
+        self.calls += 1
+        yield "a"
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        yield "b"
+        yield "c"
+
+
+class CountingProvider(BaseLLMProvider):
+    """Provider that answers immediately and counts its calls"""
+
+    model = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        return f"answer {self.calls}"
+
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
+        self.calls += 1
+        yield "answer"
+        yield f" {self.calls}"
+
+
+def make_service(provider: BaseLLMProvider) -> LLMService:
+    service = LLMService()
+    service.providers = {"fake": provider}
+    service.priority = ["fake"]
+    return service
+
+
+async def collect(stream: AsyncGenerator[str, None]) -> List[str]:
+    return [chunk async for chunk in stream]
+
+
+async def settle():
+    """Let cancellations and done callbacks run"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    provider = GatedProvider()
+    service = make_service(provider)
+
+    leader = asyncio.create_task(service.generate("q", provider="fake"))
+    follower = asyncio.create_task(service.generate("q", provider="fake"))
+    await provider.started.wait()
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    provider.release.set()
+
+    assert await follower == "answer to q"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert provider.calls == 1
+    assert provider.cancelled == 0
+
+
+@pytest.mark.asyncio
+async def test_last_waiter_leaving_cancels_the_call():
+    provider = GatedProvider()
+    service = make_service(provider)
+
+    waiters = [asyncio.create_task(service.generate("q", provider="fake")) for _ in range(2)]
+    await provider.started.wait()
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await settle()
+
+    assert provider.cancelled == 1
+    assert service._inflight == {}
+
+    # A new identical request starts a fresh call instead of joining the cancelled one
+    provider.release.set()
+    assert await service.generate("q", provider="fake") == "answer to q"
+    assert provider.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_error_is_raised_in_every_waiter():
+    provider = GatedProvider(error=ValueError("provider down"))
+    service = make_service(provider)
+
+    waiters = [asyncio.create_task(service.generate("q", provider="fake")) for _ in range(3)]
+    await provider.started.wait()
+    provider.release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert provider.calls == 1
+    assert service._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_disconnected_stream_leader_does_not_end_followers():
+    provider = GatedProvider()
+    service = make_service(provider)
+
+    leader = service.generate_stream("q", provider="fake")
+    assert await leader.__anext__() == "a"
+
+    follower = asyncio.create_task(collect(service.generate_stream("q", provider="fake")))
+    await asyncio.sleep(0)
+
+    await leader.aclose()
+    provider.release.set()
+
+    assert await follower == ["a", "b", "c"]
+    assert provider.calls == 1
+    assert provider.cancelled == 0
+
+
+@pytest.mark.asyncio
+async def test_last_stream_subscriber_leaving_cancels_the_producer():
+    provider = GatedProvider()
+    service = make_service(provider)
+
+    stream = service.generate_stream("q", provider="fake")
+    assert await stream.__anext__() == "a"
+    await provider.started.wait()
+    await stream.aclose()
+    await settle()
+
+    assert provider.cancelled == 1
+    assert service._inflight_streams == {}
+
+
+@pytest.mark.asyncio
+async def test_stream_error_is_raised_in_every_subscriber():
+    provider = GatedProvider(error=ValueError("provider down"))
+    service = make_service(provider)
+
+    subscribers = [asyncio.create_task(collect(service.generate_stream("q", provider="fake"))) for _ in range(2)]
+    await provider.started.wait()
+    provider.release.set()
+
+    results = await asyncio.gather(*subscribers, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cacheable_request_hits_the_response_cache():
+    provider = CountingProvider()
+    service = make_service(provider)
+
+    first = await service.generate("q", provider="fake", temperature=CACHE_MAX_TEMPERATURE)
+    second = await service.generate("q", provider="fake", temperature=CACHE_MAX_TEMPERATURE)
+
+    assert first == second == "answer 1"
+    assert provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cacheable_stream_hits_the_response_cache():
+    provider = CountingProvider()
+    service = make_service(provider)
+
+    first = await collect(service.generate_stream("q", provider="fake", temperature=CACHE_MAX_TEMPERATURE))
+    second = await collect(service.generate_stream("q", provider="fake", temperature=CACHE_MAX_TEMPERATURE))
+
+    assert "".join(first) == "".join(second) == "answer 1"
+    assert provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_default_chat_temperature_is_not_cached():
+    provider = CountingProvider()
+    service = make_service(provider)
+
+    await service.generate("q", provider="fake", temperature=0.7)
+    await service.generate("q", provider="fake", temperature=0.7)
+
+    assert provider.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_semantic_hit_requires_the_same_context(monkeypatch):
+    # Every query embeds to the same vector, so only the context tells requests apart
+    embedder = SimpleNamespace(embed_text=lambda text: [1.0, 0.0])
+    monkeypatch.setitem(
+        sys.modules, "app.services.embedding_service", SimpleNamespace(get_embedding_service=lambda: embedder)
+    )
+    provider = CountingProvider()
+    service = make_service(provider)
+
+    async def ask(message: str, context: str) -> str:
+        return await service.generate(
+            f"{context}\n\n{message}", provider="fake", semantic_key=message,
+            semantic_context=context, temperature=SEMANTIC_MAX_TEMPERATURE
+        )
+
+    first = await ask("What is presence?", "[1]\nNotes on presence")
+    other_context = await ask("What is presence?", "[1]\nNotes on habits")
+    paraphrase = await ask("what is presence", "[1]\nNotes on presence")
+
+    assert (first, other_context, paraphrase) == ("answer 1", "answer 2", "answer 1")
+    assert provider.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_startup_builds_only_the_preferred_lazy_provider():
+    service = LLMService()
+    service.providers = {
+        "first": LazyProvider("First", CountingProvider),
+        "second": LazyProvider("Second", CountingProvider),
+    }
+    service.priority = ["first", "second"]
+    service._availability = {"first": True, "second": True}
+
+    await service.refresh_availability()
+    await service.warm_connections()
+
+    assert service.providers["first"].built
+    assert not service.providers["second"].built
+    assert service.is_available("second")
+
+    # Built by its first request, then included in health checks
+    assert await service.generate("q", provider="second") == "answer 1"
+    assert service.providers["second"].built
+    assert set(service._probed()) == {"first", "second"}
+
+
+def test_chat_temperature_is_configurable(monkeypatch):
+    monkeypatch.delenv("CHAT_TEMPERATURE", raising=False)
+    assert Settings().chat_temperature == 0.7
+
+    monkeypatch.setenv("CHAT_TEMPERATURE", "0.2")
+    assert Settings().chat_temperature == 0.2
@@ -0,0 +1,84 @@
+"""Smoke tests for the ingest and retrieval path: chunk, embed, index, retrieve"""
+
+from typing import List
+
+import pytest
+
+from app.models.note import Note
+from app.services.chunking_service import ChunkingService
+
+
+def make_note(i: int, content: str, category: str = "Spiritual") -> Note:
+    return Note(
+        id=f"note-{i}",
+        title=f"Note {i}",
+        content=content,
+        category=category,
+        book="Book",
+        file_path=f"{category}/Book/files/Note {i}.md"
+    )
+
+
+def make_notes() -> List[Note]:
+    return [
+        make_note(0, "The present moment is all we have. Stillness lives in the now."),
+        make_note(1, "Habits compound. Small daily actions shape who we become.", category="Self-Help"),
+        make_note(2, "Breathing slowly calms the nervous system within minutes.", category="Psychology"),
+    ]
+
+
+def index_notes(services, notes: List[Note]) -> int:
+    chunks = ChunkingService().chunk_notes(notes)
+    services.embedding.embed_chunks(chunks, show_progress=False)
+    return services.vector_db.add_chunks(chunks)
+
+
+def test_long_note_is_chunked_with_separate_overlap():
+    paragraphs = [" ".join(f"word{p}_{w}" for w in range(60)) for p in range(6)]
+    note = make_note(0, "\n\n".join(paragraphs))
+
+    chunks = ChunkingService(chunk_size=100, chunk_overlap=20, min_chunk_size=10).chunk_note(note)
+
+    assert len(chunks) > 1
+    assert chunks[0].overlap == ""
+    assert all(chunk.overlap for chunk in chunks[1:])
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.text.endswith(chunk.overlap)
+        assert not chunk.text.startswith(chunk.overlap)
+
+
+def test_indexed_notes_are_retrieved(services):
+    from app.services.rag_engine import RAGEngine
+
+    notes = make_notes()
+    assert index_notes(services, notes) == len(notes)
+
+    context, citations = RAGEngine(top_k=2).retrieve_context(notes[1].content)
+
+    assert citations[0].title == "Note 1"
+    assert context.startswith(f"[1]\n{notes[1].content}")
+    assert len(citations) == 2
+
+
+def test_category_filter_limits_retrieval(services):
+    from app.services.rag_engine import RAGEngine
+
+    index_notes(services, make_notes())
+
+    _, citations = RAGEngine(top_k=3).retrieve_context("stillness", category_filter="Psychology")
+
+    assert [citation.title for citation in citations] == ["Note 2"]
+
+
+@pytest.mark.asyncio
+async def test_async_retrieval_goes_through_the_query_batcher(services):
+    from app.services.rag_engine import RAGEngine
+
+    notes = make_notes()
+    index_notes(services, notes)
+    engine = RAGEngine(top_k=2)
+
+    context, citations = await engine.retrieve_context_async(notes[2].content)
+
+    assert citations[0].title == "Note 2"
+    assert engine.retrieve_context(notes[2].content) == (context, citations)
@@ -0,0 +1,108 @@
+"""Tests for note tree building, indexing and caching"""
+
+from typing import List
+
+import orjson
+
+from app.api import tree as tree_api
+from app.models.note import Note
+from app.services.tree_parser import TreeNode, TreeParser
+
+
+def make_note(i: int, content: str = "") -> Note:
+    return Note(
+        id=f"note-{i}",
+        title=f"Note {i}",
+        content=content,
+        category="Test",
+        book="Book",
+        file_path=f"Test/Book/files/Note {i}.md"
+    )
+
+
+def make_chain(length: int) -> List[Note]:
+    """Notes where each one links to the next"""
+    return [
+        make_note(i, f"[[Note {i + 1}]]" if i < length - 1 else "")
+        for i in range(length)
+    ]
+
+
+def test_statistics_on_a_tree_assembled_by_hand():
+    notes = [make_note(i) for i in range(4)]
+    root = TreeNode(notes[0], is_root=True)
+    chapter = TreeNode(notes[1])
+    root.add_child(chapter)
+    chapter.add_child(TreeNode(notes[2]))
+    root.add_child(TreeNode(notes[3]))
+
+    assert tree_api.count_all_nodes(root) == 4
+    assert tree_api.get_max_depth(root) == 2
+    assert tree_api._find_note_in_tree(root, "note-2")
+    assert not tree_api._find_note_in_tree(root, "missing")
+
+
+def test_build_tree_records_statistics():
+    notes = make_chain(5)
+    tree = TreeParser().build_tree(notes[0], notes)
+
+    assert tree.total_nodes == 5
+    assert tree.max_depth == 4
+    assert tree.find("note-4").depth == 4
+
+
+def test_to_json_matches_to_dict():
+    notes = [make_note(i) for i in range(4)]
+    root = TreeNode(notes[0], is_root=True)
+    chapter = TreeNode(notes[1])
+    root.add_child(chapter)
+    chapter.add_child(TreeNode(notes[2]))
+    root.add_child(TreeNode(notes[3]))
+
+    assert root.to_json() == orjson.dumps(root.to_dict())
+
+
+def test_cached_tree_body_is_the_api_response():
+    notes = make_chain(3)
+    tree = TreeParser().build_tree(notes[0], notes)
+
+    try:
+        tree_api._cache_tree("Test/Short Chain", tree)
+        body = orjson.loads(tree_api._tree_json_cache["Test/Short Chain"])
+    finally:
+        tree_api._trees_cache.pop("Test/Short Chain", None)
+        tree_api._tree_json_cache.pop("Test/Short Chain", None)
+
+    assert body == {
+        "category": "Test",
+        "book_name": "Short Chain",
+        "tree": tree.to_dict(),
+        "statistics": {"total_notes": 3, "max_depth": 2, "chapter_count": 1}
+    }
+
+
+def test_deep_chain_is_built_and_cached_without_recursion():
+    length = 3000
+    notes = make_chain(length)
+    tree = TreeParser().build_tree(notes[0], notes)
+
+    try:
+        tree_api._cache_tree("Test/Deep Chain", tree)
+        body = tree_api._tree_json_cache["Test/Deep Chain"]
+    finally:
+        tree_api._trees_cache.pop("Test/Deep Chain", None)
+        tree_api._tree_json_cache.pop("Test/Deep Chain", None)
+
+    # Too deep for json/orjson to parse back, so check its shape directly
+    assert body.count(b'"children":[') == length
+    assert body.endswith(
+        b'"statistics":{"total_notes":3000,"max_depth":2999,"chapter_count":1}}'
+    )
+
+    depth = 0
+    data = tree.to_dict()
+    while data["children"]:
+        (data,) = data["children"]
+        depth += 1
+    assert depth == length - 1
+    assert data["id"] == f"note-{length - 1}"
@@ -105,7 +105,7 @@ export default function AboutPage() {
             {
               step: '5',
               title: 'Grounded Generation',
-              detail: 'Structured prompt injects retrieved chunks with [Source: X] labels. GPT-4 Turbo generates a cited response streamed via SSE.',
+              detail: 'Structured prompt injects retrieved chunks under numbered [n] tags. GPT-4 Turbo generates a cited response streamed via SSE.',
             },
           ].map(({ step, title, detail }) => (
             <div key={step} className="flex items-start gap-4">
@@ -14,9 +14,10 @@ import { Citation } from '@/lib/api';
  */
 interface CitationChipProps {
   citation: Citation;
+  number?: number; // Matches the [n] references in the answer text
 }
 
-export default function CitationChip({ citation }: CitationChipProps) {
+export default function CitationChip({ citation, number }: CitationChipProps) {
   // Extract note name from file path (e.g., "Spiritual/A New Earth/Note.md" -> "Note")
   const noteName = citation.title || extractNoteNameFromPath(citation.file_path);
   const category = citation.category || 'Unknown';
@@ -33,6 +34,9 @@ export default function CitationChip({ citation }: CitationChipProps) {
       className="inline-flex items-center space-x-1 px-3 py-1 bg-purple-100 hover:bg-purple-200 text-purple-700 rounded-full text-xs font-medium transition-all duration-200 hover:scale-105 cursor-pointer"
       title={`Relevance: ${relevancePercent}% | ${citation.file_path}`}
     >
+      {/* Reference Number */}
+      {number !== undefined && <span className="font-bold">[{number}]</span>}
+
       {/* Category Icon */}
       <span>{getCategoryIcon(category)}</span>
       
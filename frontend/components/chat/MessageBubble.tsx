@@ -39,7 +39,7 @@ export default function MessageBubble({ message }: MessageBubbleProps) {
               <p className="text-xs text-stone-400 font-semibold mb-2 uppercase tracking-wide">Sources</p>
               <div className="flex flex-wrap gap-2">
                 {message.citations.slice(0, 5).map((citation, index) => (
-                  <CitationChip key={index} citation={citation} />
+                  <CitationChip key={index} citation={citation} number={index + 1} />
                 ))}
                 {message.citations.length > 5 && (
                   <span className="text-xs text-stone-400">
@@ -5,24 +5,33 @@ into ChromaDB for use with the RAG pipeline.
 
 Usage:
     export OBSIDIAN_VAULT_PATH=/path/to/your/obsidian/vault
-    python scripts/ingest_notes.py
+    python scripts/ingest_notes.py            # write chunks_with_embeddings.json
+    python scripts/ingest_notes.py --index    # insert straight into ChromaDB
+    python scripts/ingest_notes.py --parquet  # write chunks_with_embeddings.parquet (needs pyarrow)
+    python scripts/ingest_notes.py --async-read  # overlap reads (iCloud-backed vaults)
 """
 
+import asyncio
 import json
 import os
 import sys
 from pathlib import Path
 import logging
-from typing import List
+from typing import Iterable
+
 
 # Add backend to path
 backend_path = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
-from app.services.obsidian_parser import parse_vault
+from app.services.obsidian_parser import parse_vault, parse_vault_async
 from app.services.chunking_service import ChunkingService
 from app.services.embedding_service import EmbeddingService
-from app.models.note import Chunk
+from app.services.vector_db import VectorDBService
+from app.models.note import Note
+from app.models.note_fast import ChunkFast
+from app.utils import chunk_parquet
+from app.utils.json_stream import iter_dumped, write_json_array
 
 # Configure logging
 logging.basicConfig(
@@ -32,17 +41,17 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def save_chunks(chunks: List[Chunk], output_file: Path):
-    """Save chunks to JSON file"""
-    chunks_data = []
-    for chunk in chunks:
-        chunk_dict = chunk.model_dump()
-        chunks_data.append(chunk_dict)
+def save_chunks(chunks: Iterable[ChunkFast], output_file: Path) -> int:
+    """
+    Stream chunks into a JSON array file, one chunk at a time
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(chunks_data, f, indent=2, ensure_ascii=False, default=str)
+    orjson writes the embedding row views (NumPy arrays) directly, so no
+    per-chunk Python float list is built.
+    """
+    count = write_json_array((chunk.to_dict() for chunk in chunks), output_file)
     
-    logger.info(f"Saved {len(chunks)} chunks to {output_file}")
+    logger.info(f"Saved {count} chunks to {output_file}")
+    return count
 
 
 def main():
@@ -58,6 +67,8 @@ def main():
         sys.exit(1)
     
     VAULT_PATH = vault_path_env
+    direct_index = "--index" in sys.argv
+    use_parquet = "--parquet" in sys.argv
     DATA_DIR = Path(__file__).parent.parent / "data"
     PROCESSED_DIR = DATA_DIR / "processed"
     PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
@@ -69,7 +80,14 @@ def main():
     
     # Step 1: Parse Obsidian Vault
     logger.info("\n[1/4] Parsing Obsidian vault...")
-    notes, stats = parse_vault(VAULT_PATH)
+    if "--async-read" in sys.argv:
+        # Reads that wait on cloud downloads overlap instead of queueing
+        notes, stats = asyncio.run(parse_vault_async(VAULT_PATH))
+    else:
+        # Unchanged files are reused from the previous run's parse; the rest
+        # are parsed in a process pool (PARSE_WORKERS, default: CPU count)
+        workers = int(os.getenv("PARSE_WORKERS", "0")) or None
+        notes, stats = parse_vault(VAULT_PATH, cache_path=DATA_DIR / "cache" / "vault.json", workers=workers)
     
     logger.info(f"✓ Parsed {stats['total_notes']} notes")
     logger.info(f"  Total words: {stats['total_words']:,}")
@@ -77,9 +95,7 @@ def main():
     
     # Save notes
     notes_file = PROCESSED_DIR / "notes.json"
-    notes_data = [note.model_dump() for note in notes]
-    with open(notes_file, 'w', encoding='utf-8') as f:
-        json.dump(notes_data, f, indent=2, ensure_ascii=False, default=str)
+    write_json_array(iter_dumped(notes, Note), notes_file)
     logger.info(f"✓ Saved notes to {notes_file}")
     
     # Save statistics
@@ -89,56 +105,83 @@ def main():
     
     # Step 2: Chunk Notes
     logger.info("\n[2/4] Chunking notes...")
+    
+    # The embedding model is loaded first so chunks are sized with its tokenizer
+    embedding_service = EmbeddingService(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        batch_size=32,
+        # int8 shrinks chunks_with_embeddings.json ~4x with negligible recall loss
+        quantization=os.getenv("EMBEDDING_QUANTIZATION", "fp32"),
+        # Unchanged chunks reuse their token ids on re-ingest
+        tokenize_cache_dir=DATA_DIR / "cache" / "tokens"
+    )
+    
     chunker = ChunkingService(
         chunk_size=800,
         chunk_overlap=150,
-        min_chunk_size=100
+        min_chunk_size=100,
+        # Overlap + chunk fit the model's input, so nothing is truncated
+        tokenizer=embedding_service.model.tokenizer,
+        max_seq_length=embedding_service.model.max_seq_length
     )
+    logger.info(f"  Chunk budget: {chunker.tokens_per_chunk} tokens + {chunker.overlap_tokens} overlap")
     
-    chunks = chunker.chunk_notes(notes)
-    logger.info(f"✓ Created {len(chunks)} chunks")
-    logger.info(f"  Average chunks per note: {len(chunks) / len(notes):.1f}")
+    # Lazy: chunks are produced, embedded and written one batch at a time
+    chunks = chunker.iter_chunks(notes)
     
     # Step 3: Generate Embeddings
     logger.info("\n[3/4] Generating embeddings...")
     logger.info("  This may take a few minutes...")
     
-    embedding_service = EmbeddingService(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        batch_size=32
-    )
-    
     # Print model info
     model_info = embedding_service.get_model_info()
     logger.info(f"  Model: {model_info['model_name']}")
     logger.info(f"  Embedding dimension: {model_info['embedding_dimension']}")
     logger.info(f"  Device: {model_info['device']}")
     
-    # Generate embeddings
-    chunks = embedding_service.embed_chunks(chunks, show_progress=True)
-    logger.info(f"✓ Generated {len(chunks)} embeddings")
-    
-    # Step 4: Save Chunks with Embeddings
-    logger.info("\n[4/4] Saving chunks with embeddings...")
-    chunks_file = PROCESSED_DIR / "chunks_with_embeddings.json"
-    save_chunks(chunks, chunks_file)
+    if direct_index:
+        # Steps 3+4: embed 1000 chunks at a time and insert them into ChromaDB
+        logger.info("\n[4/4] Indexing chunks into ChromaDB...")
+        db = VectorDBService(persist_directory=str(DATA_DIR / "embeddings"))
+        chunk_count = embedding_service.embed_and_index(chunks, db, batch_size=1000)
+    else:
+        # Generate embeddings (streamed into step 4)
+        embedded_chunks = embedding_service.embed_chunk_stream(chunks, batch_size=32)
+        
+        # Step 4: Save Chunks with Embeddings
+        logger.info("\n[4/4] Saving chunks with embeddings...")
+        if use_parquet:
+            # FP16 embedding column + zstd: a fraction of the JSON size, no float parsing on load
+            chunks_file = PROCESSED_DIR / "chunks_with_embeddings.parquet"
+            chunk_count = chunk_parquet.write_chunks(embedded_chunks, chunks_file)
+            logger.info(f"Saved {chunk_count} chunks to {chunks_file}")
+        else:
+            chunks_file = PROCESSED_DIR / "chunks_with_embeddings.json"
+            chunk_count = save_chunks(embedded_chunks, chunks_file)
+    
+    logger.info(f"✓ Created and embedded {chunk_count} chunks")
+    logger.info(f"  Average chunks per note: {chunk_count / len(notes):.1f}")
     
     # Generate summary
     logger.info("\n" + "="*60)
     logger.info("INGESTION COMPLETE")
     logger.info("="*60)
     logger.info(f"Notes:      {len(notes):,}")
-    logger.info(f"Chunks:     {len(chunks):,}")
+    logger.info(f"Chunks:     {chunk_count:,}")
     logger.info(f"Categories: {len(stats['categories'])}")
     logger.info(f"Total words: {stats['total_words']:,}")
     
     logger.info(f"\nFiles saved to: {PROCESSED_DIR}")
     logger.info(f"  - notes.json ({notes_file.stat().st_size / 1024 / 1024:.1f} MB)")
-    logger.info(f"  - chunks_with_embeddings.json ({chunks_file.stat().st_size / 1024 / 1024:.1f} MB)")
+    if not direct_index:
+        logger.info(f"  - {chunks_file.name} ({chunks_file.stat().st_size / 1024 / 1024:.1f} MB)")
     logger.info(f"  - statistics.json")
     
-    logger.info("\nNext step: Load chunks into ChromaDB vector store")
-    logger.info("Run: python scripts/load_chromadb.py")
+    if direct_index:
+        logger.info("\nChromaDB ready for queries!")
+    else:
+        logger.info("\nNext step: Load chunks into ChromaDB vector store")
+        logger.info("Run: python scripts/load_chromadb.py")
 
 
 if __name__ == "__main__":
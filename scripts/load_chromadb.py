@@ -3,17 +3,27 @@ Load Chunks into ChromaDB
 Reads processed chunks with embeddings and loads them into ChromaDB
 """
 
-import json
+import queue
 import sys
+import threading
 from pathlib import Path
+from typing import Iterator, List
 import logging
 
+import orjson
+
+try:
+    import ijson
+except ImportError:  # Optional dependency (pip install ijson); falls back to orjson.loads
+    ijson = None
+
 # Add backend to path
 backend_path = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
-from app.services.vector_db import VectorDBService
-from app.models.note import Chunk
+from app.services.vector_db import ADD_BATCH_SIZE, VectorDBService
+from app.models.note_fast import ChunkFast
+from app.utils.chunk_parquet import iter_parquet_batches
 
 # Configure logging
 logging.basicConfig(
@@ -23,17 +33,48 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def load_chunks_from_json(file_path: Path) -> list[Chunk]:
-    """Load chunks from JSON file"""
-    logger.info(f"Loading chunks from {file_path}")
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        chunks_data = json.load(f)
-    
-    chunks = [Chunk(**chunk_data) for chunk_data in chunks_data]
-    
-    logger.info(f"✓ Loaded {len(chunks)} chunks")
-    return chunks
+def iter_chunk_batches(file_path: Path, batch_size: int = ADD_BATCH_SIZE) -> Iterator[List[ChunkFast]]:
+    """
+    Yield chunks from the JSON array file in batches
+    
+    With ijson the file is parsed incrementally, so memory holds one batch
+    rather than the whole corpus. Chunks were validated when they were
+    written, so they are rebuilt as ChunkFast without pydantic.
+    """
+    logger.info(f"Streaming chunks from {file_path}" if ijson else f"Loading chunks from {file_path}")
+    
+    with open(file_path, 'rb') as f:
+        records = ijson.items(f, 'item', use_float=True) if ijson else iter(orjson.loads(f.read()))
+        
+        batch: List[ChunkFast] = []
+        for record in records:
+            batch.append(ChunkFast(**record))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def prefetch(batches: Iterator[List[ChunkFast]], depth: int = 2) -> Iterator[List[ChunkFast]]:
+    """Parse the next batches in a background thread while the current one is inserted"""
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    done = object()
+    
+    def produce():
+        try:
+            for batch in batches:
+                buffer.put(batch)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(done)
+    
+    threading.Thread(target=produce, daemon=True).start()
+    
+    while (item := buffer.get()) is not done:
+        if isinstance(item, Exception):
+            raise item
+        yield item
 
 
 def main():
@@ -42,8 +83,16 @@ def main():
     # Configuration
     DATA_DIR = Path(__file__).parent.parent / "data"
     CHUNKS_FILE = DATA_DIR / "processed" / "chunks_with_embeddings.json"
+    PARQUET_FILE = DATA_DIR / "processed" / "chunks_with_embeddings.parquet"
     EMBEDDINGS_DIR = DATA_DIR / "embeddings"
     
+    # Prefer the Parquet export (ingest_notes.py --parquet) unless the JSON one is newer
+    use_parquet = PARQUET_FILE.exists() and (
+        not CHUNKS_FILE.exists() or PARQUET_FILE.stat().st_mtime >= CHUNKS_FILE.stat().st_mtime
+    )
+    if use_parquet:
+        CHUNKS_FILE = PARQUET_FILE
+    
     logger.info("="*60)
     logger.info("LOADING CHUNKS INTO CHROMADB")
     logger.info("="*60)
@@ -54,20 +103,8 @@ def main():
         logger.error("Please run 'python scripts/ingest_notes.py' first")
         sys.exit(1)
     
-    # Step 1: Load chunks from JSON
-    logger.info("\n[1/3] Loading chunks from JSON...")
-    chunks = load_chunks_from_json(CHUNKS_FILE)
-    
-    # Verify embeddings
-    chunks_with_embeddings = [c for c in chunks if c.embedding is not None]
-    logger.info(f"  Chunks with embeddings: {len(chunks_with_embeddings)}/{len(chunks)}")
-    
-    if len(chunks_with_embeddings) == 0:
-        logger.error("No chunks have embeddings!")
-        sys.exit(1)
-    
-    # Step 2: Initialize ChromaDB
-    logger.info("\n[2/3] Initializing ChromaDB...")
+    # Step 1: Initialize ChromaDB
+    logger.info("\n[1/2] Initializing ChromaDB...")
     db = VectorDBService(persist_directory=str(EMBEDDINGS_DIR))
     
     # Check if collection is empty
@@ -77,14 +114,25 @@ def main():
         response = input("Do you want to reset and reload? (yes/no): ")
         
         if response.lower() in ['yes', 'y']:
-            db.reset_collection()
+            # Full reload: recreate so the collection gets the current HNSW parameters
+            db.reset_collection(hard=True)
             logger.info("✓ Collection reset")
         else:
             logger.info("Skipping reset, will add to existing collection")
     
-    # Step 3: Add chunks to ChromaDB
-    logger.info("\n[3/3] Adding chunks to ChromaDB...")
-    added_count = db.add_chunks(chunks_with_embeddings, batch_size=100)
+    # Step 2: Stream chunks into ChromaDB, parsing ahead of the inserts
+    logger.info("\n[2/2] Adding chunks to ChromaDB...")
+    total_count = 0
+    added_count = 0
+    batches = iter_parquet_batches(CHUNKS_FILE, ADD_BATCH_SIZE) if use_parquet else iter_chunk_batches(CHUNKS_FILE)
+    for batch in prefetch(batches):
+        total_count += len(batch)
+        added_count += db.add_chunks(batch)
+    
+    logger.info(f"  Chunks added: {added_count}/{total_count}")
+    if added_count == 0:
+        logger.error("No chunks have embeddings!")
+        sys.exit(1)
     
     # Get statistics
     logger.info("\n" + "="*60)
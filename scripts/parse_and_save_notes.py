@@ -3,6 +3,7 @@ Script to parse Obsidian vault and save structured notes to JSON
 """
 
 import json
+import os
 import sys
 from pathlib import Path
 
@@ -10,7 +11,9 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
+from app.models.note import Note
 from app.services.obsidian_parser import parse_vault
+from app.utils.json_stream import iter_dumped, write_json_array
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -25,15 +28,12 @@ def main():
     
     logger.info(f"Parsing vault: {vault_path}")
     
-    # Parse vault
-    notes, stats = parse_vault(vault_path)
+    # Parse vault (process pool for large vaults; PARSE_WORKERS=1 forces serial)
+    notes, stats = parse_vault(vault_path, workers=int(os.getenv("PARSE_WORKERS", "0")) or None)
     
     # Save notes to JSON
     output_file = output_dir / "notes.json"
-    notes_data = [note.model_dump() for note in notes]
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(notes_data, f, indent=2, ensure_ascii=False, default=str)
+    write_json_array(iter_dumped(notes, Note), output_file)
     
     logger.info(f"Saved {len(notes)} notes to {output_file}")
     
@@ -5,13 +5,46 @@ Tests performance, quality, and response time
 """
 
 import asyncio
+import hashlib
 import time
-import json
-from typing import Dict, Any
-import requests
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from statistics import fmean
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+import httpx
+import orjson
+
+if TYPE_CHECKING:
+    import numpy as np
 
 API_BASE_URL = "http://127.0.0.1:8000"
 
+
+def make_client(max_connections: int = 32) -> httpx.AsyncClient:
+    """
+    Shared keep-alive client for every call in a run (health, search, chat)
+    
+    HTTP/1.1 only: uvicorn does not speak HTTP/2, so concurrency comes from
+    the connection pool. Connection failures are retried twice.
+    """
+    return httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        timeout=180,
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=max_connections, keepalive_expiry=60),
+        transport=httpx.AsyncHTTPTransport(retries=2)
+    )
+
+
+# Request bodies are serialized once with orjson and sent as raw content
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _chat_body(query: str, provider: str, stream: bool = False) -> Dict[str, Any]:
+    """ChatRequest payload for one (query, provider) pair"""
+    return {"message": query, "provider": provider, "stream": stream}
+
 # Test queries at different complexity levels
 TEST_QUERIES = [
     {
@@ -33,16 +66,154 @@ TEST_QUERIES = [
 
 PROVIDERS = ["openai", "anthropic", "google", "ollama"]
 
+# Response previews and top citations are printed only with --verbose
+VERBOSE = False
+PREVIEW_CHARS = 300
+
+# Pause before the next request to a provider that signalled throttling
+# (429 or x-ratelimit-remaining: 0) without a Retry-After header
+PROVIDER_COOLDOWN_SECONDS = 2
+
+# Monotonic time before which each provider should not be called again
+_next_ok_at: Dict[str, float] = {}
+
+# Successful (provider, query) responses are reused from disk for a day (--no-cache to bypass)
+CACHE_DIR = Path(__file__).parent.parent / "data" / "cache" / "llm_comparison"
+CACHE_TTL_SECONDS = 86400
+
+
+class ResponseDiskCache:
+    """Exact-match cache of chat results, one JSON file per SHA-256 of (provider, query)"""
+    
+    def __init__(self, cache_dir: Path = CACHE_DIR, ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+    
+    def _path(self, provider: str, query: str) -> Path:
+        key = hashlib.sha256(f"{provider}|{query}".encode()).hexdigest()
+        return self.cache_dir / f"{key}.json"
+    
+    def get(self, provider: str, query: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result, or None if missing, unreadable or older than the TTL"""
+        path = self._path(provider, query)
+        try:
+            if time.time() - path.stat().st_mtime <= self.ttl_seconds:
+                result = orjson.loads(path.read_bytes())
+                self.hits += 1
+                return result
+        except (OSError, ValueError):
+            pass
+        
+        self.misses += 1
+        return None
+    
+    def set(self, provider: str, query: str, result: Dict[str, Any]):
+        """Store a successful result (including its measured response_time)"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._path(provider, query).write_bytes(orjson.dumps(result, option=orjson.OPT_INDENT_2))
+
+
+# A paraphrased query reuses a provider's cached response above this cosine similarity
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
-def test_health_check():
+
+class SemanticResponseCache:
+    """
+    Similarity cache consulted after an exact-cache miss (--semantic-cache)
+    
+    Query embeddings live in one (n, dim) float32 matrix (embeddings.npy,
+    memory-mapped on load) with a JSON sidecar of (provider, query, result)
+    entries; a lookup is a single matrix-vector product over all rows.
+    numpy and the embedding model are only imported when the cache is used.
+    """
+    
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR / "semantic",
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        model_name: str = SEMANTIC_CACHE_MODEL
+    ):
+        import numpy as np
+        
+        self.cache_dir = Path(cache_dir)
+        self.threshold = threshold
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        
+        self._model = None
+        self._query_vectors: Dict[str, "np.ndarray"] = {}
+        self.entries: List[Dict[str, Any]] = []
+        self.matrix: Optional["np.ndarray"] = None
+        
+        try:
+            self.entries = orjson.loads((self.cache_dir / "entries.json").read_bytes())
+            self.matrix = np.load(self.cache_dir / "embeddings.npy", mmap_mode='r')
+            if len(self.matrix) != len(self.entries):
+                self.entries, self.matrix = [], None
+        except (OSError, ValueError):
+            self.entries, self.matrix = [], None
+    
+    def _embed(self, query: str) -> "np.ndarray":
+        """Normalized query embedding (the model loads on first use)"""
+        vector = self._query_vectors.get(query)
+        if vector is None:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+            vector = self._model.encode(query, normalize_embeddings=True).astype("float32")
+            self._query_vectors[query] = vector
+        return vector
+    
+    def get(self, provider: str, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the provider's most similar cached result above the threshold
+        
+        Returns:
+            Cached result with `similarity` and `cached_query` added, or None
+        """
+        rows = [i for i, entry in enumerate(self.entries) if entry["provider"] == provider]
+        if rows:
+            # Rows and the query are unit vectors, so the dot product is the cosine similarity
+            similarities = self.matrix[rows] @ self._embed(query)
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                self.hits += 1
+                entry = self.entries[rows[best]]
+                return {**entry["result"], "similarity": float(similarities[best]), "cached_query": entry["query"]}
+        
+        self.misses += 1
+        return None
+    
+    def add(self, provider: str, query: str, result: Dict[str, Any]):
+        """Append a successful result and persist the matrix and sidecar"""
+        import numpy as np
+        
+        vector = self._embed(query)[None, :]
+        self.matrix = vector if self.matrix is None else np.concatenate([self.matrix, vector])
+        self.entries.append({"provider": provider, "query": query, "result": result})
+        
+        # Write-then-replace: the previous matrix file may still be memory-mapped
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_dir / "embeddings.npy.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self.matrix)
+        tmp_path.replace(self.cache_dir / "embeddings.npy")
+        (self.cache_dir / "entries.json").write_bytes(orjson.dumps(self.entries, option=orjson.OPT_INDENT_2))
+
+
+async def test_health_check(client: httpx.AsyncClient):
     """Test API health"""
     print("=" * 80)
     print("HEALTH CHECK")
     print("=" * 80)
     
     try:
-        response = requests.get(f"{API_BASE_URL}/health")
-        health_data = response.json()
+        response = await client.get("/health")
+        health_data = orjson.loads(response.content)
         
         print(f"✓ API Status: {health_data['status']}")
         print(f"✓ Services:")
@@ -57,7 +228,7 @@ def test_health_check():
         return False
 
 
-def test_semantic_search():
+async def test_semantic_search(client: httpx.AsyncClient):
     """Test semantic search"""
     print("=" * 80)
     print("SEMANTIC SEARCH TEST")
@@ -66,14 +237,15 @@ def test_semantic_search():
     query = "meditation and inner peace"
     
     try:
-        start_time = time.time()
-        response = requests.post(
-            f"{API_BASE_URL}/api/search",
-            json={"query": query, "top_k": 5}
+        start_ns = time.perf_counter_ns()
+        response = await client.post(
+            "/api/search",
+            content=orjson.dumps({"query": query, "top_k": 5}),
+            headers=JSON_HEADERS
         )
-        elapsed = time.time() - start_time
+        elapsed = (time.perf_counter_ns() - start_ns) / 1e9
         
-        results = response.json()
+        results = orjson.loads(response.content)
         
         print(f"Query: '{query}'")
         print(f"Results found: {results['total_results']}")
@@ -94,130 +266,485 @@ def test_semantic_search():
         return False
 
 
-def test_chat_provider(provider: str, query: str, timeout: int = 120) -> Dict[str, Any]:
-    """Test a specific LLM provider"""
-    print(f"\n--- Testing {provider.upper()} ---")
-    print(f"Query: {query}")
+def _retry_after_seconds(response: httpx.Response) -> float:
+    """Seconds to wait before calling this provider again (0 when not throttled)"""
+    retry_after = response.headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
     
-    try:
-        start_time = time.time()
+    if response.status_code == 429 or response.headers.get("x-ratelimit-remaining") == "0":
+        return PROVIDER_COOLDOWN_SECONDS
+    return 0.0
+
+
+async def _wait_for_provider(provider: str):
+    """Sleep until the provider's last rate-limit signal has expired"""
+    delay = _next_ok_at.get(provider, 0.0) - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def _record_rate_limit(provider: str, response: httpx.Response):
+    """Remember when the provider may be called again, from its response headers"""
+    _next_ok_at[provider] = time.monotonic() + _retry_after_seconds(response)
+
+
+async def test_chat_provider(
+    client: httpx.AsyncClient,
+    provider: str,
+    query: str,
+    timeout: int = 120,
+    limit: Optional[asyncio.Semaphore] = None,
+    cache: Optional[ResponseDiskCache] = None,
+    semantic_cache: Optional[SemanticResponseCache] = None
+) -> Dict[str, Any]:
+    """
+    Test a specific LLM provider
+    
+    Providers run concurrently, so each report is printed in one piece
+    once its response arrives. With `limit`, the provider's next request
+    waits out any Retry-After (or throttling status) it returned. With
+    `cache`, a fresh cached result is returned without any request; with
+    `semantic_cache`, so is one cached for a sufficiently similar query.
+    """
+    cached = _cached_result(provider, query, cache, semantic_cache)
+    if cached is not None:
+        return cached
+    
+    async with limit or asyncio.Semaphore(1):
+        if limit is not None:
+            await _wait_for_provider(provider)
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            response = await client.post(
+                "/api/chat",
+                content=orjson.dumps(_chat_body(query, provider)),
+                headers=JSON_HEADERS,
+                timeout=timeout
+            )
+            elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+            if limit is not None:
+                _record_rate_limit(provider, response)
+            result = _report_chat_response(provider, query, response, elapsed)
+            _store_result(provider, query, result, cache, semantic_cache)
         
-        response = requests.post(
-            f"{API_BASE_URL}/api/chat",
-            json={
-                "message": query,
+        except httpx.TimeoutException:
+            _print_header(provider, query)
+            print(f"✗ Request timed out after {timeout}s")
+            result = {
+                "success": False,
                 "provider": provider,
-                "stream": False
-            },
-            timeout=timeout
-        )
+                "error": "Timeout"
+            }
         
-        elapsed = time.time() - start_time
+        except Exception as e:
+            _print_header(provider, query)
+            print(f"✗ Error: {e}")
+            result = {
+                "success": False,
+                "provider": provider,
+                "error": str(e)
+            }
+    
+    return result
+
+
+async def test_chat_provider_stream(
+    client: httpx.AsyncClient,
+    provider: str,
+    query: str,
+    timeout: int = 120,
+    limit: Optional[asyncio.Semaphore] = None,
+    cache: Optional[ResponseDiskCache] = None,
+    semantic_cache: Optional[SemanticResponseCache] = None,
+    max_chars: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Test a provider through the SSE endpoint, recording time to first token
+    
+    Same contract as test_chat_provider(); the result also carries `ttft`
+    (seconds until the first text frame) and `total_time`.
+    
+    Args:
+        max_chars: Stop reading once the response is at least this long (optional)
+    """
+    cached = _cached_result(provider, query, cache, semantic_cache)
+    if cached is not None:
+        return cached
+    
+    async with limit or asyncio.Semaphore(1):
+        if limit is not None:
+            await _wait_for_provider(provider)
+        start_ns = time.perf_counter_ns()
+        ttft = None
+        parts: List[str] = []
+        length = 0
+        citations: List[Dict[str, Any]] = []
         
-        if response.status_code == 200:
-            result = response.json()
-            
-            response_text = result['message']
-            citations = result.get('citations', [])
-            
-            print(f"✓ Response received in {elapsed:.2f}s")
-            print(f"✓ Response length: {len(response_text)} characters")
-            print(f"✓ Citations: {len(citations)}")
-            print(f"\nResponse preview:")
-            print(response_text[:300] + "..." if len(response_text) > 300 else response_text)
-            
-            if citations:
-                print(f"\nTop 3 Citations:")
-                for i, cite in enumerate(citations[:3], 1):
-                    print(f"  {i}. {cite['title']} ({cite['category']}) - {cite['relevance_score']:.3f}")
+        try:
+            async with client.stream(
+                "POST",
+                "/api/chat/stream",
+                content=orjson.dumps(_chat_body(query, provider, stream=True)),
+                headers=JSON_HEADERS,
+                timeout=timeout
+            ) as response:
+                if limit is not None:
+                    _record_rate_limit(provider, response)
+                if response.status_code != 200:
+                    await response.aread()
+                    result = _report_chat_failure(provider, query, response.status_code, response.text)
+                else:
+                    error = None
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        event = orjson.loads(line[6:])
+                        
+                        if event['type'] == 'text':
+                            if ttft is None:
+                                ttft = (time.perf_counter_ns() - start_ns) / 1e9
+                            parts.append(event['data'])
+                            length += len(event['data'])
+                            if max_chars is not None and length >= max_chars:
+                                break
+                        elif event['type'] == 'citations':
+                            citations = event['data']
+                        elif event['type'] == 'error':
+                            error = event['data']
+                            break
+                        elif event['type'] == 'done':
+                            break
+                    
+                    if error is not None:
+                        result = _report_chat_failure(provider, query, 200, error)
+                    else:
+                        total_time = (time.perf_counter_ns() - start_ns) / 1e9
+                        payload = {"message": "".join(parts), "citations": citations}
+                        result = _report_chat_result(provider, query, payload, total_time)
+                        result["ttft"] = ttft if ttft is not None else total_time
+                        result["total_time"] = total_time
+                        print(f"✓ Time to first token: {result['ttft']:.2f}s")
             
-            return {
-                "success": True,
+            _store_result(provider, query, result, cache, semantic_cache)
+        
+        except httpx.TimeoutException:
+            _print_header(provider, query)
+            print(f"✗ Request timed out after {timeout}s")
+            result = {
+                "success": False,
                 "provider": provider,
-                "response_time": elapsed,
-                "response_length": len(response_text),
-                "citation_count": len(citations),
-                "response": response_text
+                "error": "Timeout"
             }
-        else:
-            print(f"✗ Request failed: {response.status_code}")
-            print(f"  Error: {response.text}")
-            return {
+        
+        except Exception as e:
+            _print_header(provider, query)
+            print(f"✗ Error: {e}")
+            result = {
                 "success": False,
                 "provider": provider,
-                "error": response.text
+                "error": str(e)
             }
     
-    except requests.exceptions.Timeout:
-        print(f"✗ Request timed out after {timeout}s")
-        return {
-            "success": False,
-            "provider": provider,
-            "error": "Timeout"
-        }
-    
-    except Exception as e:
-        print(f"✗ Error: {e}")
-        return {
-            "success": False,
-            "provider": provider,
-            "error": str(e)
-        }
+    return result
 
 
-def run_comparison_test():
-    """Run comprehensive comparison test"""
-    print("\n" + "=" * 80)
-    print("LLM PROVIDER COMPARISON TEST")
-    print("=" * 80 + "\n")
+def _cached_result(
+    provider: str,
+    query: str,
+    cache: Optional[ResponseDiskCache],
+    semantic_cache: Optional[SemanticResponseCache]
+) -> Optional[Dict[str, Any]]:
+    """Report and return a cached result (exact match first, then semantic), or None"""
+    if cache is not None:
+        cached = cache.get(provider, query)
+        if cached is not None:
+            _print_header(provider, query)
+            print(f"✓ Cached response (originally {cached['response_time']:.2f}s)")
+            return {**cached, "cached": True}
+    
+    if semantic_cache is not None:
+        cached = semantic_cache.get(provider, query)
+        if cached is not None:
+            _print_header(provider, query)
+            print(f"✓ Semantic cache hit ({cached['similarity']:.3f} similar to '{cached['cached_query']}')")
+            return {**cached, "cached": True}
     
-    # Test health
-    if not test_health_check():
-        print("⚠️  API not healthy, aborting tests")
+    return None
+
+
+def _store_result(
+    provider: str,
+    query: str,
+    result: Dict[str, Any],
+    cache: Optional[ResponseDiskCache],
+    semantic_cache: Optional[SemanticResponseCache]
+):
+    """Add a successful result to whichever caches are enabled"""
+    if not result["success"]:
         return
+    if cache is not None:
+        cache.set(provider, query, result)
+    if semantic_cache is not None:
+        semantic_cache.add(provider, query, result)
+
+
+def _print_header(provider: str, query: str):
+    print(f"\n--- Testing {provider.upper()} ---")
+    print(f"Query: {query}")
+
+
+def _report_chat_response(provider: str, query: str, response: httpx.Response, elapsed: float) -> Dict[str, Any]:
+    """Print one provider's response and build its result record"""
+    if response.status_code == 200:
+        return _report_chat_result(provider, query, orjson.loads(response.content), elapsed)
+    return _report_chat_failure(provider, query, response.status_code, response.text)
+
+
+def _report_chat_result(provider: str, query: str, result: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    """Print a successful ChatResponse payload and build its result record"""
+    _print_header(provider, query)
+    
+    response_text = result['message']
+    citations = result.get('citations', [])
+    
+    print(f"✓ Response received in {elapsed:.2f}s")
+    print(f"✓ Response length: {len(response_text)} characters")
+    print(f"✓ Citations: {len(citations)}")
+    
+    if VERBOSE:
+        ellipsis = "..." if len(response_text) > PREVIEW_CHARS else ""
+        print(f"\nResponse preview:\n{response_text[:PREVIEW_CHARS]}{ellipsis}")
+        
+        if citations:
+            print(f"\nTop 3 Citations:")
+            for i, cite in enumerate(citations[:3], 1):
+                print(f"  {i}. {cite['title']} ({cite['category']}) - {cite['relevance_score']:.3f}")
+    
+    return {
+        "success": True,
+        "provider": provider,
+        "response_time": elapsed,
+        "response_length": len(response_text),
+        "citation_count": len(citations),
+        "response": response_text
+    }
+
+
+def _report_chat_failure(provider: str, query: str, status_code: int, error: str) -> Dict[str, Any]:
+    """Print a failed chat request and build its result record"""
+    _print_header(provider, query)
+    print(f"✗ Request failed: {status_code}")
+    print(f"  Error: {error}")
+    return {
+        "success": False,
+        "provider": provider,
+        "error": error
+    }
+
+
+async def run_chat_batch(
+    client: httpx.AsyncClient,
+    pairs: List[Tuple[Dict[str, Any], str]],
+    limits: Dict[str, asyncio.Semaphore],
+    cache: Optional[ResponseDiskCache] = None,
+    semantic_cache: Optional[SemanticResponseCache] = None,
+    timeout: int = 180
+) -> List[Dict[str, Any]]:
+    """
+    Answer every uncached (test case, provider) pair with one POST /api/chat/batch
+    
+    Response times are the server's per-request processing_time_ms, so one
+    slow provider does not inflate the others' timings. Servers without the
+    batch endpoint get one concurrent request per pair instead.
     
-    # Test search
-    test_semantic_search()
+    Args:
+        pairs: (test case, provider) pairs, in report order
+        limits: Per-provider semaphores for the per-request fallback
     
-    # Test each provider with different queries
-    results = []
+    Returns:
+        One result record per pair, tagged with its test case name
+    """
+    results: List[Optional[Dict[str, Any]]] = [
+        _cached_result(provider, test_case['query'], cache, semantic_cache) for test_case, provider in pairs
+    ]
+    pending = [i for i, result in enumerate(results) if result is None]
     
-    for test_case in TEST_QUERIES:
+    if pending:
+        try:
+            response = await client.post(
+                "/api/chat/batch",
+                content=orjson.dumps({"requests": [_chat_body(pairs[i][0]['query'], pairs[i][1]) for i in pending]}),
+                headers=JSON_HEADERS,
+                timeout=timeout
+            )
+        except httpx.TimeoutException:
+            response = None
+            for i in pending:
+                results[i] = _report_chat_failure(pairs[i][1], pairs[i][0]['query'], 504, f"Batch timed out after {timeout}s")
+        except httpx.HTTPError as e:
+            response = None
+            for i in pending:
+                results[i] = _report_chat_failure(pairs[i][1], pairs[i][0]['query'], 0, str(e))
+        
+        if response is not None and response.status_code in (404, 405):
+            print("⚠️  /api/chat/batch not available; sending one request per provider")
+            answers = await asyncio.gather(*(
+                test_chat_provider(client, pairs[i][1], pairs[i][0]['query'], timeout=timeout, limit=limits[pairs[i][1]])
+                for i in pending
+            ))
+            for i, result in zip(pending, answers):
+                results[i] = result
+                _store_result(pairs[i][1], pairs[i][0]['query'], result, cache, semantic_cache)
+        
+        elif response is not None and response.status_code != 200:
+            for i in pending:
+                results[i] = _report_chat_failure(pairs[i][1], pairs[i][0]['query'], response.status_code, response.text)
+        
+        elif response is not None:
+            for i, item in zip(pending, orjson.loads(response.content)['results']):
+                test_case, provider = pairs[i]
+                if item['success']:
+                    payload = item['response']
+                    result = _report_chat_result(provider, test_case['query'], payload, payload['processing_time_ms'] / 1000)
+                    _store_result(provider, test_case['query'], result, cache, semantic_cache)
+                else:
+                    result = _report_chat_failure(provider, test_case['query'], item['status_code'], item['error'])
+                results[i] = result
+    
+    for (test_case, _), result in zip(pairs, results):
+        result['test_case'] = test_case['name']
+    return results
+
+
+async def warm_up_providers(client: httpx.AsyncClient, timeout: int = 30):
+    """
+    Send one untimed, uncached chat request per provider, concurrently
+    
+    Takes connection setup, the server's lazy provider imports and cold
+    provider-side caches out of the first timed request. Results are
+    discarded; failures are reported and otherwise ignored.
+    """
+    async def ping(provider: str) -> Tuple[str, Optional[str]]:
+        try:
+            response = await client.post(
+                "/api/chat",
+                content=orjson.dumps(_chat_body("ping", provider)),
+                headers=JSON_HEADERS,
+                timeout=timeout
+            )
+            return provider, None if response.status_code == 200 else f"HTTP {response.status_code}"
+        except Exception as e:
+            return provider, str(e) or type(e).__name__
+    
+    start_ns = time.perf_counter_ns()
+    outcomes = await asyncio.gather(*(ping(provider) for provider in PROVIDERS))
+    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+    
+    failed = [f"{provider} ({error})" for provider, error in outcomes if error is not None]
+    print(f"✓ Warmed up {len(PROVIDERS) - len(failed)}/{len(PROVIDERS)} providers in {elapsed:.2f}s")
+    if failed:
+        print(f"⚠️  Warmup failed for: {', '.join(failed)}")
+
+
+async def run_comparison_test(
+    use_cache: bool = True,
+    semantic: bool = False,
+    stream: bool = False,
+    warmup: bool = True
+):
+    """
+    Run comprehensive comparison test (every chat request sent in one batch)
+    
+    Args:
+        use_cache: Reuse results cached on disk by earlier runs (see ResponseDiskCache)
+        semantic: Also reuse results for paraphrased queries (see SemanticResponseCache)
+        stream: Send each request to the SSE endpoint instead, to measure time to first token
+        warmup: Send one untimed request per provider first (see warm_up_providers)
+    """
+    print("\n" + "=" * 80)
+    print("LLM PROVIDER COMPARISON TEST")
+    print("=" * 80 + "\n")
+    
+    # One pooled client for the whole run, sized so every chat request can be in flight
+    async with make_client(max_connections=len(TEST_QUERIES) * len(PROVIDERS)) as client:
+        # Test health
+        if not await test_health_check(client):
+            print("⚠️  API not healthy, aborting tests")
+            return
+        
+        # Test search
+        await test_semantic_search(client)
+        
+        # Keep connection setup and cold starts out of the timed requests
+        if warmup:
+            await warm_up_providers(client)
+        
+        # All (test case, provider) pairs go to the server in one batch request;
+        # the server answers them concurrently and times each one separately
+        limits = {provider: asyncio.Semaphore(1) for provider in PROVIDERS}
+        cache = ResponseDiskCache() if use_cache else None
+        semantic_cache = SemanticResponseCache() if use_cache and semantic else None
+        
         print("\n" + "=" * 80)
-        print(f"TEST CASE: {test_case['name']}")
+        print(f"TEST CASES: {', '.join(tc['name'] for tc in TEST_QUERIES)} × {len(PROVIDERS)} providers")
         print("=" * 80)
         
-        for provider in PROVIDERS:
-            result = test_chat_provider(
-                provider,
-                test_case['query'],
-                timeout=180  # 3 minutes max
-            )
-            result['test_case'] = test_case['name']
-            results.append(result)
-            
-            # Wait between requests
-            time.sleep(2)
+        pairs = [(test_case, provider) for test_case in TEST_QUERIES for provider in PROVIDERS]
+        if stream:
+            # One streamed request per pair, all launched up front (each provider serialized)
+            results = await asyncio.gather(*(
+                test_chat_provider_stream(
+                    client, provider, test_case['query'], timeout=180,
+                    limit=limits[provider], cache=cache, semantic_cache=semantic_cache
+                )
+                for test_case, provider in pairs
+            ))
+            for (test_case, _), result in zip(pairs, results):
+                result['test_case'] = test_case['name']
+        else:
+            results = await run_chat_batch(client, pairs, limits, cache=cache, semantic_cache=semantic_cache)
     
     # Summary
     print("\n" + "=" * 80)
     print("SUMMARY")
     print("=" * 80 + "\n")
     
-    successful_results = [r for r in results if r.get('success')]
+    if cache is not None:
+        print(f"Response cache: {cache.hits} hits, {cache.misses} misses ({CACHE_DIR})\n")
+    if semantic_cache is not None:
+        lookups = semantic_cache.hits + semantic_cache.misses
+        rate = semantic_cache.hits / lookups if lookups else 0.0
+        print(f"Semantic cache: {semantic_cache.hits}/{lookups} hits ({rate:.0%})\n")
     
-    if successful_results:
+    # Group successful results by provider in one pass
+    buckets: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for r in results:
+        if r.get('success'):
+            buckets[r['provider']].append(r)
+    
+    if buckets:
         print("Provider Performance:")
         for provider in PROVIDERS:
-            provider_results = [r for r in successful_results if r['provider'] == provider]
+            provider_results = buckets[provider]
             if provider_results:
-                avg_time = sum(r['response_time'] for r in provider_results) / len(provider_results)
-                avg_length = sum(r['response_length'] for r in provider_results) / len(provider_results)
-                avg_citations = sum(r['citation_count'] for r in provider_results) / len(provider_results)
+                avg_time = fmean(r['response_time'] for r in provider_results)
+                avg_length = fmean(r['response_length'] for r in provider_results)
+                avg_citations = fmean(r['citation_count'] for r in provider_results)
                 
                 print(f"\n{provider.upper()}:")
                 print(f"  ✓ Tests passed: {len(provider_results)}")
                 print(f"  ⏱️  Avg response time: {avg_time:.2f}s")
+                ttfts = [r['ttft'] for r in provider_results if 'ttft' in r]
+                if ttfts:
+                    print(f"  ⚡ Avg time to first token: {fmean(ttfts):.2f}s")
                 print(f"  📝 Avg response length: {avg_length:.0f} chars")
                 print(f"  📚 Avg citations: {avg_citations:.1f}")
             else:
@@ -226,25 +753,26 @@ def run_comparison_test():
     
     # Save detailed results
     output_file = "test_results_llm_comparison.json"
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
     
     print(f"\n✓ Detailed results saved to {output_file}")
 
 
-def quick_test_openai():
+async def quick_test_openai():
     """Quick test of OpenAI only"""
     print("=" * 80)
     print("QUICK OPENAI TEST")
     print("=" * 80 + "\n")
     
-    if not test_health_check():
-        return
-    
     query = "What is the essence of mindfulness according to my notes?"
-    print(f"Testing OpenAI with query: '{query}'\n")
     
-    result = test_chat_provider("openai", query, timeout=30)
+    async with make_client() as client:
+        if not await test_health_check(client):
+            return
+        
+        print(f"Testing OpenAI with query: '{query}'\n")
+        result = await test_chat_provider(client, "openai", query, timeout=30)
     
     if result['success']:
         print("\n" + "=" * 80)
@@ -266,14 +794,25 @@ if __name__ == "__main__":
     
     print("\n🤖 LLM Provider Testing Tool\n")
     
+    VERBOSE = "--verbose" in sys.argv
+    
     if len(sys.argv) > 1 and sys.argv[1] == "--quick":
         # Quick test - just OpenAI
-        quick_test_openai()
+        asyncio.run(quick_test_openai())
     else:
         # Full comparison test
         print("Running full comparison test (this may take several minutes)...")
-        print("Use '--quick' flag for fast OpenAI-only test\n")
-        run_comparison_test()
+        print("Use '--quick' flag for fast OpenAI-only test, '--no-cache' to re-query every provider,")
+        print("'--semantic-cache' to also reuse responses to paraphrased queries,")
+        print("'--stream' to stream each response and report time to first token,")
+        print("'--verbose' to print response previews and citations,")
+        print("'--no-warmup' to skip the untimed warmup request per provider\n")
+        asyncio.run(run_comparison_test(
+            use_cache="--no-cache" not in sys.argv,
+            semantic="--semantic-cache" in sys.argv,
+            stream="--stream" in sys.argv,
+            warmup="--no-warmup" not in sys.argv
+        ))
     
     print("\n✨ Testing complete!\n")
 